@@ -0,0 +1,3 @@
+"""
+Нагрузочные сценарии и стенды для офлайн-замеров производительности бота
+"""
@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+"""
+Замер накладных расходов на выбор обработчика нажатия inline-кнопки.
+
+Сравнивает прежнюю схему (цепочка CallbackQueryHandler с регулярными выражениями,
+проверяемых по очереди) с маршрутизатором callback_router (один обработчик и
+префиксное дерево). Маршруты берутся из build_application, сеть и БД не нужны.
+
+Пример:
+    python -m tg_bot.benchmarks.callback_dispatch --clicks 200000
+"""
+import argparse
+import json
+import random
+import time
+
+from telegram import CallbackQuery, Update, User
+from telegram.ext import Application, CallbackQueryHandler
+
+from tg_bot.config.constants import (
+    ADD_RESPONSE_PAGINATION_PREFIX,
+    ALLSURVEYS_PAGINATION_PREFIX,
+    CATEGORY_SELECTION_PREFIX,
+    SEARCH_PAGINATION_PREFIX,
+    SUBTYPE_SELECTION_PREFIX,
+    SURVEY_PAGINATION_PREFIX,
+    SURVEY_SUBTARGET_PREFIX,
+    SURVEY_TARGET_PREFIX,
+)
+from tg_bot.handlers.callback_router import callback_router
+
+# Шаблоны CallbackQueryHandler верхнего уровня в порядке регистрации до роутера
+LEGACY_PATTERNS = [
+    f"^({SURVEY_PAGINATION_PREFIX}|{ADD_RESPONSE_PAGINATION_PREFIX}|{ALLSURVEYS_PAGINATION_PREFIX})",
+    f"^{CATEGORY_SELECTION_PREFIX}",
+    f"^{SUBTYPE_SELECTION_PREFIX}",
+    f"^{SURVEY_TARGET_PREFIX}(?!back_to_category)",
+    f"^{SURVEY_SUBTARGET_PREFIX}",
+    f"^{SURVEY_TARGET_PREFIX}back_to_category$",
+    f"^{SEARCH_PAGINATION_PREFIX}",
+    "^menu_",
+    "^report_",
+    "^survey_create$",
+    "^survey_",
+]
+
+# Типичные нажатия: навигация по страницам и меню встречаются чаще остальных
+CLICK_MIX = [
+    (f"{SURVEY_PAGINATION_PREFIX}1", 10),
+    (f"{ALLSURVEYS_PAGINATION_PREFIX}3", 10),
+    (f"{ADD_RESPONSE_PAGINATION_PREFIX}close", 3),
+    (f"{SEARCH_PAGINATION_PREFIX}2", 8),
+    ("menu_response", 10),
+    ("menu_profile", 5),
+    ("menu_back", 3),
+    ("survey_create", 2),
+    ("survey_list", 4),
+    (f"{SURVEY_TARGET_PREFIX}worker", 2),
+    (f"{SURVEY_TARGET_PREFIX}back_to_category", 1),
+    (f"{SURVEY_SUBTARGET_PREFIX}developer", 2),
+    (f"{CATEGORY_SELECTION_PREFIX}worker", 1),
+    (f"{SUBTYPE_SELECTION_PREFIX}developer", 1),
+]
+
+
+async def _noop(update, context):
+    return None
+
+
+def _make_update(data: str) -> Update:
+    user = User(id=1, first_name='bench', is_bot=False)
+    query = CallbackQuery(id='1', from_user=user, chat_instance='bench', data=data)
+    return Update(update_id=1, callback_query=query)
+
+
+def _legacy_select(handlers, update):
+    """Как Application в одной группе: первый обработчик, чей шаблон совпал"""
+    for handler in handlers:
+        if handler.check_update(update):
+            return handler
+    return None
+
+
+def _router_select(handler, update):
+    """Фильтр единственного обработчика и выбор маршрута с разбором хвоста"""
+    if not handler.check_update(update):
+        return None
+    data = update.callback_query.data
+    route = callback_router.resolve(data)
+    if route.parse is not None:
+        route.parse(data[len(route.prefix):])
+    return route
+
+
+def _measure(select, target, updates) -> float:
+    started = time.perf_counter()
+    for update in updates:
+        select(target, update)
+    return time.perf_counter() - started
+
+
+def run_bench(args) -> dict:
+    # Маршруты регистрируются при сборке приложения - как при обычном запуске
+    from tg_bot.bot import build_application
+    build_application(Application.builder().token('0:bench'))
+
+    legacy_handlers = [CallbackQueryHandler(_noop, pattern=pattern) for pattern in LEGACY_PATTERNS]
+    router_handler = callback_router.handler()
+
+    rng = random.Random(args.seed)
+    population, weights = zip(*CLICK_MIX)
+    updates = [_make_update(data) for data in rng.choices(population, weights=weights, k=args.clicks)]
+
+    # Прогрев, затем лучший из нескольких повторов
+    _measure(_legacy_select, legacy_handlers, updates[:1000])
+    _measure(_router_select, router_handler, updates[:1000])
+    legacy = min(_measure(_legacy_select, legacy_handlers, updates) for _ in range(args.repeat))
+    router = min(_measure(_router_select, router_handler, updates) for _ in range(args.repeat))
+
+    return {
+        'clicks': args.clicks,
+        'routes': len(callback_router.routes),
+        'legacy_handlers': len(legacy_handlers),
+        'legacy_ns_per_click': round(legacy / args.clicks * 1e9, 1),
+        'router_ns_per_click': round(router / args.clicks * 1e9, 1),
+        'speedup': round(legacy / router, 2) if router else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк выбора обработчика нажатий inline-кнопок")
+    parser.add_argument('--clicks', type=int, default=100000, help="Число нажатий в замере")
+    parser.add_argument('--repeat', type=int, default=5, help="Число повторов (берется лучший)")
+    parser.add_argument('--seed', type=int, default=1, help="Seed для набора нажатий")
+    args = parser.parse_args()
+
+    print(json.dumps(run_bench(args), ensure_ascii=False, indent=2))
+
+
+if __name__ == '__main__':
+    main()
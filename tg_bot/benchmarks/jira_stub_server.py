@@ -0,0 +1,341 @@
+# -*- coding: utf-8 -*-
+"""
+Локальная замена Jira Cloud для офлайн-замеров синхронизации.
+
+Данные синтетические и детерминированные: сущность с номером i строится по
+запросу, поэтому даже 100k задач не занимают память сервера. Поддерживаются
+эндпоинты, которые используют JiraLoader и JiraIntegration:
+
+    GET  /rest/api/3/myself
+    GET  /rest/api/3/users/search        startAt, maxResults
+    GET  /rest/api/3/user/search         query
+    GET  /rest/api/3/project             (весь список)
+    GET  /rest/api/3/project/search      startAt, maxResults
+    GET  /rest/api/3/search/jql          jql, startAt | nextPageToken, maxResults
+    POST /rest/api/3/search/jql          то же в JSON-теле
+    GET  /rest/agile/1.0/board           startAt, maxResults
+    GET  /rest/agile/1.0/board/{id}/sprint
+
+Есть задержка ответа и ограничение частоты запросов (429 + Retry-After), как у Jira Cloud.
+
+Пример:
+    python -m tg_bot.benchmarks.jira_stub_server --issues 100000 --latency-ms 80 --rate-limit 50
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+STATUS_CATEGORIES = ['new', 'indeterminate', 'done']
+PRIORITIES = ['Highest', 'High', 'Medium', 'Low', 'Lowest']
+ISSUE_TYPES = [('Story', 0), ('Task', 0), ('Bug', 0), ('Epic', 1), ('Sub-task', -1)]
+SPRINT_STATES = ['closed', 'active', 'future']
+
+
+@dataclass
+class StubConfig:
+    users: int = 200
+    projects: int = 20
+    boards: int = 40
+    sprints_per_board: int = 12
+    issues: int = 10000
+    latency_ms: float = 50.0
+    jitter_ms: float = 20.0
+    rate_limit: float = 0.0  # запросов в секунду, 0 - без ограничения
+    throttle_rate: float = 0.0  # доля случайных 429 независимо от частоты
+    retry_after: int = 1
+    seed: int = 42
+
+
+class SyntheticJira:
+    """Генератор сущностей Jira по номеру"""
+
+    def __init__(self, cfg: StubConfig):
+        self.cfg = cfg
+        self.created_from = datetime.now() - timedelta(days=300)
+
+    def user(self, i: int) -> Dict:
+        return {
+            'accountId': f'5f{i:022d}',
+            'accountType': 'app' if i % 25 == 0 else 'atlassian',
+            'displayName': f'Stub User {i}',
+            'emailAddress': f'user{i}@stub.local',
+            'active': i % 40 != 0,
+        }
+
+    def project(self, i: int) -> Dict:
+        return {
+            'id': str(10000 + i),
+            'key': f'P{i}',
+            'name': f'Stub Project {i}',
+            'projectTypeKey': 'software',
+        }
+
+    def board(self, i: int) -> Dict:
+        return {
+            'id': i + 1,
+            'name': f'Stub Board {i + 1}',
+            'type': 'scrum',
+            'location': {'projectKey': f'P{i % self.cfg.projects}'},
+        }
+
+    def sprint(self, board_id: int, i: int) -> Dict:
+        start = self.created_from + timedelta(days=14 * i)
+        state = SPRINT_STATES[0] if i < self.cfg.sprints_per_board - 2 else SPRINT_STATES[i - self.cfg.sprints_per_board + 3]
+        return {
+            'id': board_id * 1000 + i,
+            'name': f'Board {board_id} Sprint {i + 1}',
+            'state': state,
+            'startDate': start.strftime('%Y-%m-%dT%H:%M:%S.000Z'),
+            'endDate': (start + timedelta(days=14)).strftime('%Y-%m-%dT%H:%M:%S.000Z'),
+            'originBoardId': board_id,
+        }
+
+    def issue(self, i: int) -> Dict:
+        # Новые задачи первыми, как в "order by created DESC"
+        number = self.cfg.issues - i
+        project = number % self.cfg.projects
+        board_id = number % self.cfg.boards + 1
+        issue_type, level = ISSUE_TYPES[number % len(ISSUE_TYPES)]
+        reporter = self.user(number % self.cfg.users)
+        assignee = self.user((number * 7) % self.cfg.users) if number % 5 else None
+        created = self.created_from + timedelta(minutes=number * 300 * 24 * 60 // max(self.cfg.issues, 1))
+        return {
+            'id': str(100000 + number),
+            'key': f'P{project}-{number}',
+            'fields': {
+                'summary': f'Synthetic issue {number}',
+                'status': {'name': 'Status', 'statusCategory': {'key': STATUS_CATEGORIES[number % 3]}},
+                'assignee': {'displayName': assignee['displayName']} if assignee else None,
+                'reporter': {'displayName': reporter['displayName']},
+                'priority': {'name': PRIORITIES[number % len(PRIORITIES)]},
+                'issuetype': {'name': issue_type, 'hierarchyLevel': level},
+                'project': {'key': f'P{project}'},
+                'created': created.strftime('%Y-%m-%dT%H:%M:%S.000+0000'),
+                'updated': created.strftime('%Y-%m-%dT%H:%M:%S.000+0000'),
+                'labels': [],
+                'description': None,
+                'customfield_10020': [self.sprint(board_id, number % self.cfg.sprints_per_board)],
+            },
+        }
+
+
+class RateLimiter:
+    """Token bucket: при исчерпании - 429 с Retry-After"""
+
+    def __init__(self, rate: float):
+        self.rate = rate
+        self.tokens = rate
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def allow(self) -> bool:
+        if not self.rate:
+            return True
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            return False
+
+
+class JiraStubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address: Tuple[str, int], cfg: StubConfig):
+        super().__init__(address, JiraStubHandler)
+        self.cfg = cfg
+        self.data = SyntheticJira(cfg)
+        self.limiter = RateLimiter(cfg.rate_limit)
+        self.random = random.Random(cfg.seed)
+        self.requests = Counter()
+        self.throttled = 0
+        self.stats_lock = threading.Lock()
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def stats(self) -> Dict:
+        with self.stats_lock:
+            return {'requests': dict(self.requests), 'total': sum(self.requests.values()), 'throttled': self.throttled}
+
+
+def _page(total: int, start_at: int, max_results: int, build) -> Tuple[List[Dict], bool]:
+    start_at = max(0, start_at)
+    end = min(total, start_at + max_results)
+    return [build(i) for i in range(start_at, end)], end >= total
+
+
+class JiraStubHandler(BaseHTTPRequestHandler):
+    server: JiraStubServer
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, body, headers: Optional[Dict] = None):
+        payload = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _throttle(self, route: str) -> bool:
+        server = self.server
+        cfg = server.cfg
+        with server.stats_lock:
+            server.requests[route] += 1
+            random_throttle = cfg.throttle_rate and server.random.random() < cfg.throttle_rate
+
+        if random_throttle or not server.limiter.allow():
+            with server.stats_lock:
+                server.throttled += 1
+            self._send_json(429, {'errorMessages': ['Rate limit exceeded']}, {'Retry-After': str(cfg.retry_after)})
+            return True
+
+        delay = max(0.0, server.random.gauss(cfg.latency_ms, cfg.jitter_ms)) / 1000
+        time.sleep(delay)
+        return False
+
+    def _params(self, body: Optional[Dict] = None) -> Dict:
+        query = {key: values[-1] for key, values in parse_qs(urlparse(self.path).query).items()}
+        if body:
+            query.update({key: value for key, value in body.items() if not isinstance(value, (list, dict))})
+        return query
+
+    def do_GET(self):
+        self._dispatch(self._params())
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = json.loads(self.rfile.read(length) or b'{}') if length else {}
+        self._dispatch(self._params(body))
+
+    def _dispatch(self, params: Dict):
+        path = urlparse(self.path).path.rstrip('/')
+        data = self.server.data
+        cfg = self.server.cfg
+
+        start_at = int(params.get('startAt', 0))
+        sprint_match = re.fullmatch(r'/rest/agile/1\.0/board/(\d+)/sprint', path)
+        route = '/rest/agile/1.0/board/{id}/sprint' if sprint_match else path
+
+        if self._throttle(route):
+            return
+
+        if path == '/rest/api/3/myself':
+            self._send_json(200, {'accountId': 'stub', 'displayName': 'Stub Admin'})
+
+        elif path == '/rest/api/3/users/search':
+            users, _ = _page(cfg.users, start_at, min(int(params.get('maxResults', 50)), 1000), data.user)
+            self._send_json(200, users)
+
+        elif path == '/rest/api/3/user/search':
+            query = params.get('query', '').lower()
+            users = [data.user(i) for i in range(cfg.users) if query in data.user(i)['displayName'].lower()]
+            self._send_json(200, users[:50])
+
+        elif path == '/rest/api/3/project':
+            self._send_json(200, [data.project(i) for i in range(cfg.projects)])
+
+        elif path == '/rest/api/3/project/search':
+            max_results = min(int(params.get('maxResults', 50)), 100)
+            values, is_last = _page(cfg.projects, start_at, max_results, data.project)
+            self._send_json(200, {'startAt': start_at, 'maxResults': max_results, 'total': cfg.projects,
+                                  'isLast': is_last, 'values': values})
+
+        elif path == '/rest/agile/1.0/board':
+            max_results = min(int(params.get('maxResults', 50)), 100)
+            values, is_last = _page(cfg.boards, start_at, max_results, data.board)
+            self._send_json(200, {'startAt': start_at, 'maxResults': max_results, 'total': cfg.boards,
+                                  'isLast': is_last, 'values': values})
+
+        elif sprint_match:
+            board_id = int(sprint_match.group(1))
+            if not 1 <= board_id <= cfg.boards:
+                self._send_json(404, {'errorMessages': ['Board does not exist']})
+                return
+            max_results = min(int(params.get('maxResults', 50)), 50)
+            values, is_last = _page(cfg.sprints_per_board, start_at, max_results,
+                                    lambda i: data.sprint(board_id, i))
+            self._send_json(200, {'startAt': start_at, 'maxResults': max_results, 'isLast': is_last, 'values': values})
+
+        elif path == '/rest/api/3/search/jql':
+            # Поддерживаются оба вида пагинации: startAt/total и nextPageToken
+            if params.get('nextPageToken'):
+                start_at = int(params['nextPageToken'])
+            max_results = min(int(params.get('maxResults', 50)), 100)
+            issues, is_last = _page(cfg.issues, start_at, max_results, data.issue)
+            body = {'startAt': start_at, 'maxResults': max_results, 'total': cfg.issues,
+                    'isLast': is_last, 'issues': issues}
+            if not is_last:
+                body['nextPageToken'] = str(start_at + max_results)
+            self._send_json(200, body)
+
+        else:
+            self._send_json(404, {'errorMessages': [f'No stub for {path}']})
+
+
+def start_stub_server(cfg: StubConfig, host: str = '127.0.0.1', port: int = 0) -> JiraStubServer:
+    """Запуск сервера в фоновом потоке (port=0 - любой свободный порт)"""
+    server = JiraStubServer((host, port), cfg)
+    thread = threading.Thread(target=server.serve_forever, name='jira-stub', daemon=True)
+    thread.start()
+    return server
+
+
+def add_stub_arguments(parser: argparse.ArgumentParser):
+    defaults = StubConfig()
+    parser.add_argument('--users', type=int, default=defaults.users)
+    parser.add_argument('--projects', type=int, default=defaults.projects)
+    parser.add_argument('--boards', type=int, default=defaults.boards)
+    parser.add_argument('--sprints-per-board', type=int, default=defaults.sprints_per_board)
+    parser.add_argument('--issues', type=int, default=defaults.issues)
+    parser.add_argument('--latency-ms', type=float, default=defaults.latency_ms)
+    parser.add_argument('--jitter-ms', type=float, default=defaults.jitter_ms)
+    parser.add_argument('--rate-limit', type=float, default=defaults.rate_limit, help="Запросов в секунду (0 - без лимита)")
+    parser.add_argument('--throttle-rate', type=float, default=defaults.throttle_rate, help="Доля случайных 429")
+    parser.add_argument('--retry-after', type=int, default=defaults.retry_after)
+    parser.add_argument('--seed', type=int, default=defaults.seed)
+
+
+def stub_config_from_args(args) -> StubConfig:
+    return StubConfig(
+        users=args.users, projects=args.projects, boards=args.boards, sprints_per_board=args.sprints_per_board,
+        issues=args.issues, latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, rate_limit=args.rate_limit,
+        throttle_rate=args.throttle_rate, retry_after=args.retry_after, seed=args.seed,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Локальная замена Jira Cloud с синтетическими данными")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8089)
+    add_stub_arguments(parser)
+    args = parser.parse_args()
+
+    server = JiraStubServer((args.host, args.port), stub_config_from_args(args))
+    print(f"Jira stub: {server.base_url} (JIRA_URL={server.base_url})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(json.dumps(server.stats(), indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""
+Замер синхронизации Jira на локальной замене Jira Cloud (jira_stub_server).
+
+Запускает stub-сервер в фоне, направляет на него JiraLoader и выполняет полную
+загрузку (load_all_data). Данные пишутся в БД из .env - запускать на тестовой базе.
+
+Пример:
+    python -m tg_bot.benchmarks.jira_sync_bench --issues 100000 --max-tasks 100000 --rate-limit 100 --clear
+"""
+import argparse
+import json
+import resource
+import time
+import tracemalloc
+
+from tg_bot.benchmarks.jira_stub_server import add_stub_arguments, start_stub_server, stub_config_from_args
+from tg_bot.config.settings import config
+from tg_bot.database.instrumentation import query_stats
+from tg_bot.services.jira_loader import JiraLoader
+from tg_bot.services.metrics import metrics
+
+
+def run_bench(args) -> dict:
+    server = start_stub_server(stub_config_from_args(args))
+
+    # JiraLoader читает настройки в конструкторе - подменяем до создания загрузчика
+    config.JIRA_URL = server.base_url
+    config.JIRA_EMAIL = 'bench@stub.local'
+    config.JIRA_API_TOKEN = 'stub-token'
+    config.JIRA_MAX_TASKS = args.max_tasks
+
+    loader = JiraLoader()
+    if args.clear:
+        loader.clear_old_data()
+
+    query_stats.reset()
+    requests_before = server.stats()['total']
+    tracemalloc.start()
+    started = time.perf_counter()
+    success = loader.load_all_data()
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    stage_rows = {dict(labels)['stage']: value for labels, value in metrics.get_values('jira_sync_stage_rows').items()}
+    stage_ms = {dict(labels)['stage']: value
+                for labels, value in metrics.get_values('jira_sync_stage_duration_ms').items()}
+    total_rows = sum(stage_rows.values())
+    server_stats = server.stats()
+    server.shutdown()
+
+    return {
+        'success': success,
+        'wall_time_s': round(elapsed, 2),
+        'rows_saved': stage_rows,
+        'rows_per_s': round(total_rows / elapsed, 1) if elapsed else 0.0,
+        'stage_duration_ms': stage_ms,
+        'http_requests': server_stats['total'] - requests_before,
+        'http_requests_by_endpoint': server_stats['requests'],
+        'http_throttled': server_stats['throttled'],
+        'loader_retries': loader.throttled_count,
+        'db_queries': sum(histogram.count for histogram in query_stats.latency.values()),
+        'db_connections': query_stats.connection_acquire.count,
+        'peak_traced_memory_mb': round(peak / 1024 / 1024, 1),
+        'max_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк синхронизации Jira на stub-сервере")
+    add_stub_arguments(parser)
+    parser.add_argument('--max-tasks', type=int, default=config.JIRA_MAX_TASKS, help="Лимит задач (JIRA_MAX_TASKS)")
+    parser.add_argument('--clear', action='store_true', help="Очистить таблицы Jira перед загрузкой")
+    args = parser.parse_args()
+
+    print(json.dumps(run_bench(args), ensure_ascii=False, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,317 @@
+# -*- coding: utf-8 -*-
+"""
+Нагрузочный тест обработчиков: виртуальные пользователи проходят регистрацию,
+/response с ответом из нескольких частей и листание страниц. Update собираются
+синтетически и идут через те же обработчики, что и в main() (build_application).
+
+Telegram подменяется транспортом RecordingRequest: исходящие вызовы Bot API
+не уходят в сеть, а записываются и отвечают с заданной задержкой.
+БД используется настоящая (из .env): перед прогоном создается активный опрос
+для роли виртуальных пользователей, сами пользователи регистрируются с
+telegram_username вида loadtest_<id>. Тестовые данные удаляются в конце.
+Запущенный на той же БД бот может разослать этот опрос настоящим сотрудникам,
+поэтому для PostgreSQL нужен явный флаг --allow-db-writes (запускать на тестовой базе).
+
+Пример:
+    python -m tg_bot.benchmarks.load_test --users 200 --api-latency-ms 40 --allow-db-writes
+"""
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import time
+from collections import Counter, defaultdict
+from datetime import datetime
+from itertools import count
+from typing import Dict, List, Optional
+
+from telegram import Update
+from telegram.ext import Application, ContextTypes
+from telegram.request import BaseRequest, RequestData
+
+from tg_bot.bot import build_application
+from tg_bot.config.constants import CATEGORY_SELECTION_PREFIX, SUBTYPE_SELECTION_PREFIX, SURVEY_PAGINATION_PREFIX
+from tg_bot.config.settings import config
+from tg_bot.database.connection import db_connection
+from tg_bot.database.instrumentation import query_stats
+from tg_bot.database.persistence import CHAT_KIND, CONVERSATION_KIND_PREFIX, USER_KIND
+from tg_bot.services.metrics import metrics
+
+FAKE_TOKEN = '123456:LOADTEST'
+BOT_USER = {'id': 123456, 'is_bot': True, 'first_name': 'LoadTest', 'username': 'loadtest_bot'}
+# Методы Bot API, которые возвращают Message
+MESSAGE_METHODS = {'sendMessage', 'editMessageText', 'editMessageReplyMarkup'}
+USER_ID_BASE = 7_000_000_000
+# Роль, которую выбирают виртуальные пользователи при регистрации (VirtualUser.scenario)
+LOAD_ROLE = 'worker'
+LOAD_USERNAME_PREFIX = 'loadtest_'
+
+
+class RecordingRequest(BaseRequest):
+    """Транспорт Bot API без сети: записывает вызовы и отвечает с задержкой"""
+
+    def __init__(self, latency_ms: float = 30.0, jitter_ms: float = 10.0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.calls: Counter = Counter()
+        self._message_ids = count(1)
+
+    @property
+    def read_timeout(self) -> Optional[float]:
+        return None
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
+
+    def _result(self, method: str, params: Dict):
+        if method == 'getMe':
+            return BOT_USER
+        if method in MESSAGE_METHODS:
+            chat_id = params.get('chat_id') or 0
+            return {
+                'message_id': params.get('message_id') or next(self._message_ids),
+                'date': int(time.time()),
+                'chat': {'id': int(chat_id), 'type': 'private'},
+                'from': BOT_USER,
+                'text': params.get('text', ''),
+            }
+        return True
+
+    async def do_request(self, url: str, method: str, request_data: Optional[RequestData] = None,
+                         read_timeout=None, write_timeout=None, connect_timeout=None, pool_timeout=None):
+        api_method = url.rsplit('/', 1)[-1]
+        self.calls[api_method] += 1
+
+        delay_ms = max(0.0, random.gauss(self.latency_ms, self.jitter_ms))
+        await asyncio.sleep(delay_ms / 1000)
+
+        params = request_data.parameters if request_data else {}
+        payload = {'ok': True, 'result': self._result(api_method, params)}
+        return 200, json.dumps(payload).encode('utf-8')
+
+
+class VirtualUser:
+    """Синтетический пользователь Telegram, генерирующий update"""
+
+    _update_ids = count(1)
+    _message_ids = count(1)
+
+    def __init__(self, index: int, bot):
+        self.tg_id = USER_ID_BASE + index
+        self.bot = bot
+        self.user = {
+            'id': self.tg_id,
+            'is_bot': False,
+            'first_name': f'Load{index}',
+            'username': f'{LOAD_USERNAME_PREFIX}{self.tg_id}',
+        }
+        self.chat = {'id': self.tg_id, 'type': 'private'}
+
+    def _message(self, text: str) -> Dict:
+        message = {
+            'message_id': next(self._message_ids),
+            'date': int(time.time()),
+            'chat': self.chat,
+            'from': self.user,
+            'text': text,
+        }
+        if text.startswith('/'):
+            message['entities'] = [{'type': 'bot_command', 'offset': 0, 'length': len(text.split()[0])}]
+        return message
+
+    def text(self, text: str) -> Update:
+        return Update.de_json({'update_id': next(self._update_ids), 'message': self._message(text)}, self.bot)
+
+    def click(self, data: str) -> Update:
+        callback = {
+            'id': str(next(self._update_ids)),
+            'from': self.user,
+            'chat_instance': str(self.tg_id),
+            'data': data,
+            'message': {**self._message('menu'), 'from': BOT_USER},
+        }
+        return Update.de_json({'update_id': next(self._update_ids), 'callback_query': callback}, self.bot)
+
+    def scenario(self, answer_parts: int) -> List[Update]:
+        """Регистрация -> /response с ответом из нескольких частей -> листание страниц"""
+        steps = [
+            self.text('/start'),
+            self.text(config.REGISTRATION_PASSWORD),
+            self.text('Нагрузочный Тест'),
+            self.text('нет'),
+            self.click(f'{CATEGORY_SELECTION_PREFIX}worker'),
+            self.click(f'{SUBTYPE_SELECTION_PREFIX}{LOAD_ROLE}'),
+            self.text('/response'),
+            self.text('1'),
+        ]
+        steps += [self.text(f'Часть ответа {i + 1} от {self.tg_id}') for i in range(answer_parts)]
+        steps += [
+            self.text('/done'),
+            self.text('/response'),
+            self.click(f'{SURVEY_PAGINATION_PREFIX}1'),
+            self.click(f'{SURVEY_PAGINATION_PREFIX}0'),
+            self.text('/cancel'),
+        ]
+        return steps
+
+
+def _execute(query: str, params=None, fetch: bool = False):
+    connection = db_connection.get_connection()
+    if not connection:
+        raise RuntimeError("Нет подключения к БД")
+    cursor = connection.cursor()
+    try:
+        cursor.execute(query, params)
+        rows = cursor.fetchall() if fetch else None
+        connection.commit()
+        return rows
+    finally:
+        cursor.close()
+        connection.close()
+
+
+def create_fixtures() -> int:
+    """Активный опрос для роли виртуальных пользователей - самый новый, первый в списке /response"""
+    rows = _execute(
+        "INSERT INTO surveys (datetime, question, role, state) VALUES (%s, %s, %s, 'active') RETURNING id_survey",
+        (datetime.now(), "Нагрузочный тест: опрос", LOAD_ROLE), fetch=True
+    )
+    return rows[0][0]
+
+
+def cleanup_fixtures(survey_id: int, users: List['VirtualUser']):
+    """Удаление опроса, ответов и пользователей теста, а также их сохраненного состояния"""
+    _execute(
+        "UPDATE report_daily_answers "
+        "SET answers = answers - (SELECT COUNT(*) FROM responses WHERE id_survey = %s) "
+        "WHERE day = %s AND role = %s",
+        (survey_id, datetime.now().date(), LOAD_ROLE)
+    )
+    _execute("DELETE FROM response_parts WHERE id_response IN "
+             "(SELECT id_response FROM responses WHERE id_survey = %s)", (survey_id,))
+    _execute("DELETE FROM reminders WHERE survey_id = %s", (survey_id,))
+    _execute("DELETE FROM survey_deliveries WHERE survey_id = %s", (survey_id,))
+    _execute("DELETE FROM responses WHERE id_survey = %s", (survey_id,))
+    _execute("DELETE FROM report_survey_stats WHERE id_survey = %s", (survey_id,))
+    _execute("DELETE FROM surveys WHERE id_survey = %s", (survey_id,))
+    # Точное совпадение: в LIKE символ _ префикса - шаблон, под него попали бы и настоящие пользователи
+    _execute("DELETE FROM users WHERE tg_id = ANY(%s) AND tg_username = ANY(%s)",
+             ([user.tg_id for user in users], [user.user['username'] for user in users]))
+
+    user_keys = [str(user.tg_id) for user in users]
+    conversation_keys = [json.dumps([user.tg_id, user.tg_id]) for user in users]
+    _execute("DELETE FROM bot_persistence WHERE kind = ANY(%s) AND key = ANY(%s)", ([USER_KIND, CHAT_KIND], user_keys))
+    _execute("DELETE FROM bot_persistence WHERE kind LIKE %s AND key = ANY(%s)",
+             (CONVERSATION_KIND_PREFIX + '%', conversation_keys))
+
+
+def count_errors(errors: Counter):
+    """Обработчик ошибок приложения: исключения обработчиков PTB перехватывает сам и передает сюда"""
+    async def error_handler(update: object, context: ContextTypes.DEFAULT_TYPE):
+        errors[type(context.error).__name__] += 1
+    return error_handler
+
+
+async def run_user(application: Application, user: VirtualUser, answer_parts: int, think_ms: float,
+                   latencies: List[float]):
+    for update in user.scenario(answer_parts):
+        started = time.perf_counter()
+        # Так же, как Application передает update из очереди в обработчик update
+        await application.update_processor.process_update(update, application.process_update(update))
+        latencies.append((time.perf_counter() - started) * 1000)
+        if think_ms:
+            await asyncio.sleep(random.uniform(0, think_ms) / 1000)
+
+
+def _percentile(values: List[float], p: float) -> float:
+    if not values:
+        return 0.0
+    index = min(len(values) - 1, max(0, int(round(len(values) * p / 100)) - 1))
+    return round(values[index], 2)
+
+
+def _db_queries_per_update() -> Dict:
+    """Среднее число запросов к БД на update - по данным учета update (update_tracking)"""
+    per_handler = {}
+    total_queries = total_updates = 0
+    for labels, histogram in metrics.get_histograms('bot_handler_db_queries').items():
+        handler = dict(labels).get('handler', '?')
+        per_handler[handler] = round(histogram.total_ms / histogram.count, 2) if histogram.count else 0.0
+        total_queries += histogram.total_ms
+        total_updates += histogram.count
+    return {
+        'avg': round(total_queries / total_updates, 2) if total_updates else 0.0,
+        'per_handler': dict(sorted(per_handler.items())),
+    }
+
+
+async def run_load_test(users: int, answer_parts: int, api_latency_ms: float, think_ms: float) -> Dict:
+    request = RecordingRequest(latency_ms=api_latency_ms)
+    builder = Application.builder().token(FAKE_TOKEN).request(request).get_updates_request(RecordingRequest(0, 0))
+    application = build_application(builder)
+
+    latencies: List[float] = []
+    errors: Counter = Counter()
+    application.add_error_handler(count_errors(errors))
+    survey_id = create_fixtures()
+    virtual_users = [VirtualUser(i, application.bot) for i in range(users)]
+    query_stats.reset()
+
+    try:
+        async with application:
+            started = time.perf_counter()
+            await asyncio.gather(*(
+                run_user(application, user, answer_parts, think_ms, latencies) for user in virtual_users
+            ))
+            elapsed = time.perf_counter() - started
+        answered = _execute("SELECT COUNT(*) FROM responses WHERE id_survey = %s", (survey_id,), fetch=True)[0][0]
+    finally:
+        cleanup_fixtures(survey_id, virtual_users)
+
+    latencies.sort()
+    slowest = defaultdict(float)
+    for labels, histogram in metrics.get_histograms('bot_handler_latency_ms').items():
+        slowest[dict(labels).get('handler', '?')] = histogram.percentile(99)
+
+    return {
+        'virtual_users': users,
+        'updates': len(latencies),
+        'elapsed_s': round(elapsed, 3),
+        'updates_per_s': round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        'latency_ms': {
+            'p50': round(statistics.median(latencies), 2) if latencies else 0.0,
+            'p99': _percentile(latencies, 99),
+            'max': round(latencies[-1], 2) if latencies else 0.0,
+        },
+        'handler_p99_ms': dict(sorted(slowest.items(), key=lambda item: -item[1])),
+        'survey_answers_saved': answered,
+        'db_queries_per_update': _db_queries_per_update(),
+        'db_connections_opened': query_stats.connection_acquire.count,
+        'bot_api_calls': dict(request.calls),
+        'errors': dict(errors),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Нагрузочный тест обработчиков бота")
+    parser.add_argument('--users', type=int, default=50, help="Число виртуальных пользователей")
+    parser.add_argument('--answer-parts', type=int, default=3, help="Частей в ответе на опрос")
+    parser.add_argument('--api-latency-ms', type=float, default=30.0, help="Задержка ответа Bot API, мс")
+    parser.add_argument('--think-ms', type=float, default=0.0, help="Пауза пользователя между действиями, мс")
+    parser.add_argument('--allow-db-writes', action='store_true',
+                        help="Разрешить тестовые данные в PostgreSQL из .env (только тестовая база)")
+    args = parser.parse_args()
+    if config.DB_BACKEND != 'sqlite' and not args.allow_db_writes:
+        parser.error("тест создает активный опрос и пользователей в БД из .env - "
+                     "запускайте на тестовой базе с флагом --allow-db-writes")
+
+    result = asyncio.run(run_load_test(args.users, args.answer_parts, args.api_latency_ms, args.think_ms))
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,237 @@
+# -*- coding: utf-8 -*-
+"""
+Симуляция SurveyScheduler на виртуальном времени.
+
+Создается N опросов для M тестовых пользователей, планировщик запускается с
+VirtualClock и бот-заглушкой, время продвигается до отправки всех опросов и
+напоминаний. Замеряются задержка доставки относительно срока, число запросов
+к БД на доставленное сообщение и память на запланированный опрос.
+
+Запросы идут в настоящую БД из .env - запускать на отдельной (тестовой) базе:
+планировщик видит все активные опросы. Для PostgreSQL нужен явный флаг
+--allow-db-writes. Тестовые данные удаляются в конце.
+
+Пример:
+    python -m tg_bot.benchmarks.scheduler_sim --surveys 50 --users 40 --horizon 3600 --restart-after 1800 --allow-db-writes
+"""
+import argparse
+import asyncio
+import json
+import random
+import re
+import statistics
+import tracemalloc
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Dict, List, Tuple
+
+from tg_bot.config.constants import REMINDER_INTERVALS, SCHEDULER_CHECK_INTERVAL
+from tg_bot.config.settings import config
+from tg_bot.database.connection import db_connection
+from tg_bot.database.instrumentation import query_stats
+from tg_bot.handlers.scheduler import SurveyScheduler
+from tg_bot.services.clock import VirtualClock
+
+SIM_ROLE = 'specialist'
+SIM_USERNAME_PREFIX = 'schedsim_'
+SIM_TG_ID_BASE = 1_900_000_000
+
+SURVEY_ID_RE = re.compile(r"ID опроса: (\d+)")
+# Пункт сводного напоминания (см. SurveyScheduler.send_reminder_digest)
+DIGEST_ENTRY_RE = re.compile(r"ID опроса: (\d+), этап (\d+)")
+# Начало текста напоминания -> этап (см. SurveyScheduler.send_reminder_to_user)
+REMINDER_PREFIXES = {'Первое': 1, 'Второе': 2, 'Финальное': 3}
+
+
+class RecordingBot:
+    """Заглушка telegram.Bot: запоминает отправленные сообщения с виртуальным временем"""
+
+    def __init__(self, clock: VirtualClock, failure_rate: float = 0.0):
+        self.clock = clock
+        self.failure_rate = failure_rate
+        self.sent: List[Tuple[datetime, int, str]] = []
+        self.failed = 0
+
+    async def send_message(self, chat_id, text, **kwargs):
+        await asyncio.sleep(0)
+        if self.failure_rate and random.random() < self.failure_rate:
+            self.failed += 1
+            raise RuntimeError("Симулированная ошибка Bot API")
+        self.sent.append((self.clock.now(), chat_id, text))
+
+
+def _execute(query: str, params=None, fetch: bool = False):
+    connection = db_connection.get_connection()
+    if not connection:
+        raise RuntimeError("Нет подключения к БД")
+    cursor = connection.cursor()
+    try:
+        cursor.execute(query, params)
+        rows = cursor.fetchall() if fetch else None
+        connection.commit()
+        return rows
+    finally:
+        cursor.close()
+        connection.close()
+
+
+def create_fixtures(users: int, surveys: int, start: datetime, horizon: int) -> Dict[int, datetime]:
+    """Тестовые пользователи и опросы; возвращает {id_survey: время отправки}"""
+    for i in range(users):
+        _execute(
+            "INSERT INTO users (name, user_name, tg_username, role, tg_id) VALUES (%s, %s, %s, %s, %s)",
+            (f"Sim {i}", f"Sim {i}", f"{SIM_USERNAME_PREFIX}{i}", SIM_ROLE, SIM_TG_ID_BASE + i)
+        )
+
+    survey_times = {}
+    for i in range(surveys):
+        send_time = start + timedelta(seconds=random.randint(60, max(60, horizon)))
+        rows = _execute(
+            "INSERT INTO surveys (datetime, question, role, state) VALUES (%s, %s, %s, 'active') RETURNING id_survey",
+            (send_time, f"Симуляция: опрос {i}", SIM_ROLE), fetch=True
+        )
+        survey_times[rows[0][0]] = send_time
+    return survey_times
+
+
+def cleanup_fixtures(survey_ids: List[int], users: int):
+    if survey_ids:
+        _execute("DELETE FROM reminders WHERE survey_id = ANY(%s)", (survey_ids,))
+        _execute("DELETE FROM survey_deliveries WHERE survey_id = ANY(%s)", (survey_ids,))
+        _execute("DELETE FROM responses WHERE id_survey = ANY(%s)", (survey_ids,))
+        _execute("DELETE FROM surveys WHERE id_survey = ANY(%s)", (survey_ids,))
+    # Точное совпадение: в LIKE символ _ префикса - шаблон, под него попали бы и настоящие пользователи
+    _execute("DELETE FROM users WHERE tg_id = ANY(%s) AND tg_username = ANY(%s)",
+             ([SIM_TG_ID_BASE + i for i in range(users)], [f"{SIM_USERNAME_PREFIX}{i}" for i in range(users)]))
+
+
+def analyze(sent: List[Tuple[datetime, int, str]], survey_times: Dict[int, datetime], users: int) -> Dict:
+    lags = {'survey': [], 'reminder': []}
+    deliveries = Counter()
+
+    for delivered_at, chat_id, text in sent:
+        entries = [(int(survey_id), int(stage)) for survey_id, stage in DIGEST_ENTRY_RE.findall(text)]
+        if not entries:
+            match = SURVEY_ID_RE.search(text)
+            if not match:
+                continue
+            stage = next((value for prefix, value in REMINDER_PREFIXES.items() if text.startswith(prefix)), 0)
+            entries = [(int(match.group(1)), stage)]
+
+        for survey_id, stage in entries:
+            if survey_id not in survey_times:
+                continue
+            due = survey_times[survey_id] + timedelta(seconds=REMINDER_INTERVALS.get(stage, 0))
+            lags['reminder' if stage else 'survey'].append((delivered_at - due).total_seconds())
+            deliveries[(survey_id, chat_id, stage)] += 1
+
+    def summary(values: List[float]) -> Dict:
+        if not values:
+            return {'count': 0}
+        values = sorted(values)
+        return {
+            'count': len(values),
+            'p50_s': round(statistics.median(values), 1),
+            'p99_s': round(values[min(len(values) - 1, int(len(values) * 0.99))], 1),
+            'max_s': round(values[-1], 1),
+        }
+
+    return {
+        'survey_lag': summary(lags['survey']),
+        'reminder_lag': summary(lags['reminder']),
+        'duplicate_deliveries': sum(n - 1 for n in deliveries.values() if n > 1),
+        # Доставленные опросы (без напоминаний) тестовым пользователям
+        'surveys_delivered': sum(1 for survey_id, chat_id, stage in deliveries
+                                 if not stage and SIM_TG_ID_BASE <= chat_id < SIM_TG_ID_BASE + users),
+    }
+
+
+async def _start_scheduler(bot: RecordingBot, clock: VirtualClock) -> Tuple[SurveyScheduler, asyncio.Task]:
+    scheduler = SurveyScheduler(bot, clock=clock)
+    await scheduler.sync_leadership()
+    return scheduler, asyncio.create_task(scheduler.periodic_check())
+
+
+async def _stop_scheduler(scheduler: SurveyScheduler, task: asyncio.Task):
+    await scheduler.stop()
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+
+
+async def simulate(surveys: int, users: int, horizon: int, restart_after: int, failure_rate: float) -> Dict:
+    start = datetime.now().replace(microsecond=0)
+    clock = VirtualClock(start)
+    bot = RecordingBot(clock, failure_rate)
+
+    survey_times = create_fixtures(users, surveys, start, horizon)
+    try:
+        query_stats.reset()
+
+        tracemalloc.start()
+        before, _ = tracemalloc.get_traced_memory()
+        scheduler, task = await _start_scheduler(bot, clock)
+        after, _ = tracemalloc.get_traced_memory()
+        scheduled = len(scheduler.scheduled_tasks)
+
+        end = start + timedelta(seconds=horizon + max(REMINDER_INTERVALS.values()) + 2 * SCHEDULER_CHECK_INTERVAL)
+        restarts = 0
+        if restart_after and restart_after < horizon:
+            # Перезапуск посреди симуляции: новый планировщик восстанавливает состояние из БД
+            await clock.advance_to(start + timedelta(seconds=restart_after))
+            await _stop_scheduler(scheduler, task)
+            scheduler, task = await _start_scheduler(bot, clock)
+            restarts = 1
+
+        await clock.advance_to(end)
+        await _stop_scheduler(scheduler, task)
+
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        total_queries = sum(histogram.count for histogram in query_stats.latency.values())
+        delivered = len(bot.sent)
+        stats = analyze(bot.sent, survey_times, users)
+        # Без симулированных ошибок каждый опрос должен дойти до каждого пользователя
+        if not failure_rate and stats['surveys_delivered'] != surveys * users:
+            raise AssertionError(f"Доставлено опросов {stats['surveys_delivered']}, ожидалось {surveys * users}")
+        return {
+            'surveys': surveys,
+            'users': users,
+            'virtual_seconds': int((clock.now() - start).total_seconds()),
+            'restarts': restarts,
+            'messages_delivered': delivered,
+            'messages_failed': bot.failed,
+            **stats,
+            'db_queries': total_queries,
+            'db_queries_per_message': round(total_queries / delivered, 2) if delivered else None,
+            'db_connections': query_stats.connection_acquire.count,
+            'scheduled_surveys': scheduled,
+            'memory_per_scheduled_survey_bytes': (after - before) // scheduled if scheduled else None,
+            'peak_traced_memory_kb': peak // 1024,
+        }
+    finally:
+        cleanup_fixtures(list(survey_times), users)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Симуляция планировщика опросов на виртуальном времени")
+    parser.add_argument('--surveys', type=int, default=20, help="Число опросов")
+    parser.add_argument('--users', type=int, default=20, help="Число пользователей на опрос")
+    parser.add_argument('--horizon', type=int, default=3600, help="Опросы распределяются на N секунд вперед")
+    parser.add_argument('--restart-after', type=int, default=0, help="Перезапуск планировщика через N секунд")
+    parser.add_argument('--failure-rate', type=float, default=0.0, help="Доля ошибок отправки (0..1)")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--allow-db-writes', action='store_true',
+                        help="Разрешить тестовые данные в PostgreSQL из .env (только тестовая база)")
+    args = parser.parse_args()
+    if config.DB_BACKEND != 'sqlite' and not args.allow_db_writes:
+        parser.error("симуляция создает активные опросы и пользователей в БД из .env - "
+                     "запускайте на тестовой базе с флагом --allow-db-writes")
+
+    random.seed(args.seed)
+    result = asyncio.run(simulate(args.surveys, args.users, args.horizon, args.restart_after, args.failure_rate))
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+"""
+Прогон записанных update через webhook бота для замера пропускной способности.
+
+По умолчанию бот поднимается в этом же процессе: build_application с транспортом
+RecordingRequest (из load_test) и встроенный webhook-сервер PTB на 127.0.0.1.
+Вызовы Bot API (getMe, setWebhook, ответы синтетическим чатам) в Telegram не уходят.
+Фоновые задачи post_init (планировщик, отчеты) не запускаются; БД - из .env.
+С --url скрипт шлет запросы во внешний, отдельно запущенный бот (BOT_MODE=webhook).
+
+Скрипт шлет POST-запросы так же, как это делает Telegram
+(JSON update + заголовок X-Telegram-Bot-Api-Secret-Token).
+
+Примеры:
+    python -m tg_bot.benchmarks.webhook_replay --synthetic 5000 --chats 200 --api-latency-ms 40
+    python -m tg_bot.benchmarks.webhook_replay --file updates.jsonl --concurrency 40
+    python -m tg_bot.benchmarks.webhook_replay --url http://127.0.0.1:8443/telegram \\
+        --secret $WEBHOOK_SECRET_TOKEN --file updates.jsonl
+
+Файл updates.jsonl - по одному update (Update.to_dict()) в строке.
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from collections import Counter
+from typing import Dict, List
+
+import httpx
+
+SECRET_HEADER = 'X-Telegram-Bot-Api-Secret-Token'
+
+SYNTHETIC_TEXTS = ['/help', '/profile', '/allsurveys', '/response', 'текст ответа']
+
+
+def load_updates(path: str) -> List[Dict]:
+    """Чтение записанных update (JSON Lines)"""
+    updates = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                updates.append(json.loads(line))
+    return updates
+
+
+def make_synthetic_updates(count: int, chats: int) -> List[Dict]:
+    """Текстовые сообщения и команды от `chats` разных пользователей"""
+    now = int(time.time())
+    updates = []
+    for i in range(count):
+        chat_id = 100000 + i % chats
+        text = SYNTHETIC_TEXTS[i % len(SYNTHETIC_TEXTS)]
+        message = {
+            'message_id': i + 1,
+            'date': now,
+            'chat': {'id': chat_id, 'type': 'private', 'first_name': f'User{chat_id}'},
+            'from': {'id': chat_id, 'is_bot': False, 'first_name': f'User{chat_id}'},
+            'text': text,
+        }
+        if text.startswith('/'):
+            message['entities'] = [{'type': 'bot_command', 'offset': 0, 'length': len(text)}]
+        updates.append({'update_id': i + 1, 'message': message})
+    return updates
+
+
+def renumber(updates: List[Dict], start: int) -> List[Dict]:
+    """Уникальные возрастающие update_id - иначе повторный прогон выглядит как дубликаты"""
+    return [{**update, 'update_id': start + i} for i, update in enumerate(updates)]
+
+
+async def replay(url: str, secret: str, updates: List[Dict], concurrency: int, timeout: float) -> Dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    statuses: Counter = Counter()
+    headers = {SECRET_HEADER: secret} if secret else {}
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(timeout=timeout, limits=limits) as client:
+
+        async def post(update: Dict):
+            async with semaphore:
+                started = time.perf_counter()
+                try:
+                    response = await client.post(url, json=update, headers=headers)
+                    statuses[response.status_code] += 1
+                except httpx.HTTPError as e:
+                    statuses[type(e).__name__] += 1
+                latencies.append((time.perf_counter() - started) * 1000)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(post(update) for update in updates))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'updates': len(updates),
+        'elapsed_s': round(elapsed, 3),
+        'updates_per_s': round(len(updates) / elapsed, 1) if elapsed else 0.0,
+        'latency_ms': {
+            'p50': round(statistics.median(latencies), 2) if latencies else 0.0,
+            'p95': round(latencies[int(len(latencies) * 0.95) - 1], 2) if latencies else 0.0,
+            'p99': round(latencies[int(len(latencies) * 0.99) - 1], 2) if latencies else 0.0,
+            'max': round(latencies[-1], 2) if latencies else 0.0,
+        },
+        'statuses': {str(status): count for status, count in statuses.items()},
+    }
+
+
+async def replay_in_process(args, updates: List[Dict]) -> Dict:
+    """Бот в этом процессе: webhook-сервер PTB и подменный транспорт Bot API"""
+    from telegram.ext import Application
+
+    from tg_bot.benchmarks.load_test import FAKE_TOKEN, RecordingRequest
+    from tg_bot.bot import build_application
+    from tg_bot.config.settings import config
+
+    request = RecordingRequest(latency_ms=args.api_latency_ms)
+    builder = Application.builder().token(FAKE_TOKEN).request(request).get_updates_request(RecordingRequest(0, 0))
+    application = build_application(builder)
+    secret = args.secret or 'replay-secret'
+    url = f"http://127.0.0.1:{args.port}/{config.WEBHOOK_PATH}"
+
+    await application.initialize()
+    await application.start()
+    await application.updater.start_webhook(
+        listen='127.0.0.1',
+        port=args.port,
+        url_path=config.WEBHOOK_PATH,
+        webhook_url=url,
+        secret_token=secret,
+        max_connections=config.WEBHOOK_MAX_CONNECTIONS,
+    )
+    try:
+        result = await replay(url, secret, updates, args.concurrency, args.timeout)
+    finally:
+        # Application.stop дожидается обработки всех принятых update
+        started = time.perf_counter()
+        await application.updater.stop()
+        await application.stop()
+        drain_s = time.perf_counter() - started
+        await application.shutdown()
+
+    result['drain_s'] = round(drain_s, 3)
+    result['bot_api_calls'] = dict(request.calls)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Прогон update через webhook бота")
+    parser.add_argument('--url', help="Адрес внешнего webhook (без него бот поднимается в этом процессе)")
+    parser.add_argument('--secret', default='', help="Значение WEBHOOK_SECRET_TOKEN бота")
+    parser.add_argument('--port', type=int, default=18443, help="Порт webhook-сервера бота в этом процессе")
+    parser.add_argument('--api-latency-ms', type=float, default=30.0, help="Задержка подменного Bot API, мс")
+    parser.add_argument('--file', help="Записанные update в формате JSON Lines")
+    parser.add_argument('--synthetic', type=int, default=1000, help="Число синтетических update (без --file)")
+    parser.add_argument('--chats', type=int, default=100, help="Число разных чатов в синтетике")
+    parser.add_argument('--repeat', type=int, default=1, help="Сколько раз повторить набор update")
+    parser.add_argument('--concurrency', type=int, default=40, help="Одновременных запросов (как max_connections)")
+    parser.add_argument('--timeout', type=float, default=30.0, help="Таймаут запроса, сек")
+    parser.add_argument('--start-id', type=int, default=int(time.time()), help="Первый update_id")
+    args = parser.parse_args()
+
+    base = load_updates(args.file) if args.file else make_synthetic_updates(args.synthetic, args.chats)
+    updates = renumber(base * args.repeat, args.start_id)
+
+    if args.url:
+        result = asyncio.run(replay(args.url, args.secret, updates, args.concurrency, args.timeout))
+    else:
+        result = asyncio.run(replay_in_process(args, updates))
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -9,7 +9,7 @@ from tg_bot.config.constants import (
     AWAITING_PASSWORD,
     AWAITING_NAME,
     AWAITING_JIRA,
-    AWAITING_ROLE, ALLSURVEYS_PAGINATION_PREFIX, ALLSURVEYS_PERIOD_DAYS
+    AWAITING_ROLE, ALLSURVEYS_PERIOD_DAYS
 )
 from tg_bot.config.roles_config import get_role_category
 from tg_bot.config.settings import config
@@ -18,17 +18,22 @@ from tg_bot.config.texts import (
 )
 from tg_bot.handlers.addresponse_handlers import addresponse_conversation
 from tg_bot.handlers.auth_handlers import start_command, handle_message
+from tg_bot.handlers.callback_router import callback_router
 from tg_bot.handlers.menu_handlers import setup_bot_commands, setup_menu_handlers
 from tg_bot.handlers.pagination_handlers import setup_pagination_handlers
 from tg_bot.handlers.role_handlers import handle_subtype_selection, handle_category_selection
 from tg_bot.handlers.scheduler import SurveyScheduler
+from tg_bot.handlers.update_processor import PerChatUpdateProcessor
+from tg_bot.handlers.update_tracking import setup_update_tracking
 from tg_bot.handlers.survey_handlers import finish_response_command
-from tg_bot.services.pagination_utils import PaginationUtils
-
-logging.basicConfig(
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    level=logging.INFO
-)
+from tg_bot.services.page_cache import allsurveys_page_cache
+from tg_bot.services.report_engine import report_engine
+from tg_bot.services.survey_lifecycle import survey_lifecycle
+from tg_bot.services.leader_election import scheduler_lease
+from tg_bot.services.logging_setup import setup_logging, stop_logging
+
+# Логи пишутся из очереди отдельным потоком (LOG_FORMAT, LOG_RATE_LIMIT, уровень HOTPATH - см. settings)
+setup_logging()
 logger = logging.getLogger(__name__)
 
 
@@ -100,7 +105,6 @@ async def profile_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 async def allsurveys_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Показать созданные опросы с пагинацией"""
     from tg_bot.config.roles_config import get_role_category
-    from tg_bot.database.models import SurveyModel
 
     user_role = context.user_data.get('user_role')
     role_category = get_role_category(user_role) if user_role else None
@@ -113,13 +117,9 @@ async def allsurveys_command(update: Update, context: ContextTypes.DEFAULT_TYPE)
             await update.message.reply_text(response_text)
         return
 
-    # Вычисляем дату N дней назад из настроек
-    from datetime import datetime, timedelta
+    # Опросы и страницы берутся из общего кэша (без запроса к БД при повторных открытиях)
     period_days = ALLSURVEYS_PERIOD_DAYS
-    date_from = datetime.now() - timedelta(days=period_days)
-
-    # Получаем опросы с ограничением по дате
-    surveys = SurveyModel.get_active_surveys_since(date_from)
+    surveys = allsurveys_page_cache.get_surveys(period_days)
 
     if not surveys:
         response_text = f"Нет активных опросов за последние {period_days} дней."
@@ -129,12 +129,6 @@ async def allsurveys_command(update: Update, context: ContextTypes.DEFAULT_TYPE)
             await update.message.reply_text(response_text)
         return
 
-    # Сохраняем опросы для пагинации
-    context.user_data['pagination_allsurveys'] = {
-        'items': surveys,
-        'type': 'allsurveys'
-    }
-
     # Всегда показываем пагинацию
     if hasattr(update, 'callback_query') and update.callback_query:
         # Через меню
@@ -146,29 +140,13 @@ async def allsurveys_command(update: Update, context: ContextTypes.DEFAULT_TYPE)
 
 async def _show_allsurveys_page(query, context, page=0):
     """Показать страницу с пагинацией всех опросов (для меню)"""
-    user_data = context.user_data
-    items = user_data.get('pagination_allsurveys', {}).get('items', [])
+    rendered = allsurveys_page_cache.get_page(page)
 
-    if not items:
+    if not rendered:
         await query.edit_message_text("Нет активных опросов.")
         return
 
-    page_items, current_page, total_pages = PaginationUtils.get_page_items(items, page)
-
-    # Форматируем сообщение с указанием периода
-    from tg_bot.config.constants import ALLSURVEYS_PERIOD_DAYS
-    title = f"ВСЕ АКТИВНЫЕ ОПРОСЫ ({ALLSURVEYS_PERIOD_DAYS} дней)"
-
-    message = PaginationUtils.format_page_with_numbers(
-        page_items, current_page, total_pages, title
-    )
-
-    # Создаем клавиатуру навигации
-    keyboard = PaginationUtils.create_pagination_navigation(
-        page=current_page,
-        total_pages=total_pages,
-        callback_prefix=ALLSURVEYS_PAGINATION_PREFIX
-    )
+    message, keyboard = rendered
 
     await query.edit_message_text(
         message,
@@ -178,30 +156,13 @@ async def _show_allsurveys_page(query, context, page=0):
 
 async def _send_allsurveys_page(message_obj, context, page=0):
     """Отправить страницу всех опросов (для текстовой команды)"""
-    user_data = context.user_data
-    items = user_data.get('pagination_allsurveys', {}).get('items', [])
+    rendered = allsurveys_page_cache.get_page(page)
 
-    if not items:
-        from tg_bot.config.constants import ALLSURVEYS_PERIOD_DAYS
+    if not rendered:
         await message_obj.reply_text(f"Нет активных опросов за последние {ALLSURVEYS_PERIOD_DAYS} дней.")
         return
 
-    page_items, current_page, total_pages = PaginationUtils.get_page_items(items, page)
-
-    # Форматируем сообщение с указанием периода
-    from tg_bot.config.constants import ALLSURVEYS_PERIOD_DAYS
-    title = f"ВСЕ АКТИВНЫЕ ОПРОСЫ ({ALLSURVEYS_PERIOD_DAYS} дней)"
-
-    message = PaginationUtils.format_page_with_numbers(
-        page_items, current_page, total_pages, title
-    )
-
-    # Создаем клавиатуру навигации
-    keyboard = PaginationUtils.create_pagination_navigation(
-        page=current_page,
-        total_pages=total_pages,
-        callback_prefix=ALLSURVEYS_PAGINATION_PREFIX
-    )
+    message, keyboard = rendered
 
     await message_obj.reply_text(
         message,
@@ -305,10 +266,8 @@ async def syncjira_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     thread = threading.Thread(target=sync_in_thread, daemon=True)
     thread.start()
 
-    # Сохраняем информацию о запущенной синхронизации
+    # Поток и сообщение в user_data не кладем: user_data копируется и сохраняется в БД
     context.user_data['jira_sync_in_progress'] = True
-    context.user_data['jira_sync_message'] = menu_message
-    context.user_data['jira_sync_thread'] = thread
 
 
 def role_required(allowed_categories):
@@ -346,53 +305,33 @@ def role_required(allowed_categories):
     return decorator
 
 
-def main():
-    """Основная функция запуска бота"""
+def build_application(builder=None) -> Application:
+    """
+    Создание Application со всеми обработчиками, без запуска.
+    builder - готовый ApplicationBuilder (например, с подменным транспортом в нагрузочных тестах)
+    """
     # Создаем application без JobQueue
-    application = Application.builder().token(config.BOT_TOKEN).build()
-    logger.info("Запуск бота...")
-
-    setup_bot_commands(application)
-
-    # Проверка подключения к БД
-    logger.info("Проверка подключения к БД...")
-    from tg_bot.database.connection import db_connection
-    test_connection = db_connection.get_connection()
-    if test_connection:
-        logger.info("Подключение к БД успешно")
-        test_connection.close()
-    else:
-        logger.error("Не удалось подключиться к БД")
-        return
-
-    if config.JIRA_URL and config.JIRA_SYNC_ON_START:
-        logger.info("Запуск загрузки данных Jira при старте...")
-        try:
-            # Запускаем синхронизацию синхронно (это блокирующая операция)
-            from tg_bot.services.jira_loader import load_jira_data_on_startup
-            success = load_jira_data_on_startup(clear_old=config.JIRA_CLEAR_OLD_DATA)
-
-            if success:
-                logger.info("Данные Jira успешно загружены при старте")
-            else:
-                logger.warning("Загрузка данных Jira завершилась с ошибками")
-                logger.warning("Бот продолжит работу без полных данных Jira")
-
-        except Exception as e:
-            logger.error(f"Критическая ошибка при загрузке Jira: {e}")
-            logger.warning("Бот продолжит работу без данных Jira")
-    else:
-        if not config.JIRA_URL:
-            logger.info("Jira URL не указан, пропускаем загрузку данных")
-        elif not config.JIRA_SYNC_ON_START:
-            logger.info("JIRA_SYNC_ON_START=false, пропускаем загрузку данных")
-        else:
-            logger.info("Загрузка данных Jira отключена")
+    if builder is None:
+        builder = Application.builder().token(config.BOT_TOKEN)
+    if config.UPDATE_WORKERS > 1:
+        # Update разных чатов - параллельно, одного чата - по порядку
+        builder = builder.concurrent_updates(PerChatUpdateProcessor(config.UPDATE_WORKERS))
+    if config.PERSISTENCE_ENABLED:
+        # user_data и состояния диалогов переживают перезапуск (запись в БД - в фоне)
+        from tg_bot.database.persistence import PostgresPersistence
+        builder = builder.persistence(PostgresPersistence(update_interval=config.PERSISTENCE_UPDATE_INTERVAL))
+    application = builder.build()
 
     # Инициализируем планировщик и сохраняем в bot_data
     survey_scheduler = SurveyScheduler(application.bot)
     application.bot_data['survey_scheduler'] = survey_scheduler
 
+    setup_handlers(application)
+    return application
+
+
+def setup_handlers(application):
+    """Регистрация всех обработчиков бота (порядок важен)"""
     # Настраиваем команды бота для меню
     application.add_handler(CommandHandler("setupcommands", lambda update, context: setup_bot_commands(application)))
 
@@ -400,7 +339,9 @@ def main():
     from tg_bot.handlers.survey_handlers import survey_response_conversation, survey_creation_conversation
     from tg_bot.handlers.role_handlers import setup_role_handlers
     from tg_bot.handlers.survey_target_handlers import setup_survey_target_handlers
-    from tg_bot.handlers.report_handlers import setup_report_handlers, report_command
+    from tg_bot.handlers.report_handlers import setup_report_handlers
+    from tg_bot.handlers.export_handlers import setup_export_handlers
+    from tg_bot.handlers.search_handlers import setup_search_handlers
 
     # Создаем ConversationHandler для регистрации
     from tg_bot.config.constants import AWAITING_SUBROLE
@@ -425,9 +366,19 @@ def main():
         },
         fallbacks=[CommandHandler('cancel', cancel_command)],
         per_user=True,
-        per_chat=True
+        per_chat=True,
+        name='registration',
+        persistent=config.PERSISTENCE_ENABLED
     )
 
+    # Учет запросов к БД на каждый update (группы до/после основных обработчиков)
+    setup_update_tracking(application)
+
+    # Все нажатия inline-кнопок идут через один обработчик с префиксным деревом,
+    # маршруты добавляют setup_* ниже. Колбэки ConversationHandler (cat_, sub_,
+    # survey_target_) и раньше перехватывались обработчиками верхнего уровня
+    application.add_handler(callback_router.handler())
+
     setup_pagination_handlers(application)
 
     # Настраиваем обработчики выбора ролей
@@ -439,6 +390,12 @@ def main():
     # Настраиваем обработчики отчетов
     setup_report_handlers(application)
 
+    # Выгрузка ответов для руководителей
+    setup_export_handlers(application)
+
+    # Поиск по опросам и ответам
+    setup_search_handlers(application)
+
     # РЕГИСТРИРУЕМ ОБРАБОТЧИКИ (порядок важен!)
     application.add_handler(registration_handler)
     application.add_handler(survey_creation_conversation)
@@ -469,48 +426,146 @@ def main():
     application.add_handler(CommandHandler("addresponse", addresponse_command_wrapper))
     application.add_handler(CommandHandler("done", finish_response_command))
 
-    # Обработчик для команды /report (вместо устаревших /dailydigest, /weeklydigest, /blockers)
-    application.add_handler(CommandHandler("report", report_command))
-
     application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_message))
 
     async def unknown_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Обработчик неизвестных команд"""
-        command = update.message.text.split()[0] if update.message.text else ""
-
-        # РЕДИРЕКТ устаревших команд на /report
-        if command in ['/dailydigest', '/weeklydigest', '/blockers']:
-            await update.message.reply_text(
-                f"Команда {command} устарела. Используйте /report для получения отчетов."
-            )
-            return await report_command(update, context)
-
         await update.message.reply_text(
             "Неизвестная команда. Используйте /help для списка доступных команд."
         )
 
     application.add_handler(MessageHandler(filters.COMMAND, unknown_command))
 
+
+def main():
+    """Основная функция запуска бота"""
+    application = build_application()
+    survey_scheduler = application.bot_data['survey_scheduler']
+    logger.info("Запуск бота...")
+
+    setup_bot_commands(application)
+
+    # Проверка подключения к БД
+    logger.info("Проверка подключения к БД...")
+    from tg_bot.database.connection import db_connection
+    test_connection = db_connection.get_connection()
+    if test_connection:
+        logger.info("Подключение к БД успешно")
+        test_connection.close()
+    else:
+        logger.error("Не удалось подключиться к БД")
+        return
+
+    # Недостающие индексы/таблицы, на которые опираются модели
+    from tg_bot.database.schema import ensure_schema
+    if not ensure_schema():
+        logger.warning("Схема БД не обновлена, часть функций может работать некорректно")
+
+    # Помесячные секции reminders/responses: однократная миграция и секция текущего месяца
+    if config.DB_PARTITIONING and db_connection.dialect == 'postgres':
+        from tg_bot.database.partitioning import PartitionManager
+        if PartitionManager.migrate():
+            PartitionManager.maintain()
+        else:
+            logger.warning("Таблицы не секционированы, reminders и responses остаются обычными таблицами")
+
+    # Индекс "кто ответил на опрос" в памяти; без него проверки идут в БД
+    from tg_bot.database.answered_index import answered_index
+    if not answered_index.warm():
+        logger.warning("Индекс ответов не загружен, проверки ответов будут выполняться запросами к БД")
+
+    # Эндпоинт метрик (Prometheus) - до синхронизации Jira, чтобы видеть ее этапы
+    if config.METRICS_ENABLED:
+        from tg_bot.services.metrics import start_metrics_server
+        start_metrics_server()
+
+    if config.JIRA_URL and config.JIRA_SYNC_ON_START:
+        logger.info("Запуск загрузки данных Jira при старте...")
+        try:
+            # Запускаем синхронизацию синхронно (это блокирующая операция)
+            from tg_bot.services.jira_loader import load_jira_data_on_startup
+            success = load_jira_data_on_startup(clear_old=config.JIRA_CLEAR_OLD_DATA)
+
+            if success:
+                logger.info("Данные Jira успешно загружены при старте")
+            else:
+                logger.warning("Загрузка данных Jira завершилась с ошибками")
+                logger.warning("Бот продолжит работу без полных данных Jira")
+
+        except Exception as e:
+            logger.error(f"Критическая ошибка при загрузке Jira: {e}")
+            logger.warning("Бот продолжит работу без данных Jira")
+    else:
+        if not config.JIRA_URL:
+            logger.info("Jira URL не указан, пропускаем загрузку данных")
+        elif not config.JIRA_SYNC_ON_START:
+            logger.info("JIRA_SYNC_ON_START=false, пропускаем загрузку данных")
+        else:
+            logger.info("Загрузка данных Jira отключена")
+
     # ЗАПУСКАЕМ ПЛАНИРОВЩИК - ВАЖНО: используем асинхронный запуск без JobQueue
     # Эта логика работает и включает повторную отправку сообщений спустя время
     async def start_scheduler_on_boot():
         await survey_scheduler.start()
         logger.info("Планировщик опросов запущен (включая логику повторной отправки)")
 
+    # Фоновые циклы, которые останавливаются в on_stop
+    background_tasks = []
+
     async def on_startup(app):
+        # Выборы лидера планировщика (при нескольких репликах) - до запуска планировщика
+        background_tasks.append(asyncio.create_task(scheduler_lease.run()))
         asyncio.create_task(start_scheduler_on_boot())
-
-    # Привязываем обработчик запуска
+        # Фоновый пересчет агрегатов для отчетов
+        background_tasks.append(asyncio.create_task(report_engine.run_periodic()))
+        # Закрытие просроченных опросов и перенос старых в архив
+        background_tasks.append(asyncio.create_task(survey_lifecycle.run_periodic()))
+
+    async def on_stop(app):
+        # Фоновые циклы останавливаются до освобождения блокировки лидера в shutdown:
+        # начатый пересчет или архивирование дорабатывают, новые не начинаются
+        for task in background_tasks:
+            task.cancel()
+        await asyncio.gather(*background_tasks, return_exceptions=True)
+        background_tasks.clear()
+        # Update уже обработаны; рассылки дорабатывают до SHUTDOWN_DEADLINE или сохраняют прогресс.
+        # Данные persistence PTB записывает после этого хука (Application.shutdown)
+        await survey_scheduler.shutdown(config.SHUTDOWN_DEADLINE)
+
+    async def on_shutdown(app):
+        # Последние записи логов из очереди
+        logger.info("Бот остановлен")
+        stop_logging()
+
+    # Привязываем обработчики запуска и остановки
     application.post_init = on_startup
+    application.post_stop = on_stop
+    application.post_shutdown = on_shutdown
 
     # Запускаем бота
     logger.info("Бот готов к работе")
 
-    application.run_polling(
-        drop_pending_updates=True,
-        allowed_updates=Update.ALL_TYPES,
-        close_loop=False
-    )
+    if config.BOT_MODE == 'webhook':
+        # Telegram сам присылает update на встроенный HTTP-сервер; заголовок
+        # X-Telegram-Bot-Api-Secret-Token проверяется PTB по secret_token
+        logger.info(f"Режим webhook: {config.WEBHOOK_LISTEN}:{config.WEBHOOK_PORT}/{config.WEBHOOK_PATH}")
+        application.run_webhook(
+            listen=config.WEBHOOK_LISTEN,
+            port=config.WEBHOOK_PORT,
+            url_path=config.WEBHOOK_PATH,
+            webhook_url=f"{config.WEBHOOK_URL.rstrip('/')}/{config.WEBHOOK_PATH}",
+            secret_token=config.WEBHOOK_SECRET_TOKEN,
+            max_connections=config.WEBHOOK_MAX_CONNECTIONS,
+            drop_pending_updates=True,
+            allowed_updates=Update.ALL_TYPES,
+            close_loop=False
+        )
+    else:
+        application.run_polling(
+            drop_pending_updates=True,
+            allowed_updates=Update.ALL_TYPES,
+            close_loop=False
+        )
 
 
 if __name__ == '__main__':
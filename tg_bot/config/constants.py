@@ -34,9 +34,15 @@ PAGINATION_ITEMS_PER_PAGE = config.PAGINATION_ITEMS_PER_PAGE
 PAGINATION_MAX_ITEMS = config.PAGINATION_MAX_ITEMS
 PAGINATION_ENABLED = config.PAGINATION_ENABLED
 
+# Время жизни кэша отрендеренных страниц /allsurveys (в секундах)
+ALLSURVEYS_CACHE_TTL = config.ALLSURVEYS_CACHE_TTL
+# Время жизни снимка активных опросов по ролям для /response (в секундах)
+SURVEY_SNAPSHOT_CACHE_TTL = config.SURVEY_SNAPSHOT_CACHE_TTL
+
 SURVEY_PAGINATION_PREFIX = "survey_page_"
 ADD_RESPONSE_PAGINATION_PREFIX = "addresponse_page_"
 ALLSURVEYS_PAGINATION_PREFIX = "allsurveys_page_"
+SEARCH_PAGINATION_PREFIX = "search_page_"
 
 # Префиксы для callback_data при выборе ролей
 CATEGORY_SELECTION_PREFIX = "cat_"
@@ -90,3 +96,20 @@ REMINDER_INTERVALS = {
 
 # Настройки планировщика
 SCHEDULER_CHECK_INTERVAL = 30
+
+# Лимит длины сообщения Telegram и длина вопроса в пункте сводного напоминания
+TELEGRAM_MESSAGE_LIMIT = 4096
+DIGEST_QUESTION_LENGTH = 200
+
+# Индекс ответов в памяти (AnsweredIndex): refresh перечитывает последние N id_response
+# (строки, закоммиченные не по порядку id), полная перезагрузка - раз в интервал, сек
+ANSWERED_INDEX_RESCAN_WINDOW = 1000
+ANSWERED_INDEX_REBUILD_INTERVAL = 600
+
+# Update, принятых в обработку одновременно (PerChatUpdateProcessor): выполняются
+# и ждут очереди своего чата. Выполняются из них не больше UPDATE_WORKERS
+UPDATE_PENDING_LIMIT = 1000
+
+# Уровень логов горячих путей (по строке на напоминание, пользователя, запрос):
+# между DEBUG и INFO, при LOG_LEVEL=INFO не пишется и не форматируется
+LOG_LEVEL_HOTPATH = 15
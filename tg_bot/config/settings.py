@@ -24,7 +24,12 @@ logger = logging.getLogger(__name__)
 
 class Config:
     def __init__(self):
-        required_vars = ['BOT_TOKEN', 'DB_HOST', 'DB_NAME', 'REGISTRATION_PASSWORD']
+        if self.DB_BACKEND not in ('postgres', 'sqlite'):
+            raise ValueError(f"Неизвестный DB_BACKEND: {self.DB_BACKEND} (ожидается postgres или sqlite)")
+
+        required_vars = ['BOT_TOKEN', 'REGISTRATION_PASSWORD']
+        if self.DB_BACKEND == 'postgres':
+            required_vars += ['DB_HOST', 'DB_NAME']
         for var in required_vars:
             if not getattr(self, var):
                 raise ValueError(f"Отсутствует обязательная переменная: {var}")
@@ -35,6 +40,30 @@ class Config:
                 if not getattr(self, var):
                     logger.warning(f"⚠ Jira переменная {var} не установлена")
 
+        if self.BOT_MODE not in ('polling', 'webhook'):
+            raise ValueError(f"Неизвестный BOT_MODE: {self.BOT_MODE} (ожидается polling или webhook)")
+        if self.BOT_MODE == 'webhook' and not self.WEBHOOK_URL:
+            raise ValueError("Для BOT_MODE=webhook нужна переменная WEBHOOK_URL")
+        if self.BOT_MODE == 'webhook' and not self.WEBHOOK_SECRET_TOKEN:
+            logger.warning("⚠ WEBHOOK_SECRET_TOKEN не установлен - запросы к webhook не проверяются")
+
+        if self.PARTITION_RETENTION_MODE not in ('detach', 'drop'):
+            raise ValueError(f"Неизвестный PARTITION_RETENTION_MODE: {self.PARTITION_RETENTION_MODE} "
+                             f"(ожидается detach или drop)")
+        if self.DB_PARTITIONING and self.DB_BACKEND != 'postgres':
+            logger.warning("⚠ DB_PARTITIONING поддерживается только для PostgreSQL и будет проигнорирован")
+
+        if self.LOG_FORMAT not in ('text', 'json'):
+            raise ValueError(f"Неизвестный LOG_FORMAT: {self.LOG_FORMAT} (ожидается text или json)")
+
+        answer_window = max(self.RESPONSE_PERIOD_DAYS, self.ADDRESPONSE_PERIOD_DAYS)
+        if 0 < self.SURVEY_EXPIRY_DAYS < answer_window:
+            logger.warning(f"⚠ SURVEY_EXPIRY_DAYS={self.SURVEY_EXPIRY_DAYS} меньше окна ответов ({answer_window} дн.) - "
+                           f"опросы будут закрываться раньше, чем пропадут из /response и /addresponse")
+        if self.SURVEY_ARCHIVE_DAYS > 0:
+            logger.warning(f"⚠ SURVEY_ARCHIVE_DAYS={self.SURVEY_ARCHIVE_DAYS}: опросы старше этого срока переносятся "
+                           f"в архивные таблицы и пропадают из /export, /search и отчетов")
+
     BOT_TOKEN = os.getenv("BOT_TOKEN")
     DB_HOST = os.getenv("DB_HOST")
     DB_PORT = os.getenv("DB_PORT")
@@ -42,6 +71,10 @@ class Config:
     DB_USER = os.getenv("DB_USER")
     DB_PASSWORD = os.getenv("DB_PASSWORD")
 
+    # Хранилище: postgres или sqlite (встроенная БД в файле SQLITE_PATH, без сервера)
+    DB_BACKEND = os.getenv("DB_BACKEND", "postgres").lower()
+    SQLITE_PATH = os.getenv("SQLITE_PATH", "tg_bot.sqlite3")
+
     REGISTRATION_PASSWORD = os.getenv("REGISTRATION_PASSWORD")
 
     JIRA_URL = os.getenv("JIRA_URL")
@@ -53,6 +86,8 @@ class Config:
     JIRA_SYNC_DAYS_BACK = int(os.getenv("JIRA_SYNC_DAYS_BACK", "365"))
     JIRA_CLEAR_OLD_DATA = os.getenv("JIRA_CLEAR_OLD_DATA", "false").lower() == "true"
     JIRA_MAX_TASKS = int(os.getenv("JIRA_MAX_TASKS", "1000"))
+    JIRA_MAX_RETRIES = int(os.getenv("JIRA_MAX_RETRIES", "5"))
+    JIRA_RETRY_MAX_DELAY = float(os.getenv("JIRA_RETRY_MAX_DELAY", "60"))
 
     ALLSURVEYS_PERIOD_DAYS = int(os.getenv('ALLSURVEYS_PERIOD_DAYS', '30'))
     RESPONSE_PERIOD_DAYS = int(os.getenv('RESPONSE_PERIOD_DAYS', '14'))
@@ -62,8 +97,83 @@ class Config:
     PAGINATION_MAX_ITEMS = int(os.getenv('PAGINATION_MAX_ITEMS', '200'))
     PAGINATION_ENABLED = os.getenv('PAGINATION_ENABLED', 'true').lower() == 'true'
 
+    ALLSURVEYS_CACHE_TTL = int(os.getenv('ALLSURVEYS_CACHE_TTL', '60'))
+    SURVEY_SNAPSHOT_CACHE_TTL = int(os.getenv('SURVEY_SNAPSHOT_CACHE_TTL', '300'))
+
+    SLOW_QUERY_MS = float(os.getenv('SLOW_QUERY_MS', '200'))
+    UPDATE_QUERY_WARN_THRESHOLD = int(os.getenv('UPDATE_QUERY_WARN_THRESHOLD', '20'))
+
+    # Режим получения update: polling (getUpdates) или webhook (встроенный HTTP-сервер)
+    BOT_MODE = os.getenv('BOT_MODE', 'polling').lower()
+    WEBHOOK_LISTEN = os.getenv('WEBHOOK_LISTEN', '0.0.0.0')
+    WEBHOOK_PORT = int(os.getenv('WEBHOOK_PORT', '8443'))
+    WEBHOOK_PATH = os.getenv('WEBHOOK_PATH', 'telegram')
+    WEBHOOK_URL = os.getenv('WEBHOOK_URL')
+    WEBHOOK_SECRET_TOKEN = os.getenv('WEBHOOK_SECRET_TOKEN')
+    WEBHOOK_MAX_CONNECTIONS = int(os.getenv('WEBHOOK_MAX_CONNECTIONS', '40'))
+
+    # Хранение user_data и состояний диалогов в БД между перезапусками
+    PERSISTENCE_ENABLED = os.getenv('PERSISTENCE_ENABLED', 'true').lower() == 'true'
+    PERSISTENCE_UPDATE_INTERVAL = float(os.getenv('PERSISTENCE_UPDATE_INTERVAL', '30'))
+
+    # Число update, обрабатываемых одновременно (1 - последовательная обработка)
+    UPDATE_WORKERS = int(os.getenv('UPDATE_WORKERS', '8'))
+
+    # Отчеты: период пересчета агрегатов (сек) и окно опросов в отчетах (дней)
+    REPORT_ROLLUP_INTERVAL = float(os.getenv('REPORT_ROLLUP_INTERVAL', '300'))
+    REPORT_WINDOW_DAYS = int(os.getenv('REPORT_WINDOW_DAYS', '30'))
+
+    # Выгрузка ответов (/export): строк за одно чтение курсора и одновременных выгрузок
+    EXPORT_FETCH_SIZE = int(os.getenv('EXPORT_FETCH_SIZE', '2000'))
+    EXPORT_MAX_CONCURRENT = int(os.getenv('EXPORT_MAX_CONCURRENT', '2'))
+
+    # Жизненный цикл опросов (по умолчанию выключен): активный опрос закрывается через
+    # SURVEY_EXPIRY_DAYS дней, закрытый переносится в архив через SURVEY_ARCHIVE_DAYS дней.
+    # Архивные таблицы не читают /export, /search, /allsurveys и отчеты
+    SURVEY_EXPIRY_DAYS = int(os.getenv('SURVEY_EXPIRY_DAYS', '0'))
+    SURVEY_ARCHIVE_DAYS = int(os.getenv('SURVEY_ARCHIVE_DAYS', '0'))
+    LIFECYCLE_INTERVAL = float(os.getenv('LIFECYCLE_INTERVAL', '3600'))
+    ARCHIVE_BATCH_SIZE = int(os.getenv('ARCHIVE_BATCH_SIZE', '500'))
+
+    # Помесячное секционирование reminders/responses (только PostgreSQL; миграция при запуске).
+    # Секции старше PARTITION_RETENTION_MONTHS (0 - хранить все) отсоединяются (detach) или удаляются (drop)
+    DB_PARTITIONING = os.getenv('DB_PARTITIONING', 'false').lower() == 'true'
+    PARTITION_RETENTION_MONTHS = int(os.getenv('PARTITION_RETENTION_MONTHS', '0'))
+    PARTITION_RETENTION_MODE = os.getenv('PARTITION_RETENTION_MODE', 'detach').lower()
+
+    # Несколько реплик бота: лидер планировщика выбирается advisory-блокировкой PostgreSQL
+    # (LEADER_LOCK_ID - ее ключ), напоминания делятся на REMINDER_SHARDS шардов по user_id
+    LEADER_ELECTION = os.getenv('LEADER_ELECTION', 'false').lower() == 'true'
+    LEADER_LOCK_ID = int(os.getenv('LEADER_LOCK_ID', '731600'))
+    LEADER_HEARTBEAT_INTERVAL = float(os.getenv('LEADER_HEARTBEAT_INTERVAL', '5'))
+    REMINDER_SHARDS = int(os.getenv('REMINDER_SHARDS', '1'))
+
+    # Напоминания одному пользователю собираются в одно сообщение; к уже наступившим
+    # добавляются напоминания со сроком в ближайшие REMINDER_COALESCE_WINDOW секунд (0 - без упреждения)
+    REMINDER_COALESCE_WINDOW = float(os.getenv('REMINDER_COALESCE_WINDOW', '30'))
+
+    # Остановка бота: сколько секунд дать текущим рассылкам на завершение, прежде чем прервать их
+    # с сохранением прогресса; доставки опроса записываются в БД пачками по DELIVERY_CHECKPOINT_BATCH
+    SHUTDOWN_DEADLINE = float(os.getenv('SHUTDOWN_DEADLINE', '20'))
+    DELIVERY_CHECKPOINT_BATCH = int(os.getenv('DELIVERY_CHECKPOINT_BATCH', '20'))
+
+    # Поиск (/search): результатов на странице
+    SEARCH_PAGE_SIZE = int(os.getenv('SEARCH_PAGE_SIZE', '5'))
+
+    METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() == 'true'
+    METRICS_HOST = os.getenv('METRICS_HOST', '127.0.0.1')
+    METRICS_PORT = int(os.getenv('METRICS_PORT', '9108'))
+
     DEBUG = os.getenv('DEBUG', 'false').lower() == 'true'
-    LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
+    LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+    # Логи пишет отдельный поток из очереди: text или json (строка JSON на запись)
+    LOG_FORMAT = os.getenv('LOG_FORMAT', 'text').lower()
+    LOG_QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', '10000'))
+    # Ограничение записей ниже WARNING с одного места в коде: в секунду и запас на всплеск (0 - без ограничения)
+    LOG_RATE_LIMIT = float(os.getenv('LOG_RATE_LIMIT', '20'))
+    LOG_RATE_BURST = int(os.getenv('LOG_RATE_BURST', '100'))
+    # Из записей уровня HOTPATH пишется каждая N-я с одного места в коде
+    LOG_HOTPATH_SAMPLE = int(os.getenv('LOG_HOTPATH_SAMPLE', '1'))
 
 
 config = Config()
@@ -149,18 +149,47 @@ MENU_TEXTS = {
 }
 
 REPORT_TEXTS = {
-    'report_message': (
-        "Для работы с отчетами и аналитикой данных "
-        "используйте нашего нового бота:\n\n"
-        "@LosAgenteBot\n\n"
-        "В нем вы найдете:\n"
-        "• Ежедневные дайджесты\n"
-        "• Еженедельные отчеты\n"
-        "• Анализ блокеров\n"
-        "Нажмите на ссылку выше для перехода."
-    ),
     'menu_reports': "Отчеты",
-    'report_not_available': "Функция отчетов временно недоступна. Используйте @LosAgenteBot"
+    'report_not_available': "Не удалось сформировать отчет, попробуйте позже.",
+    'ceo_only': "Отчеты доступны только руководителям.",
+    'report_title': "Сводный отчет (опросы за {days} дней)",
+    'daily_title': "Ежедневный дайджест за {date}",
+    'weekly_title': "Еженедельный дайджест: {date_from} - {date_to}",
+    'blockers_title': "Блокеры",
+    'no_data': "нет данных",
+    'no_blockers': "блокеров нет",
+    'not_ready': "Агрегаты еще не пересчитаны после запуска - данные могут быть неполными.",
+    'data_as_of': "Данные на {time}",
+}
+
+EXPORT_TEXTS = {
+    'usage': (
+        "Выгрузка ответов на опросы:\n\n"
+        "/export survey <id> - ответы на опрос\n"
+        "/export days <N> - ответы на опросы за N дней\n"
+        "/export role <роль> - ответы пользователей роли\n"
+        "/export all - все ответы\n\n"
+        "По умолчанию - CSV в gzip. Добавьте xlsx в конце для Excel, например: /export days 7 xlsx"
+    ),
+    'ceo_only': "Выгрузка доступна только руководителям.",
+    'invalid_args': "Не удалось разобрать параметры выгрузки.",
+    'xlsx_unavailable': "Выгрузка в XLSX недоступна на сервере, используйте CSV.",
+    'started': "Готовлю выгрузку, это может занять некоторое время...",
+    'empty': "Ответов по заданным условиям нет.",
+    'caption': "Выгрузка ответов: {count} строк",
+    'failed': "Не удалось сформировать выгрузку, попробуйте позже.",
+}
+
+SEARCH_TEXTS = {
+    'usage': (
+        "Поиск по вопросам опросов и ответам:\n\n"
+        "/search <запрос>\n\n"
+        "Например: /search релиз \"код ревью\" -тесты"
+    ),
+    'ceo_only': "Поиск доступен только руководителям.",
+    'title': "ПОИСК: {query} (страница {page})",
+    'not_found': "По запросу «{query}» ничего не найдено.",
+    'expired': "Результаты поиска устарели, повторите /search.",
 }
 
 HELP_TEXTS = {
@@ -171,7 +200,12 @@ HELP_TEXTS = {
 /allsurveys - просмотреть созданные опросы
 
 Отчеты:
-/report - получить информацию об отчетах
+/report - сводный отчет
+/dailydigest - дайджест за день
+/weeklydigest - дайджест за неделю
+/blockers - блокеры
+/export - выгрузка ответов в CSV/XLSX
+/search - поиск по вопросам и ответам
 
 Синхронизация:
 /syncjira - синхронизация данных с Jira
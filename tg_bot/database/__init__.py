@@ -2,7 +2,17 @@
 Пакет работы с базой данных
 """
 
+from . import answered_index
+from . import backends
 from . import connection
+from . import delivery_models
+from . import instrumentation
+from . import lifecycle_models
 from . import models
+from . import partitioning
+from . import persistence
+from . import report_models
+from . import schema
+from . import search_models
 
-__all__ = ['connection', 'models']
\ No newline at end of file
+__all__ = ['answered_index', 'backends', 'connection', 'delivery_models', 'instrumentation', 'lifecycle_models', 'models', 'partitioning', 'persistence', 'report_models', 'schema', 'search_models']
\ No newline at end of file
@@ -0,0 +1,146 @@
+import logging
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Set
+
+from tg_bot.config.constants import ANSWERED_INDEX_REBUILD_INTERVAL, ANSWERED_INDEX_RESCAN_WINDOW
+from tg_bot.database.connection import db_connection
+from tg_bot.database.instrumentation import instrumented
+
+logger = logging.getLogger(__name__)
+
+
+class AnsweredIndex:
+    """
+    Индекс "кто ответил на опрос" в памяти: для каждого опроса - битовое множество
+    (int), бит с номером id_user установлен, если ответ есть.
+    Заполняется из responses при запуске (warm), дальше обновляется при сохранении
+    ответа (mark_answered) и догружает строки других процессов (refresh).
+    При нескольких писателях строка с меньшим id может закоммититься позже большей,
+    поэтому refresh перечитывает хвост из ANSWERED_INDEX_RESCAN_WINDOW id до отметки,
+    а раз в ANSWERED_INDEX_REBUILD_INTERVAL индекс строится заново - так же сбрасываются
+    биты удаленных ответов.
+    Пока индекс не прогрет, модели ходят в БД как раньше.
+    """
+
+    def __init__(self, rescan_window: int = ANSWERED_INDEX_RESCAN_WINDOW,
+                 rebuild_interval: float = ANSWERED_INDEX_REBUILD_INTERVAL):
+        self.rescan_window = rescan_window
+        self.rebuild_interval = rebuild_interval
+        self._bits: Dict[int, int] = {}
+        self._last_response_id = 0
+        self._built_at = 0.0
+        # Отметки mark_answered во время полной перезагрузки - повторяются после подмены
+        self._marks_during_rebuild: Optional[List] = None
+        self._lock = threading.Lock()
+        self.warmed = False
+
+    def _load(self, query, params=()) -> Optional[Dict[int, int]]:
+        """Битовые множества по строкам запроса; отметка _last_response_id сдвигается только здесь"""
+        connection = db_connection.get_connection()
+        if not connection:
+            return None
+
+        cursor = connection.cursor()
+        try:
+            cursor.execute(query, params)
+            bits: Dict[int, int] = {}
+            last_id = 0
+            for id_response, id_survey, id_user in cursor.fetchall():
+                last_id = max(last_id, id_response)
+                if id_user is None or id_user < 0:
+                    continue
+                bits[id_survey] = bits.get(id_survey, 0) | (1 << id_user)
+            with self._lock:
+                self._last_response_id = max(self._last_response_id, last_id)
+            return bits
+        except Exception as e:
+            logger.error(f"Ошибка загрузки индекса ответов: {e}")
+            return None
+        finally:
+            cursor.close()
+            connection.close()
+
+    def _rebuild(self) -> bool:
+        """Полная загрузка индекса из responses в новый словарь с подменой"""
+        with self._lock:
+            self._marks_during_rebuild = []
+        bits = self._load('SELECT id_response, id_survey, id_user FROM responses;')
+
+        with self._lock:
+            marks, self._marks_during_rebuild = self._marks_during_rebuild, None
+            if bits is None:
+                return False
+            # Ответы, сохраненные этим процессом во время чтения, могли не попасть в выборку
+            for survey_id, user_id in marks:
+                bits[survey_id] = bits.get(survey_id, 0) | (1 << user_id)
+            self._bits = bits
+            self._built_at = time.monotonic()
+        return True
+
+    @instrumented
+    def warm(self) -> bool:
+        """Полная загрузка индекса из responses"""
+        if not self._rebuild():
+            return False
+
+        self.warmed = True
+        logger.info(f"Индекс ответов загружен: {sum(bin(b).count('1') for b in self._bits.values())} ответов, "
+                    f"{len(self._bits)} опросов")
+        return True
+
+    @instrumented
+    def refresh(self) -> int:
+        """
+        Догрузка ответов других процессов: хвост id_response от отметки минус окно,
+        по истечении интервала - полная перезагрузка. Возвращает число прочитанных опросов
+        """
+        if not self.warmed:
+            return 0
+
+        if time.monotonic() - self._built_at >= self.rebuild_interval:
+            if self._rebuild():
+                logger.debug(f"Индекс ответов перестроен: {len(self._bits)} опросов")
+            return len(self._bits)
+
+        bits = self._load(
+            'SELECT id_response, id_survey, id_user FROM responses WHERE id_response > %s;',
+            (self._last_response_id - self.rescan_window,)
+        )
+        if not bits:
+            return 0
+        with self._lock:
+            for survey_id, survey_bits in bits.items():
+                self._bits[survey_id] = self._bits.get(survey_id, 0) | survey_bits
+        logger.debug(f"Индекс ответов: перечитаны ответы {len(bits)} опросов")
+        return len(bits)
+
+    def mark_answered(self, survey_id: int, user_id: int):
+        if user_id is None or user_id < 0:
+            return
+        with self._lock:
+            self._bits[survey_id] = self._bits.get(survey_id, 0) | (1 << user_id)
+            if self._marks_during_rebuild is not None:
+                self._marks_during_rebuild.append((survey_id, user_id))
+
+    def forget_surveys(self, survey_ids: Iterable[int]):
+        """Удаление опросов, перенесенных в архив"""
+        with self._lock:
+            for survey_id in survey_ids:
+                self._bits.pop(survey_id, None)
+
+    def has_answered(self, survey_id: int, user_id: int) -> bool:
+        return bool(self._bits.get(survey_id, 0) >> user_id & 1)
+
+    def answered_surveys(self, user_id: int, survey_ids: Iterable[int]) -> Set[int]:
+        """Какие из опросов survey_ids пользователь уже ответил"""
+        return {survey_id for survey_id in survey_ids if self._bits.get(survey_id, 0) >> user_id & 1}
+
+    def unanswered_users(self, survey_id: int, user_ids: Iterable[int]) -> List[int]:
+        """Кто из user_ids еще не ответил на опрос"""
+        bits = self._bits.get(survey_id, 0)
+        return [user_id for user_id in user_ids if not bits >> user_id & 1]
+
+
+# Глобальный индекс
+answered_index = AnsweredIndex()
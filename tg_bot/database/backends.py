@@ -0,0 +1,380 @@
+import json
+import logging
+import re
+import sqlite3
+import threading
+from datetime import date, datetime
+from functools import lru_cache
+
+import psycopg2
+import psycopg2.extensions
+from psycopg2.extras import execute_batch
+
+from tg_bot.database.instrumentation import query_stats
+
+logger = logging.getLogger(__name__)
+
+
+class TrackedConnection(psycopg2.extensions.connection):
+    """Соединение, которое учитывает себя в числе открытых (метрика db_connections_open)"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._tracked = True
+        query_stats.record_open()
+
+    def close(self):
+        if self._tracked:
+            self._tracked = False
+            query_stats.record_close()
+        super().close()
+
+
+class PostgresBackend:
+    """PostgreSQL через psycopg2 - основное хранилище"""
+
+    dialect = 'postgres'
+
+    def __init__(self, host, database, user, password, port):
+        self.host = host
+        self.database = database
+        self.user = user
+        self.password = password
+        self.port = port
+
+    def describe(self):
+        return [
+            f"  Хост: {self.host}",
+            f"  База данных: {self.database}",
+            f"  Пользователь: {self.user}",
+            f"  Порт: {self.port}",
+        ]
+
+    def connect(self):
+        return psycopg2.connect(
+            host=self.host,
+            database=self.database,
+            user=self.user,
+            password=self.password,
+            port=self.port,
+            connect_timeout=10,
+            connection_factory=TrackedConnection
+        )
+
+    @staticmethod
+    def seconds_between(later: str, earlier: str) -> str:
+        """SQL-выражение: разница двух моментов времени в секундах"""
+        return f"EXTRACT(epoch FROM ({later} - {earlier}))"
+
+    @staticmethod
+    def add_seconds(moment: str, seconds: str) -> str:
+        """SQL-выражение: момент времени плюс seconds секунд"""
+        return f"({moment} + {seconds} * INTERVAL '1 second')"
+
+    @staticmethod
+    def execute_batch(cursor, query, rows):
+        execute_batch(cursor, query, rows)
+
+
+# Перевод SQL моделей (диалект PostgreSQL, параметры psycopg2) в диалект SQLite.
+# Покрывает только конструкции, которые встречаются в запросах моделей.
+_SQLITE_REWRITES = [
+    (re.compile(r"NOW\(\)\s+AT\s+TIME\s+ZONE\s+'UTC'\s*\+\s*INTERVAL\s+'(\d+) hours?'", re.I),
+     r"datetime('now', '+\1 hours')"),
+    (re.compile(r"DEFAULT\s+LOCALTIMESTAMP", re.I), "DEFAULT (datetime('now', 'localtime'))"),
+    (re.compile(r"\bLOCALTIMESTAMP\b", re.I), "datetime('now', 'localtime')"),
+    (re.compile(r"\bNOW\(\)", re.I), "datetime('now')"),
+    (re.compile(r"(?<!:)::[A-Za-z_]+"), ""),
+    (re.compile(r"=\s*ANY\(\s*(%s|%\(\w+\)s)\s*\)", re.I), r"IN (SELECT value FROM json_each(\1))"),
+    (re.compile(r"%\((\w+)\)s"), r":\1"),
+    (re.compile(r"%s"), "?"),
+    (re.compile(r"\bILIKE\b", re.I), "LIKE"),
+    (re.compile(r"\b(?:BIG)?SERIAL\s+PRIMARY\s+KEY", re.I), "INTEGER PRIMARY KEY AUTOINCREMENT"),
+]
+
+
+@lru_cache(maxsize=512)
+def translate_sql(query: str, with_params: bool = True) -> str:
+    for pattern, replacement in _SQLITE_REWRITES:
+        query = pattern.sub(replacement, query)
+    # Как в psycopg2: %% - экранированный %, только если переданы параметры
+    return query.replace('%%', '%') if with_params else query
+
+
+def _adapt_value(value):
+    # Списки передаются в ANY(%s) - в SQLite они разворачиваются через json_each
+    if isinstance(value, (list, tuple, set)):
+        return json.dumps(list(value))
+    return value
+
+
+def _adapt_params(params):
+    if params is None:
+        return ()
+    if isinstance(params, dict):
+        return {key: _adapt_value(value) for key, value in params.items()}
+    return [_adapt_value(value) for value in params]
+
+
+def _adapt_datetime(value: datetime) -> str:
+    # Как колонка TIMESTAMP без часового пояса в PostgreSQL: смещение отбрасывается
+    return value.replace(tzinfo=None).isoformat(' ')
+
+
+def _convert_timestamp(raw: bytes):
+    return datetime.fromisoformat(raw.decode())
+
+
+def _convert_date(raw: bytes):
+    return date.fromisoformat(raw.decode()[:10])
+
+
+sqlite3.register_adapter(datetime, _adapt_datetime)
+sqlite3.register_adapter(date, date.isoformat)
+sqlite3.register_converter('TIMESTAMP', _convert_timestamp)
+sqlite3.register_converter('DATE', _convert_date)
+
+
+def _dict_row(cursor, row):
+    return {column[0]: value for column, value in zip(cursor.description, row)}
+
+
+class SqliteCursor:
+    """Курсор с интерфейсом psycopg2: переводит SQL и параметры перед выполнением"""
+
+    def __init__(self, cursor: sqlite3.Cursor):
+        self._cursor = cursor
+
+    def execute(self, query, params=None):
+        self._cursor.execute(translate_sql(query, params is not None), _adapt_params(params))
+
+    def executemany(self, query, rows):
+        self._cursor.executemany(translate_sql(query), [_adapt_params(row) for row in rows])
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchmany(self, size=None):
+        return self._cursor.fetchmany(size or self._cursor.arraysize)
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    def close(self):
+        self._cursor.close()
+
+
+class SqliteConnection:
+    """Соединение SQLite с интерфейсом, который используют модели (cursor/commit/rollback/close)"""
+
+    def __init__(self, raw: sqlite3.Connection):
+        self._raw = raw
+        self.closed = 0
+        query_stats.record_open()
+
+    def cursor(self, name=None, cursor_factory=None):
+        # name - для совместимости с именованными курсорами psycopg2
+        cursor = self._raw.cursor()
+        if cursor_factory is not None:
+            # RealDictCursor и подобные - строки в виде словарей
+            cursor.row_factory = _dict_row
+        return SqliteCursor(cursor)
+
+    def commit(self):
+        self._raw.commit()
+
+    def rollback(self):
+        self._raw.rollback()
+
+    def close(self):
+        if not self.closed:
+            self.closed = 1
+            query_stats.record_close()
+            self._raw.close()
+
+
+# Таблицы, которые в PostgreSQL создаются вне бота (см. createed_bd.txt).
+# Индексы совпадают с ключами ON CONFLICT в моделях.
+SQLITE_BASE_SCHEMA = [
+    '''
+    CREATE TABLE IF NOT EXISTS users (
+        id_user INTEGER PRIMARY KEY AUTOINCREMENT,
+        name VARCHAR(255),
+        user_name VARCHAR(255),
+        tg_username VARCHAR(255),
+        tg_id BIGINT,
+        role VARCHAR(64),
+        jira_name VARCHAR(255),
+        jira_email VARCHAR(255)
+    );
+    ''',
+    'CREATE UNIQUE INDEX IF NOT EXISTS users_tg_username_uidx ON users (tg_username);',
+    'CREATE INDEX IF NOT EXISTS users_jira_email_idx ON users (jira_email);',
+    '''
+    CREATE TABLE IF NOT EXISTS surveys (
+        id_survey INTEGER PRIMARY KEY AUTOINCREMENT,
+        datetime TIMESTAMP,
+        question TEXT,
+        role VARCHAR(64),
+        state VARCHAR(32)
+    );
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS responses (
+        id_response INTEGER PRIMARY KEY AUTOINCREMENT,
+        id_user INTEGER,
+        id_survey INTEGER,
+        answer TEXT
+    );
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS reminders (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        survey_id INTEGER NOT NULL,
+        user_id INTEGER NOT NULL,
+        reminder_stage INTEGER NOT NULL,
+        next_reminder_time TIMESTAMP NOT NULL,
+        status VARCHAR(32) NOT NULL DEFAULT 'pending',
+        created_at TIMESTAMP
+    );
+    ''',
+    '''
+    CREATE UNIQUE INDEX IF NOT EXISTS reminders_survey_user_stage_uidx
+    ON reminders (survey_id, user_id, reminder_stage);
+    ''',
+    'CREATE INDEX IF NOT EXISTS reminders_status_time_idx ON reminders (status, next_reminder_time);',
+    '''
+    CREATE TABLE IF NOT EXISTS projects (
+        project_key VARCHAR(64) PRIMARY KEY,
+        name VARCHAR(255),
+        projecttypekey VARCHAR(64)
+    );
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS boards (
+        id_board INTEGER PRIMARY KEY,
+        name VARCHAR(255),
+        project_key VARCHAR(64)
+    );
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS sprints (
+        id_sprint INTEGER PRIMARY KEY,
+        state VARCHAR(32),
+        start_date DATE,
+        finish_date DATE,
+        name VARCHAR(255),
+        id_board INTEGER
+    );
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS tasks (
+        id_task INTEGER PRIMARY KEY,
+        task_key VARCHAR(64),
+        summary TEXT,
+        priority_name VARCHAR(64),
+        project_key VARCHAR(64),
+        reporter_name VARCHAR(255),
+        assignee_name VARCHAR(255),
+        issue_type VARCHAR(64),
+        hierarchylevel INTEGER,
+        status_key VARCHAR(64),
+        id_sprint INTEGER,
+        id_user INTEGER
+    );
+    ''',
+]
+
+
+class SqliteBackend:
+    """
+    Встроенная SQLite для разработки, бенчмарков и небольших установок без сервера БД.
+    Файл в режиме WAL; схема создается при первом подключении.
+    path=':memory:' - общая БД в памяти процесса (живет, пока жив backend)
+    """
+
+    dialect = 'sqlite'
+
+    def __init__(self, path: str, timeout: float = 10):
+        self.path = path
+        self.timeout = timeout
+        self._memory = path == ':memory:'
+        self._lock = threading.Lock()
+        self._bootstrapped = False
+        self._keeper = None
+
+    def describe(self):
+        return [f"  SQLite: {self.path}"]
+
+    def _open(self) -> sqlite3.Connection:
+        if self._memory:
+            raw = sqlite3.connect(f'file:tg_bot_{id(self)}?mode=memory&cache=shared', uri=True,
+                                  timeout=self.timeout, detect_types=sqlite3.PARSE_DECLTYPES)
+        else:
+            raw = sqlite3.connect(self.path, timeout=self.timeout, detect_types=sqlite3.PARSE_DECLTYPES)
+            raw.execute('PRAGMA synchronous=NORMAL')
+        return raw
+
+    def _bootstrap(self, raw: sqlite3.Connection):
+        # Импорт здесь: schema импортирует connection, который создает backend
+        from tg_bot.database.schema import SCHEMA_STATEMENTS
+
+        if self._memory:
+            # БД в памяти удаляется с закрытием последнего соединения
+            self._keeper = self._open()
+        else:
+            raw.execute('PRAGMA journal_mode=WAL')
+
+        for statement in SQLITE_BASE_SCHEMA + SCHEMA_STATEMENTS:
+            raw.execute(translate_sql(statement))
+        raw.commit()
+        logger.info(f"Схема SQLite создана: {self.path}")
+
+    def connect(self):
+        raw = self._open()
+        if not self._bootstrapped:
+            with self._lock:
+                if not self._bootstrapped:
+                    try:
+                        self._bootstrap(raw)
+                    except Exception:
+                        raw.close()
+                        raise
+                    self._bootstrapped = True
+        return SqliteConnection(raw)
+
+    @staticmethod
+    def seconds_between(later: str, earlier: str) -> str:
+        return f"((julianday({later}) - julianday({earlier})) * 86400.0)"
+
+    @staticmethod
+    def add_seconds(moment: str, seconds: str) -> str:
+        return f"datetime({moment}, ({seconds}) || ' seconds')"
+
+    @staticmethod
+    def execute_batch(cursor, query, rows):
+        cursor.executemany(query, rows)
+
+
+def create_backend(config):
+    """Backend по настройке DB_BACKEND"""
+    if config.DB_BACKEND == 'sqlite':
+        return SqliteBackend(config.SQLITE_PATH)
+    return PostgresBackend(
+        host=config.DB_HOST,
+        database=config.DB_NAME,
+        user=config.DB_USER,
+        password=config.DB_PASSWORD,
+        port=config.DB_PORT,
+    )
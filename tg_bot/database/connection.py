@@ -1,8 +1,9 @@
 import logging
-
-import psycopg2
+import time
 
 from tg_bot.config.settings import config
+from tg_bot.database.backends import create_backend
+from tg_bot.database.instrumentation import query_stats
 
 logger = logging.getLogger(__name__)
 
@@ -14,35 +15,29 @@ class DatabaseConnection:
     _initialized = False
 
     def __init__(self):
-        self.host = config.DB_HOST
-        self.database = config.DB_NAME
-        self.user = config.DB_USER
-        self.password = config.DB_PASSWORD
-        self.port = config.DB_PORT
+        self.backend = create_backend(config)
 
         if not self._initialized:
-            logger.info(f"Параметры подключения к БД:")
-            logger.info(f"  Хост: {self.host}")
-            logger.info(f"  База данных: {self.database}")
-            logger.info(f"  Пользователь: {self.user}")
-            logger.info(f"  Порт: {self.port}")
+            logger.info(f"Параметры подключения к БД ({self.backend.dialect}):")
+            for line in self.backend.describe():
+                logger.info(line)
             self._initialized = True
 
+    @property
+    def dialect(self) -> str:
+        return self.backend.dialect
+
     def get_connection(self):
         """Создание подключения к БД"""
+        started = time.perf_counter()
         try:
-            connection = psycopg2.connect(
-                host=self.host,
-                database=self.database,
-                user=self.user,
-                password=self.password,
-                port=self.port,
-                connect_timeout=10
-            )
+            connection = self.backend.connect()
+            query_stats.record_acquire((time.perf_counter() - started) * 1000)
             return connection
         except Exception as e:
+            query_stats.record_acquire((time.perf_counter() - started) * 1000, success=False)
             logger.error(f"Ошибка подключения к БД: {e}")
-            logger.error(f"Параметры: host={self.host}, db={self.database}, user={self.user}, port={self.port}")
+            logger.error(f"Параметры: {'; '.join(line.strip() for line in self.backend.describe())}")
             return None
 
 
@@ -0,0 +1,70 @@
+import logging
+from typing import Iterable, Optional, Set
+
+from tg_bot.database.connection import db_connection
+from tg_bot.database.instrumentation import instrumented
+
+logger = logging.getLogger(__name__)
+
+
+class DeliveryModel:
+    """
+    Контрольные точки рассылки опросов: кому опрос уже доставлен.
+    Рассылка, прерванная остановкой бота, на следующем запуске
+    пропускает этих пользователей и продолжается с места остановки
+    """
+
+    @staticmethod
+    @instrumented
+    def get_delivered_users(survey_id: int) -> Optional[Set[int]]:
+        """id пользователей, которым опрос уже доставлен; None - контрольную точку прочитать не удалось"""
+        query = '''
+        SELECT user_id FROM survey_deliveries
+        WHERE survey_id = %s;
+        '''
+
+        connection = db_connection.get_connection()
+        if not connection:
+            return None
+
+        try:
+            cursor = connection.cursor()
+            cursor.execute(query, (survey_id,))
+            return {row[0] for row in cursor.fetchall()}
+        except Exception as e:
+            logger.error(f"Ошибка получения доставок опроса #{survey_id}: {e}")
+            return None
+        finally:
+            cursor.close()
+            connection.close()
+
+    @staticmethod
+    @instrumented
+    def record_deliveries(survey_id: int, user_ids: Iterable[int]) -> bool:
+        """Запись пачки доставок одной транзакцией (повторная запись не ошибка)"""
+        rows = [(survey_id, user_id) for user_id in user_ids]
+        if not rows:
+            return True
+
+        query = '''
+        INSERT INTO survey_deliveries (survey_id, user_id)
+        VALUES (%s, %s)
+        ON CONFLICT (survey_id, user_id) DO NOTHING;
+        '''
+
+        connection = db_connection.get_connection()
+        if not connection:
+            return False
+
+        try:
+            cursor = connection.cursor()
+            db_connection.backend.execute_batch(cursor, query, rows)
+            connection.commit()
+            return True
+        except Exception as e:
+            logger.error(f"Ошибка записи доставок опроса #{survey_id}: {e}")
+            connection.rollback()
+            return False
+        finally:
+            cursor.close()
+            connection.close()
@@ -0,0 +1,211 @@
+import functools
+import logging
+import threading
+import time
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+from tg_bot.config.settings import config
+
+logger = logging.getLogger(__name__)
+
+# Границы корзин гистограмм задержек (мс)
+LATENCY_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+# Счетчики запросов текущего Telegram update (None - вне обработки update)
+_update_counters: ContextVar[Optional[Dict]] = ContextVar('update_query_counters', default=None)
+
+
+class LatencyHistogram:
+    """Гистограмма задержек с фиксированными корзинами"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS_MS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # последняя корзина - +Inf
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def observe(self, value_ms: float):
+        for i, bound in enumerate(self.buckets):
+            if value_ms <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+
+        self.count += 1
+        self.total_ms += value_ms
+        self.max_ms = max(self.max_ms, value_ms)
+
+    def copy(self) -> 'LatencyHistogram':
+        clone = LatencyHistogram(self.buckets)
+        clone.counts = list(self.counts)
+        clone.count = self.count
+        clone.total_ms = self.total_ms
+        clone.max_ms = self.max_ms
+        return clone
+
+    def percentile(self, p: float) -> float:
+        """Оценка перцентиля по верхней границе корзины"""
+        if not self.count:
+            return 0.0
+
+        threshold = self.count * p / 100
+        cumulative = 0
+        for i, bucket_count in enumerate(self.counts):
+            cumulative += bucket_count
+            if cumulative >= threshold:
+                return float(self.buckets[i]) if i < len(self.buckets) else self.max_ms
+        return self.max_ms
+
+    def to_dict(self) -> Dict:
+        return {
+            'count': self.count,
+            'total_ms': round(self.total_ms, 3),
+            'avg_ms': round(self.total_ms / self.count, 3) if self.count else 0.0,
+            'max_ms': round(self.max_ms, 3),
+            'p50_ms': self.percentile(50),
+            'p99_ms': self.percentile(99),
+        }
+
+
+class QueryStats:
+    """
+    Статистика запросов модельного слоя: задержки, строки, получение соединений.
+    Пишется из цикла событий и рабочих потоков (asyncio.to_thread), читается потоком
+    HTTP-сервера метрик - изменения и копии для метрик выполняются под блокировкой
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latency: Dict[str, LatencyHistogram] = {}
+        self.rows: Dict[str, int] = {}
+        self.errors: Dict[str, int] = {}
+        self.connection_acquire = LatencyHistogram()
+        self.connection_failures = 0
+        self.connections_open = 0
+
+    def record_query(self, name: str, duration_ms: float, rows: int, failed: bool = False):
+        with self._lock:
+            if name not in self.latency:
+                self.latency[name] = LatencyHistogram()
+                self.rows[name] = 0
+                self.errors[name] = 0
+
+            self.latency[name].observe(duration_ms)
+            self.rows[name] += rows
+            if failed:
+                self.errors[name] += 1
+
+        counters = _update_counters.get()
+        if counters is not None:
+            counters['queries'] += 1
+            counters['db_ms'] += duration_ms
+
+    def record_acquire(self, duration_ms: float, success: bool = True):
+        with self._lock:
+            self.connection_acquire.observe(duration_ms)
+            if not success:
+                self.connection_failures += 1
+
+        counters = _update_counters.get()
+        if counters is not None:
+            counters['connections'] += 1
+
+    def record_open(self):
+        with self._lock:
+            self.connections_open += 1
+
+    def record_close(self):
+        with self._lock:
+            self.connections_open -= 1
+
+    def snapshot(self) -> Dict:
+        """Текущая статистика в виде словаря"""
+        with self._lock:
+            return {
+                'queries': {
+                    name: {**histogram.to_dict(), 'rows': self.rows[name], 'errors': self.errors[name]}
+                    for name, histogram in self.latency.items()
+                },
+                'connection_acquire': self.connection_acquire.to_dict(),
+                'connection_failures': self.connection_failures,
+                'connections_open': self.connections_open,
+            }
+
+    def copy(self) -> 'QueryStats':
+        """Согласованная копия для публикации: гистограммы не меняются во время отрисовки метрик"""
+        clone = QueryStats()
+        with self._lock:
+            clone.latency = {name: histogram.copy() for name, histogram in self.latency.items()}
+            clone.rows = dict(self.rows)
+            clone.errors = dict(self.errors)
+            clone.connection_acquire = self.connection_acquire.copy()
+            clone.connection_failures = self.connection_failures
+            clone.connections_open = self.connections_open
+        return clone
+
+    def reset(self):
+        self.__init__()
+
+
+query_stats = QueryStats()
+
+
+def start_update_tracking():
+    """Начало подсчета запросов для одного update"""
+    _update_counters.set({'queries': 0, 'connections': 0, 'db_ms': 0.0, 'started': time.perf_counter()})
+
+
+def finish_update_tracking() -> Optional[Dict]:
+    """Завершение подсчета - возвращает счетчики текущего update"""
+    counters = _update_counters.get()
+    _update_counters.set(None)
+    return counters
+
+
+def _count_rows(result) -> int:
+    """Количество строк в результате метода модели"""
+    if isinstance(result, list):
+        return len(result)
+    return 1 if result else 0
+
+
+def _redact(value) -> str:
+    """Параметры в логах: только тип и размер, без значений"""
+    if value is None:
+        return 'None'
+    if isinstance(value, (str, bytes, list, tuple, dict, set)):
+        return f"<{type(value).__name__}:{len(value)}>"
+    return f"<{type(value).__name__}>"
+
+
+def instrumented(func):
+    """
+    Декоратор для методов моделей: время выполнения, число строк, медленные запросы.
+    Имя запроса - квалифицированное имя метода (например, SurveyModel.get_active_surveys)
+    """
+    name = func.__qualname__
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        failed = False
+        result = None
+        try:
+            result = func(*args, **kwargs)
+            return result
+        except Exception:
+            failed = True
+            raise
+        finally:
+            duration_ms = (time.perf_counter() - started) * 1000
+            query_stats.record_query(name, duration_ms, _count_rows(result), failed)
+
+            if duration_ms >= config.SLOW_QUERY_MS:
+                params = ', '.join([_redact(arg) for arg in args] +
+                                   [f"{key}={_redact(value)}" for key, value in kwargs.items()])
+                logger.warning(f"Медленный запрос {name}({params}): {duration_ms:.1f} мс")
+
+    return wrapper
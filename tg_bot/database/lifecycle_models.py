@@ -0,0 +1,134 @@
+import logging
+from datetime import datetime
+from typing import List
+
+from tg_bot.config.constants import SURVEY_STATUS
+from tg_bot.database.connection import db_connection
+from tg_bot.database.instrumentation import instrumented
+
+logger = logging.getLogger(__name__)
+
+# Перенос в архив: (живая таблица, архивная таблица, колонки, условие по опросам пачки)
+ARCHIVE_TABLES = [
+    ('reminders', 'reminders_archive',
+     'id, survey_id, user_id, reminder_stage, next_reminder_time, status, created_at',
+     'survey_id = ANY(%s)'),
+    ('response_parts', 'response_parts_archive',
+     'id_part, id_response, id_user, text, created_at',
+     'id_response IN (SELECT id_response FROM responses WHERE id_survey = ANY(%s))'),
+    ('responses', 'responses_archive',
+     'id_response, id_user, id_survey, answer',
+     'id_survey = ANY(%s)'),
+    ('surveys', 'surveys_archive',
+     'id_survey, datetime, question, role, state',
+     'id_survey = ANY(%s)'),
+]
+# Служебные строки опросов пачки, которые удаляются без переноса
+PURGE_TABLES = [
+    ('survey_deliveries', 'survey_id = ANY(%s)'),
+]
+
+
+class LifecycleModel:
+    """
+    Жизненный цикл опросов: закрытие просроченных и перенос старых закрытых
+    опросов вместе с ответами, дополнениями и напоминаниями в *_archive.
+    Живые таблицы содержат только рабочее окно - по ним идут горячие запросы
+    (активные опросы, ожидающие напоминания, индекс ответов)
+    """
+
+    @staticmethod
+    @instrumented
+    def expire_surveys(before: datetime) -> List[int]:
+        """
+        Закрытие активных опросов, отправленных раньше before, и отмена
+        их ожидающих напоминаний одной транзакцией. Возвращает id закрытых опросов
+        """
+        close_query = '''
+        UPDATE surveys
+        SET state = %s
+        WHERE state = %s AND datetime < %s
+        RETURNING id_survey;
+        '''
+        cancel_query = '''
+        UPDATE reminders
+        SET status = 'cancelled'
+        WHERE status = 'pending' AND survey_id = ANY(%s);
+        '''
+
+        connection = db_connection.get_connection()
+        if not connection:
+            return []
+
+        try:
+            cursor = connection.cursor()
+            cursor.execute(close_query, (SURVEY_STATUS['CLOSED'], SURVEY_STATUS['ACTIVE'], before))
+            survey_ids = [row[0] for row in cursor.fetchall()]
+            cancelled = 0
+            if survey_ids:
+                cursor.execute(cancel_query, (survey_ids,))
+                cancelled = cursor.rowcount
+            connection.commit()
+            if survey_ids:
+                logger.info(f"Закрыто просроченных опросов: {len(survey_ids)}, отменено напоминаний: {cancelled}")
+            return survey_ids
+        except Exception as e:
+            logger.error(f"Ошибка закрытия просроченных опросов: {e}")
+            connection.rollback()
+            return []
+        finally:
+            cursor.close()
+            connection.close()
+
+    @staticmethod
+    @instrumented
+    def archive_surveys(before: datetime, batch_size: int = 500) -> List[int]:
+        """
+        Перенос неактивных опросов, отправленных раньше before, в архивные таблицы.
+        Каждая пачка из batch_size опросов переносится отдельной транзакцией.
+        Возвращает id перенесенных опросов
+        """
+        select_query = '''
+        SELECT id_survey FROM surveys
+        WHERE state <> %s AND datetime < %s
+        ORDER BY id_survey
+        LIMIT %s;
+        '''
+
+        connection = db_connection.get_connection()
+        if not connection:
+            return []
+
+        archived = []
+        try:
+            cursor = connection.cursor()
+            while True:
+                cursor.execute(select_query, (SURVEY_STATUS['ACTIVE'], before, batch_size))
+                survey_ids = [row[0] for row in cursor.fetchall()]
+                if not survey_ids:
+                    break
+
+                moved = {}
+                for table, archive_table, columns, condition in ARCHIVE_TABLES:
+                    cursor.execute(
+                        f'INSERT INTO {archive_table} ({columns}) SELECT {columns} FROM {table} WHERE {condition};',
+                        (survey_ids,)
+                    )
+                    cursor.execute(f'DELETE FROM {table} WHERE {condition};', (survey_ids,))
+                    moved[table] = cursor.rowcount
+                for table, condition in PURGE_TABLES:
+                    cursor.execute(f'DELETE FROM {table} WHERE {condition};', (survey_ids,))
+                connection.commit()
+
+                archived.extend(survey_ids)
+                logger.info("В архив перенесено: " + ", ".join(f"{table} {count}" for table, count in moved.items()))
+                if len(survey_ids) < batch_size:
+                    break
+            return archived
+        except Exception as e:
+            logger.error(f"Ошибка переноса опросов в архив: {e}")
+            connection.rollback()
+            return archived
+        finally:
+            cursor.close()
+            connection.close()
@@ -1,7 +1,11 @@
 from tg_bot.config.roles_config import ALL_ROLES, ROLE_CATEGORIES
 from tg_bot.config.constants import VALID_ROLES, SURVEY_STATUS
+from tg_bot.database.answered_index import answered_index
 from tg_bot.database.connection import db_connection
+from tg_bot.database.instrumentation import instrumented
+from tg_bot.database.report_models import ReportModel
 from psycopg2.extras import RealDictCursor
+from datetime import datetime
 import logging
 
 logger = logging.getLogger(__name__)
@@ -11,6 +15,7 @@ class UserModel:
     """Модель пользователей - УПРОЩЕННАЯ версия"""
 
     @staticmethod
+    @instrumented
     def get_user_by_telegram_username(telegram_username):
         """Получение пользователя по tg_username - ИСПОЛЬЗУЕТСЯ"""
         query = 'SELECT * FROM users WHERE tg_username = %s;'
@@ -30,6 +35,7 @@ class UserModel:
             connection.close()
 
     @staticmethod
+    @instrumented
     def get_user_by_jira_name(jira_name):
         """Получение пользователя по jira_name - ИСПОЛЬЗУЕТСЯ при регистрации"""
         query = 'SELECT * FROM users WHERE jira_name = %s;'
@@ -49,6 +55,7 @@ class UserModel:
             connection.close()
 
     @staticmethod
+    @instrumented
     def get_user_by_jira_email(jira_email):
         """Получение пользователя по jira_email - ИСПОЛЬЗУЕТСЯ при регистрации"""
         query = 'SELECT * FROM users WHERE jira_email = %s;'
@@ -68,6 +75,7 @@ class UserModel:
             connection.close()
 
     @staticmethod
+    @instrumented
     def register_user(name, telegram_username, tg_id, role, jira_account=None):
         """Регистрация нового пользователя - ИСПОЛЬЗУЕТСЯ при регистрации в боте"""
         if role == 'ceo':
@@ -111,7 +119,8 @@ class UserModel:
         try:
             cursor = connection.cursor()
             cursor.execute(query, (name, telegram_username, tg_id, role, jira_name, jira_email))
-            user_id = cursor.fetchone()[0]
+            # RETURNING дочитывается до commit: SQLite не фиксирует транзакцию с незавершенным запросом
+            cursor.fetchone()
             connection.commit()
             logger.info(f"Пользователь зарегистрирован: {name} (Telegram: @{telegram_username})")
             return True
@@ -124,6 +133,7 @@ class UserModel:
             connection.close()
 
     @staticmethod
+    @instrumented
     def update_existing_jira_user(user_id, telegram_username, tg_id, role, name):
         """Обновление существующего пользователя Jira при регистрации в Telegram"""
         # Обновляем ТОЛЬКО Telegram данные и имя пользователя, НЕ трогаем jira данные
@@ -168,6 +178,7 @@ class UserModel:
             connection.close()
 
     @staticmethod
+    @instrumented
     def get_users_by_role(role):
         """Получение пользователей по конкретной роли - ИСПОЛЬЗУЕТСЯ для отправки опросов"""
         query = '''
@@ -192,6 +203,7 @@ class UserModel:
             connection.close()
 
     @staticmethod
+    @instrumented
     def get_all_users_with_tg_id():
         """Получение всех пользователей с tg_id - ИСПОЛЬЗУЕТСЯ для опросов 'всем'"""
         query = '''
@@ -215,6 +227,7 @@ class UserModel:
             connection.close()
 
     @staticmethod
+    @instrumented
     def save_jira_user(jira_user_data):
         """Сохранение пользователя из Jira (ТОЛЬКО Jira данные, без user_name)"""
         jira_email = jira_user_data.get('jira_email')
@@ -277,27 +290,16 @@ class UserModel:
                 user_id = existing_user_id
             else:
                 # 4. Ищем свободный ID для нового пользователя
+                # (без generate_series - запрос одинаково работает в PostgreSQL и SQLite)
                 cursor.execute("""
-                    WITH used_ids AS (
-                        SELECT id_user FROM users 
-                        WHERE id_user <= (SELECT COALESCE(MAX(id_user), 0) FROM users)
-                    ),
-                    all_ids AS (
-                        SELECT generate_series(1, (SELECT COALESCE(MAX(id_user), 0) + 1 FROM users)) as id
-                    ),
-                    free_ids AS (
-                        SELECT a.id 
-                        FROM all_ids a 
-                        LEFT JOIN used_ids u ON a.id = u.id_user 
-                        WHERE u.id_user IS NULL 
-                        ORDER BY a.id 
-                        LIMIT 1
-                    )
-                    SELECT id FROM free_ids
-                    UNION
-                    SELECT (SELECT COALESCE(MAX(id_user), 0) + 1 FROM users)
-                    ORDER BY id
-                    LIMIT 1
+                    SELECT CASE
+                        WHEN NOT EXISTS (SELECT 1 FROM users WHERE id_user = 1) THEN 1
+                        ELSE (
+                            SELECT MIN(u.id_user) + 1 FROM users u
+                            WHERE u.id_user > 0
+                            AND NOT EXISTS (SELECT 1 FROM users n WHERE n.id_user = u.id_user + 1)
+                        )
+                    END
                 """)
 
                 free_id_result = cursor.fetchone()
@@ -341,7 +343,23 @@ class UserModel:
 class SurveyModel:
     """Модель опросов - ИСПОЛЬЗУЕТСЯ"""
 
+    # Версия набора опросов: увеличивается при создании/закрытии опроса,
+    # по ней кэши (страницы /allsurveys и т.п.) понимают, что данные устарели
+    _cache_version = 0
+
+    @staticmethod
+    def get_cache_version():
+        """Текущая версия набора опросов"""
+        return SurveyModel._cache_version
+
+    @staticmethod
+    def bump_cache_version():
+        """Инвалидация всех кэшей, построенных по опросам"""
+        SurveyModel._cache_version += 1
+        logger.debug(f"Версия кэша опросов: {SurveyModel._cache_version}")
+
     @staticmethod
+    @instrumented
     def create_survey(survey_data):
         """Создание нового опроса в БД - ИСПОЛЬЗУЕТСЯ"""
         query = '''
@@ -363,6 +381,7 @@ class SurveyModel:
             ))
             survey_id = cursor.fetchone()[0]
             connection.commit()
+            SurveyModel.bump_cache_version()
             logger.info(f"Опрос создан с ID: {survey_id}")
             return survey_id
         except Exception as e:
@@ -374,6 +393,37 @@ class SurveyModel:
             connection.close()
 
     @staticmethod
+    @instrumented
+    def close_survey(survey_id):
+        """Закрытие опроса (state = 'closed')"""
+        query = '''
+        UPDATE surveys
+        SET state = %s
+        WHERE id_survey = %s AND state = %s
+        RETURNING id_survey;
+        '''
+        connection = db_connection.get_connection()
+        if not connection:
+            return False
+        try:
+            cursor = connection.cursor()
+            cursor.execute(query, (SURVEY_STATUS['CLOSED'], survey_id, SURVEY_STATUS['ACTIVE']))
+            result = cursor.fetchone()
+            connection.commit()
+            if result:
+                SurveyModel.bump_cache_version()
+                logger.info(f"Опрос #{survey_id} закрыт")
+            return result is not None
+        except Exception as e:
+            logger.error(f"Ошибка закрытия опроса #{survey_id}: {e}")
+            connection.rollback()
+            return False
+        finally:
+            cursor.close()
+            connection.close()
+
+    @staticmethod
+    @instrumented
     def get_active_surveys():
         """Получение активных опросов - ИСПОЛЬЗУЕТСЯ"""
         query = '''
@@ -397,6 +447,30 @@ class SurveyModel:
             connection.close()
 
     @staticmethod
+    @instrumented
+    def get_survey_by_id(survey_id):
+        """Получение опроса по первичному ключу"""
+        query = '''
+        SELECT * FROM surveys
+        WHERE id_survey = %s;
+        '''
+        connection = db_connection.get_connection()
+        if not connection:
+            return None
+        try:
+            cursor = connection.cursor(cursor_factory=RealDictCursor)
+            cursor.execute(query, (survey_id,))
+            survey = cursor.fetchone()
+            return dict(survey) if survey else None
+        except Exception as e:
+            logger.error(f"Ошибка получения опроса #{survey_id}: {e}")
+            return None
+        finally:
+            cursor.close()
+            connection.close()
+
+    @staticmethod
+    @instrumented
     def get_surveys_for_role_since(role, date_from):
         """Получение опросов для роли с ограничением по дате - НОВЫЙ МЕТОД"""
         if role is None:
@@ -434,6 +508,7 @@ class SurveyModel:
             connection.close()
 
     @staticmethod
+    @instrumented
     def get_active_surveys_since(date_from):
         """Получение активных опросов с ограничением по дате - НОВЫЙ МЕТОД"""
         query = '''
@@ -463,13 +538,50 @@ class ResponseModel:
 
     @staticmethod
     def save_response(response_data):
-        """Сохранение ответа на опрос - ИСПРАВЛЕННАЯ ВЕРСИЯ"""
-        id_survey = response_data['id_survey']
-        id_user = response_data['id_user']
-        answer = response_data['answer']
+        """Сохранение ответа на опрос - возвращает id_response"""
+        result = ResponseModel.upsert_response(response_data)
+        return result[0] if result else None
 
-        # Сначала проверяем существующий ответ
-        existing_response = ResponseModel.get_user_response(id_survey, id_user)
+    @staticmethod
+    @instrumented
+    def upsert_response(response_data, cancel_reminders=True):
+        """
+        Атомарное сохранение ответа одним запросом: INSERT ... ON CONFLICT (id_survey, id_user)
+        и отмена pending-напоминаний пользователя по опросу в той же транзакции.
+        Повторный ответ заменяет прежний целиком - его дополнения (response_parts) удаляются.
+        Возвращает (id_response, inserted) или None при ошибке
+        """
+        query = '''
+            WITH upserted AS (
+                INSERT INTO responses
+                (id_user, id_survey, answer)
+                VALUES (%(id_user)s, %(id_survey)s, %(answer)s)
+                ON CONFLICT (id_survey, id_user)
+                DO UPDATE SET answer = EXCLUDED.answer
+                RETURNING id_response, (xmax = 0) AS inserted
+            ),
+            superseded AS (
+                DELETE FROM response_parts
+                WHERE id_response IN (SELECT id_response FROM upserted WHERE NOT inserted)
+            ),
+            cancelled AS (
+                UPDATE reminders
+                SET status = 'cancelled'
+                WHERE survey_id = %(id_survey)s
+                  AND user_id = %(id_user)s
+                  AND status = 'pending'
+                  AND %(cancel_reminders)s
+                RETURNING id
+            )
+            SELECT u.id_response, u.inserted, (SELECT COUNT(*) FROM cancelled) AS cancelled_count
+            FROM upserted u;
+            '''
+        params = {
+            'id_user': response_data['id_user'],
+            'id_survey': response_data['id_survey'],
+            'answer': response_data['answer'],
+            'cancel_reminders': cancel_reminders
+        }
 
         connection = db_connection.get_connection()
         if not connection:
@@ -477,37 +589,25 @@ class ResponseModel:
 
         try:
             cursor = connection.cursor()
-
-            if existing_response:
-                # Обновляем существующий ответ
-                query = '''
-                    UPDATE responses 
-                    SET answer = %s
-                    WHERE id_user = %s AND id_survey = %s
-                    RETURNING id_response;
-                    '''
-                params = (answer, id_user, id_survey)
+            if db_connection.dialect == 'sqlite':
+                result = ResponseModel._upsert_response_sqlite(cursor, params)
             else:
-                # Создаем новый ответ - БЕЗ УКАЗАНИЯ id_response
-                query = '''
-                    INSERT INTO responses 
-                    (id_user, id_survey, answer)
-                    VALUES (%s, %s, %s)
-                    RETURNING id_response;
-                    '''
-                params = (id_user, id_survey, answer)
-
-            cursor.execute(query, params)
-            result = cursor.fetchone()
-            response_id = result[0] if result else None
+                cursor.execute(query, params)
+                result = cursor.fetchone()
             connection.commit()
 
-            if response_id:
-                logger.info(f"Ответ сохранен: ID {response_id} для опроса #{id_survey}")
-            else:
-                logger.warning(f"Ответ не сохранен для опроса #{id_survey}")
+            if not result:
+                logger.warning(f"Ответ не сохранен для опроса #{params['id_survey']}")
+                return None
 
-            return response_id
+            response_id, inserted, cancelled_count = result
+            answered_index.mark_answered(params['id_survey'], params['id_user'])
+            if inserted:
+                ReportModel.record_answer(params['id_survey'], params['id_user'])
+            logger.info(
+                f"Ответ {'создан' if inserted else 'обновлен'}: ID {response_id} для опроса #{params['id_survey']}"
+                f", отменено напоминаний: {cancelled_count}")
+            return response_id, inserted
 
         except Exception as e:
             logger.error(f"Ошибка сохранения ответа: {e}")
@@ -518,6 +618,40 @@ class ResponseModel:
             connection.close()
 
     @staticmethod
+    def _upsert_response_sqlite(cursor, params):
+        """
+        upsert_response для SQLite: нет data-modifying CTE и xmax, поэтому
+        те же шаги выполняются отдельными запросами в одной транзакции
+        """
+        cursor.execute(
+            'SELECT id_response FROM responses WHERE id_survey = %(id_survey)s AND id_user = %(id_user)s;', params)
+        inserted = cursor.fetchone() is None
+
+        cursor.execute('''
+            INSERT INTO responses (id_user, id_survey, answer)
+            VALUES (%(id_user)s, %(id_survey)s, %(answer)s)
+            ON CONFLICT (id_survey, id_user)
+            DO UPDATE SET answer = EXCLUDED.answer
+            RETURNING id_response;
+            ''', params)
+        row = cursor.fetchone()
+        if not row:
+            return None
+        if not inserted:
+            cursor.execute('DELETE FROM response_parts WHERE id_response = %s;', (row[0],))
+
+        cancelled_count = 0
+        if params['cancel_reminders']:
+            cursor.execute('''
+                UPDATE reminders
+                SET status = 'cancelled'
+                WHERE survey_id = %(id_survey)s AND user_id = %(id_user)s AND status = 'pending';
+                ''', params)
+            cancelled_count = cursor.rowcount
+        return row[0], inserted, cancelled_count
+
+    @staticmethod
+    @instrumented
     def get_user_response(id_survey, id_user):
         """Получение ответа пользователя на опрос - ИСПОЛЬЗУЕТСЯ"""
         query = '''
@@ -538,3 +672,185 @@ class ResponseModel:
         finally:
             cursor.close()
             connection.close()
+
+    @staticmethod
+    @instrumented
+    def get_answered_survey_ids(id_user, survey_ids):
+        """Какие из опросов survey_ids пользователь уже ответил - из индекса в памяти или одним запросом"""
+        if not survey_ids:
+            return set()
+        if answered_index.warmed:
+            return answered_index.answered_surveys(id_user, survey_ids)
+
+        query = '''
+        SELECT id_survey FROM responses
+        WHERE id_user = %s AND id_survey = ANY(%s);
+        '''
+        connection = db_connection.get_connection()
+        if not connection:
+            return set()
+        try:
+            cursor = connection.cursor()
+            cursor.execute(query, (id_user, list(survey_ids)))
+            return {row[0] for row in cursor.fetchall()}
+        except Exception as e:
+            logger.error(f"Ошибка получения отвеченных опросов: {e}")
+            return set()
+        finally:
+            cursor.close()
+            connection.close()
+
+    @staticmethod
+    def iter_export_rows(survey_id=None, since=None, role=None, batch_size=2000):
+        """
+        Ответы для выгрузки (/export) - генератор словарей, по одному на ответ,
+        с дополнениями (response_parts) в тексте ответа. Строки читаются
+        серверным курсором порциями по batch_size, в памяти не накапливаются.
+        Фильтры: опрос, опросы начиная с даты since, роль отвечавшего
+        """
+        conditions = []
+        params = []
+        if survey_id is not None:
+            conditions.append('s.id_survey = %s')
+            params.append(survey_id)
+        if since is not None:
+            conditions.append('s.datetime >= %s')
+            params.append(since)
+        if role is not None:
+            conditions.append('u.role = %s')
+            params.append(role)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+
+        query = f'''
+        SELECT
+            r.id_response, s.id_survey, s.datetime AS survey_datetime, s.question, s.role AS survey_role,
+            r.id_user, u.user_name, u.tg_username, u.role AS user_role, r.answer,
+            p.text AS part_text, p.created_at AS part_created_at
+        FROM responses r
+        JOIN surveys s ON s.id_survey = r.id_survey
+        LEFT JOIN users u ON u.id_user = r.id_user
+        LEFT JOIN response_parts p ON p.id_response = r.id_response
+        {where}
+        ORDER BY r.id_response, p.id_part;
+        '''
+
+        connection = db_connection.get_connection()
+        if not connection:
+            raise RuntimeError("Нет подключения к БД")
+
+        # Именованный (серверный) курсор PostgreSQL; SQLite и так читает строки по мере выборки
+        cursor = connection.cursor(name='export_responses', cursor_factory=RealDictCursor)
+        try:
+            cursor.itersize = batch_size
+            cursor.execute(query, params)
+
+            current = None
+            parts = []
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                for row in rows:
+                    if current is None or row['id_response'] != current['id_response']:
+                        if current is not None:
+                            yield ResponseModel._export_row(current, parts)
+                        current = dict(row)
+                        parts = []
+                    if row['part_text'] is not None:
+                        parts.append({'text': row['part_text'], 'created_at': row['part_created_at']})
+            if current is not None:
+                yield ResponseModel._export_row(current, parts)
+        finally:
+            cursor.close()
+            connection.close()
+
+    @staticmethod
+    def _export_row(row, parts):
+        row['answer'] = ResponsePartModel.format_answer(row['answer'], parts)
+        row.pop('part_text', None)
+        row.pop('part_created_at', None)
+        return row
+
+
+class ResponsePartModel:
+    """Модель дополнений к ответам - только добавление, без перезаписи responses.answer"""
+
+    ADDENDUM_HEADER = "[Дополнено {date}]:"
+
+    @staticmethod
+    @instrumented
+    def append_part(id_response, id_user, text, created_at=None):
+        """Добавление дополнения к ответу - возвращает id_part"""
+        if created_at is None:
+            created_at = datetime.now()
+
+        query = '''
+        INSERT INTO response_parts
+        (id_response, id_user, text, created_at)
+        VALUES (%s, %s, %s, %s)
+        RETURNING id_part;
+        '''
+        connection = db_connection.get_connection()
+        if not connection:
+            return None
+        try:
+            cursor = connection.cursor()
+            cursor.execute(query, (id_response, id_user, text, created_at))
+            part_id = cursor.fetchone()[0]
+            connection.commit()
+            logger.info(f"Дополнение #{part_id} добавлено к ответу #{id_response}")
+            return part_id
+        except Exception as e:
+            logger.error(f"Ошибка добавления дополнения к ответу #{id_response}: {e}")
+            connection.rollback()
+            return None
+        finally:
+            cursor.close()
+            connection.close()
+
+    @staticmethod
+    @instrumented
+    def get_parts_for_responses(response_ids):
+        """Дополнения для списка ответов одним запросом: {id_response: [part, ...]}"""
+        if not response_ids:
+            return {}
+
+        query = '''
+        SELECT id_part, id_response, id_user, text, created_at
+        FROM response_parts
+        WHERE id_response = ANY(%s)
+        ORDER BY id_response, id_part;
+        '''
+        connection = db_connection.get_connection()
+        if not connection:
+            return {}
+        try:
+            cursor = connection.cursor(cursor_factory=RealDictCursor)
+            cursor.execute(query, (list(response_ids),))
+            parts = {}
+            for row in cursor.fetchall():
+                parts.setdefault(row['id_response'], []).append(dict(row))
+            return parts
+        except Exception as e:
+            logger.error(f"Ошибка получения дополнений ответов: {e}")
+            return {}
+        finally:
+            cursor.close()
+            connection.close()
+
+    @staticmethod
+    def format_answer(answer, parts):
+        """Сборка полного текста ответа: исходный ответ + дополнения с датой"""
+        full_answer = answer or ''
+
+        for part in parts:
+            if not full_answer:
+                full_answer = part['text']
+                continue
+
+            created_at = part.get('created_at')
+            date_str = created_at.strftime('%d.%m.%Y %H:%M') if hasattr(created_at, 'strftime') else str(created_at)
+            header = ResponsePartModel.ADDENDUM_HEADER.format(date=date_str)
+            full_answer = f"{full_answer}\n\n{header}\n{part['text']}"
+
+        return full_answer
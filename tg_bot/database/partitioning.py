@@ -0,0 +1,263 @@
+import logging
+import re
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from tg_bot.database.connection import db_connection
+from tg_bot.database.instrumentation import instrumented
+
+logger = logging.getLogger(__name__)
+
+# Секционируемые таблицы: таблица -> (ключ секционирования, колонка первичного ключа).
+# Ключ - id опроса: он входит во все уникальные ключи таблиц (ON CONFLICT в моделях),
+# поэтому запросы моделей не меняются
+PARTITIONED_TABLES = {
+    'reminders': ('survey_id', 'id'),
+    'responses': ('id_survey', 'id_response'),
+}
+
+_BOUND_RE = re.compile(r"FROM \((\w+)\) TO \((\w+)\)")
+
+
+def _month_suffix(moment: datetime) -> str:
+    return f"p{moment.year:04d}_{moment.month:02d}"
+
+
+def _month_index(year: int, month: int) -> int:
+    return year * 12 + month - 1
+
+
+class PartitionManager:
+    """
+    Помесячное секционирование reminders и responses (только PostgreSQL, включается DB_PARTITIONING).
+
+    Секции - диапазоны id опроса: секция <таблица>_pГГГГ_ММ хранит строки опросов,
+    созданных в этом месяце. Последняя секция открыта сверху (до MAXVALUE) и принимает
+    новые опросы; в начале месяца maintain() закрывает ее по текущему максимальному
+    id опроса и создает открытую секцию нового месяца. Старые секции не получают
+    новых строк - автоочистка их не трогает, а секции старше срока хранения
+    отсоединяются или удаляются целиком, без DELETE.
+    Строки, существовавшие до миграции, остаются в секции <таблица>_legacy
+    """
+
+    @staticmethod
+    def _fetchall(cursor, query, params=()) -> List:
+        cursor.execute(query, params)
+        return cursor.fetchall()
+
+    @staticmethod
+    def is_partitioned(cursor, table: str) -> bool:
+        rows = PartitionManager._fetchall(
+            cursor, "SELECT relkind FROM pg_class WHERE oid = to_regclass(%s);", (table,))
+        return bool(rows) and rows[0][0] == 'p'
+
+    @staticmethod
+    def _partitions(cursor, table: str) -> List[Dict]:
+        """Секции таблицы с границами диапазона"""
+        rows = PartitionManager._fetchall(cursor, '''
+            SELECT c.relname, pg_get_expr(c.relpartbound, c.oid)
+            FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = %s::regclass
+            ORDER BY c.relname;
+            ''', (table,))
+
+        partitions = []
+        for name, bound in rows:
+            match = _BOUND_RE.search(bound or '')
+            if match:
+                partitions.append({'name': name, 'lower': match.group(1), 'upper': match.group(2)})
+        return partitions
+
+    @staticmethod
+    def _next_lower_bound(cursor, key: str, partition: str, lower: str) -> int:
+        """Граница закрытия открытой секции: больше любого id опроса, уже существующего в БД"""
+        rows = PartitionManager._fetchall(cursor, f'''
+            SELECT GREATEST(
+                (SELECT MAX({key}) FROM {partition}),
+                (SELECT MAX(id_survey) FROM surveys)
+            );
+            ''')
+        upper = (rows[0][0] or 0) + 1
+        if lower != 'MINVALUE':
+            upper = max(upper, int(lower) + 1)
+        return upper
+
+    @staticmethod
+    def _migrate_table(cursor, table: str, key: str, id_column: str, now: datetime):
+        """
+        Перевод таблицы в секционированную: существующая таблица становится
+        секцией <таблица>_legacy, новые опросы попадают в открытую секцию текущего месяца
+        """
+        legacy = f"{table}_legacy"
+        cursor.execute(f"LOCK TABLE {table} IN ACCESS EXCLUSIVE MODE;")
+        sequence = PartitionManager._fetchall(
+            cursor, "SELECT pg_get_serial_sequence(%s, %s);", (table, id_column))[0][0]
+        cursor.execute(f"ALTER TABLE {table} RENAME TO {legacy};")
+
+        indexes = PartitionManager._fetchall(cursor, '''
+            SELECT i.relname, ix.indisprimary, ix.indisunique, pg_get_indexdef(ix.indexrelid),
+                   ARRAY(SELECT a.attname FROM unnest(ix.indkey) k
+                         JOIN pg_attribute a ON a.attrelid = ix.indrelid AND a.attnum = k)
+            FROM pg_index ix
+            JOIN pg_class i ON i.oid = ix.indexrelid
+            WHERE ix.indrelid = %s::regclass;
+            ''', (legacy,))
+        # Уникальность без ключа секционирования на секционированной таблице не обеспечить
+        for name, is_primary, is_unique, _, columns in indexes:
+            if is_unique and not is_primary and key not in columns:
+                raise RuntimeError(f"Уникальный индекс {name} таблицы {table} не содержит {key} - "
+                                   f"секционирование отменено, чтобы не потерять ограничение")
+        # Внешние ключи других таблиц остались бы только на секции _legacy
+        referencing = PartitionManager._fetchall(cursor, '''
+            SELECT conname, conrelid::regclass::text FROM pg_constraint
+            WHERE contype = 'f' AND confrelid = %s::regclass;
+            ''', (legacy,))
+        if referencing:
+            names = ', '.join(f"{relation}.{name}" for name, relation in referencing)
+            raise RuntimeError(f"На {table} ссылаются внешние ключи ({names}) - секционирование отменено")
+        foreign_keys = PartitionManager._fetchall(cursor, '''
+            SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint
+            WHERE contype = 'f' AND conrelid = %s::regclass;
+            ''', (legacy,))
+
+        # Имена индексов уникальны в схеме - освобождаем их для индексов новой таблицы
+        for name, *_ in indexes:
+            cursor.execute(f"ALTER INDEX {name} RENAME TO {name[:55]}_legacy;")
+
+        cursor.execute(f'''
+            CREATE TABLE {table} (LIKE {legacy} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)
+            PARTITION BY RANGE ({key});
+            ''')
+        for name, is_primary, is_unique, definition, columns in indexes:
+            if is_primary:
+                columns = list(columns) + ([key] if key not in columns else [])
+                cursor.execute(f"ALTER TABLE {table} ADD PRIMARY KEY ({', '.join(columns)});")
+            else:
+                cursor.execute(re.sub(r" ON (ONLY )?\S+ USING ", f" ON {table} USING ", definition, count=1))
+        # LIKE ... INCLUDING CONSTRAINTS переносит только CHECK и NOT NULL. Ключи создаются
+        # до подключения _legacy: при ATTACH ее такие же ключи присоединяются без повторной проверки
+        for name, definition in foreign_keys:
+            cursor.execute(f"ALTER TABLE {table} ADD CONSTRAINT {name} {definition};")
+
+        upper = PartitionManager._next_lower_bound(cursor, key, legacy, 'MINVALUE')
+        cursor.execute(f"ALTER TABLE {table} ATTACH PARTITION {legacy} FOR VALUES FROM (MINVALUE) TO ({upper});")
+        cursor.execute(f'''
+            CREATE TABLE {table}_{_month_suffix(now)} PARTITION OF {table}
+            FOR VALUES FROM ({upper}) TO (MAXVALUE);
+            ''')
+        if sequence:
+            # Иначе последовательность id удалится вместе с секцией _legacy
+            cursor.execute(f"ALTER SEQUENCE {sequence} OWNED BY {table}.{id_column};")
+        logger.info(f"Таблица {table} секционирована по {key}: строки до опроса #{upper} - в {legacy}")
+
+    @staticmethod
+    def _roll_table(cursor, table: str, key: str, now: datetime) -> Optional[str]:
+        """Закрытие открытой секции прошлого месяца и создание открытой секции текущего"""
+        current = f"{table}_{_month_suffix(now)}"
+        open_partitions = [p for p in PartitionManager._partitions(cursor, table) if p['upper'] == 'MAXVALUE']
+        if not open_partitions or open_partitions[0]['name'] == current:
+            return None
+
+        partition, lower = open_partitions[0]['name'], open_partitions[0]['lower']
+        cursor.execute(f"LOCK TABLE {table} IN ACCESS EXCLUSIVE MODE;")
+        upper = PartitionManager._next_lower_bound(cursor, key, partition, lower)
+        lower_condition = f"{key} >= {lower} AND " if lower != 'MINVALUE' else ''
+
+        cursor.execute(f"ALTER TABLE {table} DETACH PARTITION {partition};")
+        # CHECK с границами секции - повторное подключение без проверки каждой строки
+        cursor.execute(f"ALTER TABLE {partition} ADD CONSTRAINT {partition}_bound "
+                       f"CHECK ({lower_condition}{key} < {upper});")
+        cursor.execute(f"ALTER TABLE {table} ATTACH PARTITION {partition} FOR VALUES FROM ({lower}) TO ({upper});")
+        cursor.execute(f"ALTER TABLE {partition} DROP CONSTRAINT {partition}_bound;")
+        cursor.execute(f"CREATE TABLE {current} PARTITION OF {table} FOR VALUES FROM ({upper}) TO (MAXVALUE);")
+        logger.info(f"Секция {partition} закрыта на опросе #{upper}, создана {current}")
+        return current
+
+    @staticmethod
+    def _apply_retention(cursor, table: str, now: datetime, retention_months: int, mode: str) -> List[str]:
+        """Отсоединение/удаление закрытых секций старше retention_months месяцев"""
+        cutoff = _month_index(now.year, now.month) - retention_months
+        pattern = re.compile(rf"^{table}_p(\d{{4}})_(\d{{2}})$")
+        removed = []
+
+        for partition in PartitionManager._partitions(cursor, table):
+            match = pattern.match(partition['name'])
+            if not match or partition['upper'] == 'MAXVALUE':
+                continue
+            if _month_index(int(match.group(1)), int(match.group(2))) >= cutoff:
+                continue
+
+            if mode == 'drop':
+                cursor.execute(f"DROP TABLE {partition['name']};")
+            else:
+                # Отсоединенная секция остается обычной таблицей - ее можно выгрузить и удалить вручную
+                cursor.execute(f"ALTER TABLE {table} DETACH PARTITION {partition['name']};")
+            removed.append(partition['name'])
+
+        if removed:
+            logger.info(f"Срок хранения {table}: {'удалены' if mode == 'drop' else 'отсоединены'} {', '.join(removed)}")
+        return removed
+
+    @staticmethod
+    @instrumented
+    def migrate(now: datetime = None) -> bool:
+        """Однократный перевод reminders и responses в секционированные таблицы (идемпотентно)"""
+        if db_connection.dialect != 'postgres':
+            logger.warning("Секционирование поддерживается только для PostgreSQL")
+            return False
+
+        now = now or datetime.now()
+        connection = db_connection.get_connection()
+        if not connection:
+            return False
+
+        try:
+            cursor = connection.cursor()
+            for table, (key, id_column) in PARTITIONED_TABLES.items():
+                if not PartitionManager.is_partitioned(cursor, table):
+                    PartitionManager._migrate_table(cursor, table, key, id_column, now)
+            connection.commit()
+            return True
+        except Exception as e:
+            logger.error(f"Ошибка секционирования таблиц: {e}")
+            connection.rollback()
+            return False
+        finally:
+            cursor.close()
+            connection.close()
+
+    @staticmethod
+    @instrumented
+    def maintain(now: datetime = None, retention_months: int = 0, retention_mode: str = 'detach') -> bool:
+        """
+        Обслуживание секций: открытая секция текущего месяца и срок хранения
+        (retention_months=0 - хранить все). Каждая таблица - отдельной транзакцией
+        """
+        if db_connection.dialect != 'postgres':
+            return False
+
+        now = now or datetime.now()
+        connection = db_connection.get_connection()
+        if not connection:
+            return False
+
+        success = True
+        try:
+            cursor = connection.cursor()
+            for table, (key, _) in PARTITIONED_TABLES.items():
+                try:
+                    if not PartitionManager.is_partitioned(cursor, table):
+                        continue
+                    PartitionManager._roll_table(cursor, table, key, now)
+                    if retention_months > 0:
+                        PartitionManager._apply_retention(cursor, table, now, retention_months, retention_mode)
+                    connection.commit()
+                except Exception as e:
+                    logger.error(f"Ошибка обслуживания секций {table}: {e}")
+                    connection.rollback()
+                    success = False
+            return success
+        finally:
+            cursor.close()
+            connection.close()
@@ -0,0 +1,215 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import json
+import logging
+from datetime import date, datetime
+from typing import Dict, Optional, Tuple
+
+from telegram.ext import BasePersistence, PersistenceInput
+
+from tg_bot.database.connection import db_connection
+
+logger = logging.getLogger(__name__)
+
+# Виды записей в таблице bot_persistence
+USER_KIND = 'user'
+CHAT_KIND = 'chat'
+CONVERSATION_KIND_PREFIX = 'conversation:'
+
+
+def _json_default(value):
+    """Сериализация дат из user_data (списки опросов для пагинации и т.п.)"""
+    if isinstance(value, datetime):
+        return {'__datetime__': value.isoformat()}
+    if isinstance(value, date):
+        return {'__date__': value.isoformat()}
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    raise TypeError(f"{type(value).__name__} не сериализуется в JSON")
+
+
+def _json_object_hook(obj: Dict):
+    if len(obj) == 1:
+        if '__datetime__' in obj:
+            return datetime.fromisoformat(obj['__datetime__'])
+        if '__date__' in obj:
+            return date.fromisoformat(obj['__date__'])
+    return obj
+
+
+def encode_data(data: Dict) -> str:
+    """
+    user_data/chat_data -> JSON. Несериализуемые значения (объекты Telegram, потоки)
+    не сохраняются - после перезапуска их просто не будет в словаре
+    """
+    encoded = {}
+    for key, value in data.items():
+        try:
+            encoded[str(key)] = json.loads(json.dumps(value, default=_json_default))
+        except (TypeError, ValueError):
+            logger.debug(f"Ключ '{key}' не сохраняется: значение {type(value).__name__} не сериализуется")
+    return json.dumps(encoded, ensure_ascii=False)
+
+
+def decode_data(raw: Optional[str]) -> Dict:
+    if not raw:
+        return {}
+    return json.loads(raw, object_hook=_json_object_hook)
+
+
+class PostgresPersistence(BasePersistence):
+    """
+    Хранение user_data, chat_data и состояний ConversationHandler в PostgreSQL.
+
+    Application вызывает update_* раз в update_interval секунд только для измененных
+    записей; здесь они лишь сериализуются и помечаются как "грязные", а запись в БД
+    выполняется пачкой в отдельном потоке (write-behind). На обработку update
+    хранилище не влияет. bot_data и callback_data не сохраняются.
+    """
+
+    def __init__(self, update_interval: float = 60, flush_delay: float = 1.0):
+        super().__init__(
+            store_data=PersistenceInput(bot_data=False, chat_data=True, user_data=True, callback_data=False),
+            update_interval=update_interval
+        )
+        self.flush_delay = flush_delay
+        # (kind, key) -> JSON; None - запись нужно удалить
+        self._dirty: Dict[Tuple[str, str], Optional[str]] = {}
+        self._flush_task: Optional[asyncio.Task] = None
+        self._flush_lock = asyncio.Lock()
+
+    # ---------- Чтение (один раз при Application.initialize) ----------
+
+    @staticmethod
+    def _load_kind(kind: str) -> Dict[str, Optional[str]]:
+        connection = db_connection.get_connection()
+        if not connection:
+            logger.error(f"Не удалось загрузить сохраненные данные '{kind}': нет подключения к БД")
+            return {}
+
+        cursor = connection.cursor()
+        try:
+            cursor.execute("SELECT key, data FROM bot_persistence WHERE kind = %s", (kind,))
+            return {key: data for key, data in cursor.fetchall()}
+        except Exception as e:
+            logger.error(f"Ошибка загрузки сохраненных данных '{kind}': {e}")
+            return {}
+        finally:
+            cursor.close()
+            connection.close()
+
+    async def get_user_data(self) -> Dict[int, Dict]:
+        rows = await asyncio.to_thread(self._load_kind, USER_KIND)
+        logger.info(f"Восстановлены данные {len(rows)} пользователей")
+        return {int(key): decode_data(data) for key, data in rows.items()}
+
+    async def get_chat_data(self) -> Dict[int, Dict]:
+        rows = await asyncio.to_thread(self._load_kind, CHAT_KIND)
+        return {int(key): decode_data(data) for key, data in rows.items()}
+
+    async def get_bot_data(self) -> Dict:
+        return {}
+
+    async def get_callback_data(self):
+        return None
+
+    async def get_conversations(self, name: str) -> Dict:
+        rows = await asyncio.to_thread(self._load_kind, CONVERSATION_KIND_PREFIX + name)
+        conversations = {tuple(json.loads(key)): json.loads(data) for key, data in rows.items() if data is not None}
+        if conversations:
+            logger.info(f"Восстановлено {len(conversations)} диалогов '{name}'")
+        return conversations
+
+    # ---------- Запись (write-behind) ----------
+
+    def _mark_dirty(self, kind: str, key: str, data: Optional[str]):
+        self._dirty[(kind, key)] = data
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._delayed_flush())
+
+    async def _delayed_flush(self):
+        # Application вызывает update_* пачкой - ждем, пока вся пачка попадет в _dirty
+        await asyncio.sleep(self.flush_delay)
+        await self._flush_dirty()
+
+    async def _flush_dirty(self):
+        async with self._flush_lock:
+            if not self._dirty:
+                return
+            batch, self._dirty = self._dirty, {}
+            if not await asyncio.to_thread(self._write_batch, batch):
+                # Не записалось - возвращаем в очередь, более свежие значения не затираем
+                for item_key, data in batch.items():
+                    self._dirty.setdefault(item_key, data)
+
+    @staticmethod
+    def _write_batch(batch: Dict[Tuple[str, str], Optional[str]]) -> bool:
+        upserts = [(kind, key, data) for (kind, key), data in batch.items() if data is not None]
+        deletes = [(kind, key) for (kind, key), data in batch.items() if data is None]
+
+        connection = db_connection.get_connection()
+        if not connection:
+            logger.error(f"Данные бота не сохранены ({len(batch)} записей): нет подключения к БД")
+            return False
+
+        cursor = connection.cursor()
+        try:
+            if upserts:
+                db_connection.backend.execute_batch(cursor, '''
+                    INSERT INTO bot_persistence (kind, key, data, updated_at)
+                    VALUES (%s, %s, %s, LOCALTIMESTAMP)
+                    ON CONFLICT (kind, key)
+                    DO UPDATE SET data = EXCLUDED.data, updated_at = EXCLUDED.updated_at
+                ''', upserts)
+            if deletes:
+                db_connection.backend.execute_batch(
+                    cursor, "DELETE FROM bot_persistence WHERE kind = %s AND key = %s", deletes)
+            connection.commit()
+            logger.debug(f"Данные бота сохранены: {len(upserts)} записей, удалено {len(deletes)}")
+            return True
+        except Exception as e:
+            logger.error(f"Ошибка сохранения данных бота: {e}")
+            connection.rollback()
+            return False
+        finally:
+            cursor.close()
+            connection.close()
+
+    async def update_user_data(self, user_id: int, data: Dict) -> None:
+        self._mark_dirty(USER_KIND, str(user_id), encode_data(data))
+
+    async def update_chat_data(self, chat_id: int, data: Dict) -> None:
+        self._mark_dirty(CHAT_KIND, str(chat_id), encode_data(data))
+
+    async def update_bot_data(self, data) -> None:
+        pass
+
+    async def update_callback_data(self, data) -> None:
+        pass
+
+    async def update_conversation(self, name: str, key: Tuple, new_state: Optional[object]) -> None:
+        # Завершенный диалог (new_state=None) удаляется
+        data = json.dumps(new_state) if new_state is not None else None
+        self._mark_dirty(CONVERSATION_KIND_PREFIX + name, json.dumps(list(key)), data)
+
+    async def drop_user_data(self, user_id: int) -> None:
+        self._mark_dirty(USER_KIND, str(user_id), None)
+
+    async def drop_chat_data(self, chat_id: int) -> None:
+        self._mark_dirty(CHAT_KIND, str(chat_id), None)
+
+    async def refresh_user_data(self, user_id: int, user_data: Dict) -> None:
+        pass
+
+    async def refresh_chat_data(self, chat_id: int, chat_data: Dict) -> None:
+        pass
+
+    async def refresh_bot_data(self, bot_data) -> None:
+        pass
+
+    async def flush(self) -> None:
+        """Вызывается при остановке бота - записываем все, что осталось"""
+        if self._flush_task and not self._flush_task.done():
+            await self._flush_task
+        await self._flush_dirty()
+        logger.info("Данные бота сохранены перед остановкой")
@@ -1,6 +1,10 @@
 import logging
 from datetime import datetime, timezone
+from typing import List
+from tg_bot.config.constants import LOG_LEVEL_HOTPATH
+from tg_bot.database.answered_index import answered_index
 from tg_bot.database.connection import db_connection
+from tg_bot.database.instrumentation import instrumented
 from psycopg2.extras import RealDictCursor
 
 logger = logging.getLogger(__name__)
@@ -10,6 +14,7 @@ class ReminderModel:
     """Модель для отслеживания напоминаний о непройденных опросах"""
 
     @staticmethod
+    @instrumented
     def create_reminder(survey_id: int, user_id: int, reminder_stage: int, next_reminder_time: datetime,
                         survey_time: datetime = None):
         """Создание записи о напоминании"""
@@ -44,10 +49,8 @@ class ReminderModel:
             cursor.execute(query, (survey_id, user_id, reminder_stage, next_reminder_time, survey_time))
             reminder_id = cursor.fetchone()[0]
             connection.commit()
-            logger.info(f"Напоминание создано: опрос #{survey_id}, пользователь #{user_id}, этап {reminder_stage}")
-            logger.info(f"  Время отправки опроса: {survey_time}")
-            logger.info(f"  Время напоминания: {next_reminder_time}")
-            logger.info(f"  Интервал: {(next_reminder_time - survey_time).total_seconds()} секунд")
+            logger.log(LOG_LEVEL_HOTPATH, "Напоминание создано: опрос #%s, пользователь #%s, этап %s на %s (опрос %s)",
+                       survey_id, user_id, reminder_stage, next_reminder_time, survey_time)
             return reminder_id
         except Exception as e:
             logger.error(f"Ошибка создания напоминания: {e}")
@@ -58,9 +61,17 @@ class ReminderModel:
             connection.close()
 
     @staticmethod
-    def get_pending_reminders():
-        """Получение всех ожидающих напоминаний"""
-        query = '''
+    @instrumented
+    def get_pending_reminders(now: datetime = None, lookahead: float = 0):
+        """
+        Получение всех ожидающих напоминаний.
+        now - момент, на который проверяется срок (по умолчанию - время БД + 3 часа);
+        lookahead - вернуть и напоминания со сроком в ближайшие lookahead секунд
+        (у них отрицательный seconds_late)
+        """
+        db_now = "COALESCE(%(now)s::timestamp, NOW() AT TIME ZONE 'UTC' + INTERVAL '3 hours')"
+        due_until = db_connection.backend.add_seconds(db_now, '%(lookahead)s') if lookahead > 0 else db_now
+        query = f'''
             SELECT 
                 r.*, 
                 u.tg_id, 
@@ -68,17 +79,17 @@ class ReminderModel:
                 s.datetime as survey_time,
                 s.state as survey_state,
                 -- Изменено: добавляем 3 часа к времени БД для сравнения
-                EXTRACT(epoch FROM (NOW() AT TIME ZONE 'UTC' + INTERVAL '3 hours' - r.next_reminder_time)) as seconds_late,
+                {db_connection.backend.seconds_between(db_now, 'r.next_reminder_time')} as seconds_late,
                 r.next_reminder_time as raw_time,
-                NOW() AT TIME ZONE 'UTC' + INTERVAL '3 hours' as db_now_adjusted,
+                {db_now} as db_now_adjusted,
                 -- Основное условие: добавляем 3 часа к времени БД
-                (r.next_reminder_time <= NOW() AT TIME ZONE 'UTC' + INTERVAL '3 hours') as is_due_adjusted
+                (r.next_reminder_time <= {db_now}) as is_due_adjusted
             FROM reminders r
             JOIN users u ON r.user_id = u.id_user
             JOIN surveys s ON r.survey_id = s.id_survey
             WHERE r.status = 'pending' 
             -- ИЗМЕНЕНО: сравниваем с временем БД + 3 часа
-            AND r.next_reminder_time <= NOW() AT TIME ZONE 'UTC' + INTERVAL '3 hours'
+            AND r.next_reminder_time <= {due_until}
             AND s.state = 'active'
             ORDER BY r.next_reminder_time ASC;
             '''
@@ -89,18 +100,17 @@ class ReminderModel:
 
         try:
             cursor = connection.cursor(cursor_factory=RealDictCursor)
-            cursor.execute(query)
+            cursor.execute(query, {'now': now, 'lookahead': lookahead})
             reminders = cursor.fetchall()
 
             logger.info(f"Основной запрос вернул {len(reminders)} напоминаний для отправки")
 
-            if reminders:
+            if reminders and logger.isEnabledFor(LOG_LEVEL_HOTPATH):
                 for reminder in reminders[:3]:  # Первые 3 для логов
-                    logger.info(f"НАЙДЕНО: ID={reminder['id']}, Survey=#{reminder['survey_id']}")
-                    logger.info(f"   Время напоминания: {reminder['raw_time']}")
-                    logger.info(f"   Время БД (скорректированное): {reminder['db_now_adjusted']}")
-                    logger.info(f"   Просрочено на: {reminder['seconds_late']:.0f} сек")
-                    logger.info(f"   is_due_adjusted: {reminder['is_due_adjusted']}")
+                    logger.log(LOG_LEVEL_HOTPATH, "НАЙДЕНО: ID=%s, Survey=#%s, время %s, время БД %s, "
+                               "просрочено на %.0f сек, is_due_adjusted: %s",
+                               reminder['id'], reminder['survey_id'], reminder['raw_time'],
+                               reminder['db_now_adjusted'], reminder['seconds_late'], reminder['is_due_adjusted'])
 
             return [dict(reminder) for reminder in reminders]
         except Exception as e:
@@ -216,6 +226,7 @@ class ReminderModel:
             logger.error(f"Ошибка проверки напоминаний: {e}")
 
     @staticmethod
+    @instrumented
     def mark_reminder_sent(reminder_id: int):
         """Пометка напоминания как отправленного (без sent_at)"""
         query = '''
@@ -232,7 +243,7 @@ class ReminderModel:
             cursor = connection.cursor()
             cursor.execute(query, (reminder_id,))
             connection.commit()
-            logger.info(f"Напоминание #{reminder_id} помечено как отправленное")
+            logger.log(LOG_LEVEL_HOTPATH, "Напоминание #%s помечено как отправленное", reminder_id)
             return True
         except Exception as e:
             logger.error(f"Ошибка обновления напоминания #{reminder_id}: {e}")
@@ -243,8 +254,44 @@ class ReminderModel:
             connection.close()
 
     @staticmethod
+    @instrumented
+    def mark_reminders_sent(reminder_ids: List[int]) -> int:
+        """Пометка пачки напоминаний как отправленных одним запросом"""
+        if not reminder_ids:
+            return 0
+
+        query = '''
+        UPDATE reminders
+        SET status = 'sent'
+        WHERE id = ANY(%s) AND status = 'pending';
+        '''
+
+        connection = db_connection.get_connection()
+        if not connection:
+            return 0
+
+        try:
+            cursor = connection.cursor()
+            cursor.execute(query, (list(reminder_ids),))
+            connection.commit()
+            updated = cursor.rowcount
+            logger.info(f"Помечено как отправленные: {updated} напоминаний")
+            return updated
+        except Exception as e:
+            logger.error(f"Ошибка обновления напоминаний {reminder_ids}: {e}")
+            connection.rollback()
+            return 0
+        finally:
+            cursor.close()
+            connection.close()
+
+    @staticmethod
+    @instrumented
     def check_user_response(survey_id: int, user_id: int):
         """Проверка, ответил ли пользователь на опрос"""
+        if answered_index.warmed:
+            return answered_index.has_answered(survey_id, user_id)
+
         query = '''
         SELECT id_response FROM responses 
         WHERE id_survey = %s AND id_user = %s;
@@ -259,7 +306,7 @@ class ReminderModel:
             cursor.execute(query, (survey_id, user_id))
             result = cursor.fetchone() is not None
             if result:
-                logger.info(f"Пользователь #{user_id} уже ответил на опрос #{survey_id}")
+                logger.log(LOG_LEVEL_HOTPATH, "Пользователь #%s уже ответил на опрос #%s", user_id, survey_id)
             return result
         except Exception as e:
             logger.error(f"Ошибка проверки ответа: {e}")
@@ -269,6 +316,7 @@ class ReminderModel:
             connection.close()
 
     @staticmethod
+    @instrumented
     def cancel_user_reminders(survey_id: int, user_id: int):
         """Отмена всех напоминаний для пользователя по опросу (без cancelled_at)"""
         query = '''
@@ -286,8 +334,8 @@ class ReminderModel:
             cursor.execute(query, (survey_id, user_id))
             connection.commit()
             rows_affected = cursor.rowcount
-            logger.info(
-                f"Напоминания отменены: опрос #{survey_id}, пользователь #{user_id}, отменено {rows_affected} напоминаний")
+            logger.log(LOG_LEVEL_HOTPATH, "Напоминания отменены: опрос #%s, пользователь #%s, отменено %s напоминаний",
+                       survey_id, user_id, rows_affected)
             return True
         except Exception as e:
             logger.error(f"Ошибка отмены напоминаний: {e}")
@@ -0,0 +1,239 @@
+import logging
+from datetime import date, datetime
+
+from psycopg2.extras import RealDictCursor
+
+from tg_bot.database.connection import db_connection
+from tg_bot.database.instrumentation import instrumented
+
+logger = logging.getLogger(__name__)
+
+# Измерения агрегатов по задачам Jira (report_task_counts.dimension)
+TASK_DIMENSIONS = ('status', 'assignee', 'sprint', 'blocked_assignee')
+
+# Задача считается блокером по приоритету или по статусу
+BLOCKER_PRIORITIES = ('blocker', 'highest')
+
+
+class ReportModel:
+    """
+    Предрасчитанные агрегаты для отчетов. Команды отчетов читают только эти таблицы:
+    - report_survey_stats - охват по опросам (пересчитывается rollup, answered_count растет при ответе)
+    - report_daily_answers - число новых ответов по дням и ролям (обновляется при записи ответа)
+    - report_task_counts - задачи Jira по статусу/исполнителю/спринту (пересчитывается после синхронизации)
+    """
+
+    @staticmethod
+    @instrumented
+    def record_answer(id_survey: int, id_user: int, day: date = None):
+        """Учет нового ответа в агрегатах (вызывается при первом сохранении ответа)"""
+        day = day or datetime.now().date()
+        daily_query = '''
+        INSERT INTO report_daily_answers (day, role, answers)
+        VALUES (%s, COALESCE((SELECT role FROM users WHERE id_user = %s), ''), 1)
+        ON CONFLICT (day, role)
+        DO UPDATE SET answers = report_daily_answers.answers + 1;
+        '''
+        survey_query = '''
+        UPDATE report_survey_stats
+        SET answered_count = answered_count + 1
+        WHERE id_survey = %s;
+        '''
+
+        connection = db_connection.get_connection()
+        if not connection:
+            return False
+
+        try:
+            cursor = connection.cursor()
+            cursor.execute(daily_query, (day, id_user))
+            cursor.execute(survey_query, (id_survey,))
+            connection.commit()
+            return True
+        except Exception as e:
+            logger.error(f"Ошибка учета ответа в отчетах: {e}")
+            connection.rollback()
+            return False
+        finally:
+            cursor.close()
+            connection.close()
+
+    @staticmethod
+    @instrumented
+    def rebuild_survey_stats(since: datetime):
+        """Пересчет охвата по опросам, созданным не раньше since. Возвращает число строк"""
+        # Целевая аудитория - как в SurveyScheduler.get_target_users
+        query = '''
+        INSERT INTO report_survey_stats
+        (id_survey, role, survey_datetime, question, state, target_count, answered_count, updated_at)
+        SELECT
+            s.id_survey,
+            s.role,
+            s.datetime,
+            s.question,
+            s.state,
+            (SELECT COUNT(*) FROM users u
+             WHERE u.tg_id IS NOT NULL AND u.tg_username IS NOT NULL
+               AND (s.role IS NULL OR u.role = s.role)),
+            (SELECT COUNT(*) FROM responses r WHERE r.id_survey = s.id_survey),
+            LOCALTIMESTAMP
+        FROM surveys s
+        WHERE s.datetime >= %s
+        ON CONFLICT (id_survey)
+        DO UPDATE SET
+            role = EXCLUDED.role,
+            survey_datetime = EXCLUDED.survey_datetime,
+            question = EXCLUDED.question,
+            state = EXCLUDED.state,
+            target_count = EXCLUDED.target_count,
+            answered_count = EXCLUDED.answered_count,
+            updated_at = EXCLUDED.updated_at;
+        '''
+
+        connection = db_connection.get_connection()
+        if not connection:
+            return None
+
+        try:
+            cursor = connection.cursor()
+            cursor.execute(query, (since,))
+            rows = cursor.rowcount
+            connection.commit()
+            return rows
+        except Exception as e:
+            logger.error(f"Ошибка пересчета статистики опросов: {e}")
+            connection.rollback()
+            return None
+        finally:
+            cursor.close()
+            connection.close()
+
+    @staticmethod
+    @instrumented
+    def rebuild_task_counts():
+        """Пересчет агрегатов по задачам Jira. Возвращает число строк"""
+        queries = [
+            ('status', '''
+                SELECT COALESCE(t.status_key, '-'), COUNT(*)
+                FROM tasks t
+                GROUP BY COALESCE(t.status_key, '-')
+            '''),
+            ('assignee', '''
+                SELECT COALESCE(t.assignee_name, 'Не назначено'), COUNT(*)
+                FROM tasks t
+                GROUP BY COALESCE(t.assignee_name, 'Не назначено')
+            '''),
+            ('sprint', '''
+                SELECT COALESCE(sp.name, 'Без спринта'), COUNT(*)
+                FROM tasks t
+                LEFT JOIN sprints sp ON sp.id_sprint = t.id_sprint
+                GROUP BY COALESCE(sp.name, 'Без спринта')
+            '''),
+            ('blocked_assignee', '''
+                SELECT COALESCE(t.assignee_name, 'Не назначено'), COUNT(*)
+                FROM tasks t
+                WHERE LOWER(t.priority_name) IN (%s, %s)
+                   OR LOWER(t.status_key) LIKE '%%block%%'
+                GROUP BY COALESCE(t.assignee_name, 'Не назначено')
+            '''),
+        ]
+
+        connection = db_connection.get_connection()
+        if not connection:
+            return None
+
+        try:
+            cursor = connection.cursor()
+            cursor.execute('DELETE FROM report_task_counts;')
+            rows = 0
+            for dimension, select in queries:
+                params = BLOCKER_PRIORITIES if dimension == 'blocked_assignee' else ()
+                cursor.execute(select, params)
+                values = cursor.fetchall()
+                db_connection.backend.execute_batch(cursor, '''
+                    INSERT INTO report_task_counts (dimension, value, count, updated_at)
+                    VALUES (%s, %s, %s, LOCALTIMESTAMP);
+                ''', [(dimension, value, count) for value, count in values])
+                rows += len(values)
+            connection.commit()
+            return rows
+        except Exception as e:
+            logger.error(f"Ошибка пересчета статистики задач: {e}")
+            connection.rollback()
+            return None
+        finally:
+            cursor.close()
+            connection.close()
+
+    @staticmethod
+    @instrumented
+    def get_survey_stats(since: datetime):
+        """Охват по опросам начиная с since (от новых к старым)"""
+        query = '''
+        SELECT id_survey, role, survey_datetime, question, state, target_count, answered_count
+        FROM report_survey_stats
+        WHERE survey_datetime >= %s
+        ORDER BY survey_datetime DESC;
+        '''
+        connection = db_connection.get_connection()
+        if not connection:
+            return []
+        try:
+            cursor = connection.cursor(cursor_factory=RealDictCursor)
+            cursor.execute(query, (since,))
+            return [dict(row) for row in cursor.fetchall()]
+        except Exception as e:
+            logger.error(f"Ошибка получения статистики опросов: {e}")
+            return []
+        finally:
+            cursor.close()
+            connection.close()
+
+    @staticmethod
+    @instrumented
+    def get_daily_answers(since: date):
+        """Число ответов по дням и ролям начиная с since"""
+        query = '''
+        SELECT day, role, answers
+        FROM report_daily_answers
+        WHERE day >= %s
+        ORDER BY day, role;
+        '''
+        connection = db_connection.get_connection()
+        if not connection:
+            return []
+        try:
+            cursor = connection.cursor(cursor_factory=RealDictCursor)
+            cursor.execute(query, (since,))
+            return [dict(row) for row in cursor.fetchall()]
+        except Exception as e:
+            logger.error(f"Ошибка получения ответов по дням: {e}")
+            return []
+        finally:
+            cursor.close()
+            connection.close()
+
+    @staticmethod
+    @instrumented
+    def get_task_counts(dimension: str, limit: int = 10):
+        """Топ значений измерения по числу задач: [(значение, число), ...]"""
+        query = '''
+        SELECT value, count
+        FROM report_task_counts
+        WHERE dimension = %s
+        ORDER BY count DESC, value
+        LIMIT %s;
+        '''
+        connection = db_connection.get_connection()
+        if not connection:
+            return []
+        try:
+            cursor = connection.cursor()
+            cursor.execute(query, (dimension, limit))
+            return [tuple(row) for row in cursor.fetchall()]
+        except Exception as e:
+            logger.error(f"Ошибка получения статистики задач ({dimension}): {e}")
+            return []
+        finally:
+            cursor.close()
+            connection.close()
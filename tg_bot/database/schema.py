@@ -0,0 +1,259 @@
+import logging
+
+from tg_bot.database.connection import db_connection
+
+logger = logging.getLogger(__name__)
+
+# Изменения схемы, которые нужны коду моделей. Все выражения идемпотентны
+# и выполняются при запуске бота.
+SCHEMA_STATEMENTS = [
+    # Дополнения к ответам (/addresponse) - append-only, ответ собирается при чтении
+    '''
+    CREATE TABLE IF NOT EXISTS response_parts (
+        id_part SERIAL PRIMARY KEY,
+        id_response INTEGER NOT NULL,
+        id_user INTEGER,
+        text TEXT NOT NULL,
+        created_at TIMESTAMP NOT NULL DEFAULT LOCALTIMESTAMP
+    );
+    ''',
+    '''
+    CREATE INDEX IF NOT EXISTS response_parts_response_idx
+    ON response_parts (id_response, id_part);
+    ''',
+    # user_data/chat_data и состояния диалогов (PostgresPersistence)
+    '''
+    CREATE TABLE IF NOT EXISTS bot_persistence (
+        kind VARCHAR(64) NOT NULL,
+        key TEXT NOT NULL,
+        data TEXT,
+        updated_at TIMESTAMP NOT NULL DEFAULT LOCALTIMESTAMP,
+        PRIMARY KEY (kind, key)
+    );
+    ''',
+    # Предрасчитанные агрегаты для отчетов (ReportModel)
+    '''
+    CREATE TABLE IF NOT EXISTS report_survey_stats (
+        id_survey INTEGER PRIMARY KEY,
+        role VARCHAR(64),
+        survey_datetime TIMESTAMP,
+        question TEXT,
+        state VARCHAR(32),
+        target_count INTEGER NOT NULL DEFAULT 0,
+        answered_count INTEGER NOT NULL DEFAULT 0,
+        updated_at TIMESTAMP NOT NULL DEFAULT LOCALTIMESTAMP
+    );
+    ''',
+    '''
+    CREATE INDEX IF NOT EXISTS report_survey_stats_datetime_idx
+    ON report_survey_stats (survey_datetime);
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS report_daily_answers (
+        day DATE NOT NULL,
+        role VARCHAR(64) NOT NULL DEFAULT '',
+        answers INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (day, role)
+    );
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS report_task_counts (
+        dimension VARCHAR(32) NOT NULL,
+        value TEXT NOT NULL,
+        count INTEGER NOT NULL DEFAULT 0,
+        updated_at TIMESTAMP NOT NULL DEFAULT LOCALTIMESTAMP,
+        PRIMARY KEY (dimension, value)
+    );
+    ''',
+    # Горячие запросы читают только рабочее окно: активные опросы и ожидающие напоминания
+    '''
+    CREATE INDEX IF NOT EXISTS surveys_active_datetime_idx
+    ON surveys (datetime) WHERE state = 'active';
+    ''',
+    '''
+    CREATE INDEX IF NOT EXISTS reminders_pending_time_idx
+    ON reminders (next_reminder_time) WHERE status = 'pending';
+    ''',
+    # Архив старых закрытых опросов (LifecycleModel.archive_surveys)
+    '''
+    CREATE TABLE IF NOT EXISTS surveys_archive (
+        id_survey INTEGER PRIMARY KEY,
+        datetime TIMESTAMP,
+        question TEXT,
+        role VARCHAR(64),
+        state VARCHAR(32),
+        archived_at TIMESTAMP NOT NULL DEFAULT LOCALTIMESTAMP
+    );
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS responses_archive (
+        id_response INTEGER PRIMARY KEY,
+        id_user INTEGER,
+        id_survey INTEGER,
+        answer TEXT,
+        archived_at TIMESTAMP NOT NULL DEFAULT LOCALTIMESTAMP
+    );
+    ''',
+    '''
+    CREATE INDEX IF NOT EXISTS responses_archive_survey_idx
+    ON responses_archive (id_survey);
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS response_parts_archive (
+        id_part INTEGER PRIMARY KEY,
+        id_response INTEGER NOT NULL,
+        id_user INTEGER,
+        text TEXT NOT NULL,
+        created_at TIMESTAMP NOT NULL,
+        archived_at TIMESTAMP NOT NULL DEFAULT LOCALTIMESTAMP
+    );
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS reminders_archive (
+        id INTEGER PRIMARY KEY,
+        survey_id INTEGER NOT NULL,
+        user_id INTEGER NOT NULL,
+        reminder_stage INTEGER NOT NULL,
+        next_reminder_time TIMESTAMP NOT NULL,
+        status VARCHAR(32) NOT NULL,
+        created_at TIMESTAMP,
+        archived_at TIMESTAMP NOT NULL DEFAULT LOCALTIMESTAMP
+    );
+    ''',
+    # Кому уже доставлен опрос: рассылка, прерванная остановкой бота, продолжается
+    # со следующего пользователя (DeliveryModel)
+    '''
+    CREATE TABLE IF NOT EXISTS survey_deliveries (
+        survey_id INTEGER NOT NULL,
+        user_id INTEGER NOT NULL,
+        delivered_at TIMESTAMP NOT NULL DEFAULT LOCALTIMESTAMP,
+        PRIMARY KEY (survey_id, user_id)
+    );
+    ''',
+]
+
+# Выражения только для PostgreSQL (во встроенной SQLite не применяются).
+# Полнотекстовый поиск (SearchModel): русская и английская конфигурации в одном
+# tsvector. Выражения индексов должны совпадать с SURVEY_VECTOR/RESPONSE_VECTOR/PART_VECTOR
+# в search_models.py, иначе планировщик не использует индекс
+POSTGRES_SCHEMA_STATEMENTS = [
+    '''
+    CREATE INDEX IF NOT EXISTS surveys_question_fts_idx ON surveys USING GIN (
+        (to_tsvector('russian', COALESCE(question, '')) || to_tsvector('english', COALESCE(question, '')))
+    );
+    ''',
+    '''
+    CREATE INDEX IF NOT EXISTS responses_answer_fts_idx ON responses USING GIN (
+        (to_tsvector('russian', COALESCE(answer, '')) || to_tsvector('english', COALESCE(answer, '')))
+    );
+    ''',
+    '''
+    CREATE INDEX IF NOT EXISTS response_parts_text_fts_idx ON response_parts USING GIN (
+        (to_tsvector('russian', COALESCE(text, '')) || to_tsvector('english', COALESCE(text, '')))
+    );
+    ''',
+]
+
+
+
+def _index_exists(cursor, name: str) -> bool:
+    if db_connection.dialect == 'postgres':
+        cursor.execute("SELECT to_regclass(%s) IS NOT NULL;", (name,))
+    else:
+        cursor.execute("SELECT COUNT(*) > 0 FROM sqlite_master WHERE type = 'index' AND name = %s;", (name,))
+    return bool(cursor.fetchone()[0])
+
+
+def _create_responses_unique_index(cursor):
+    """
+    Один ответ пользователя на опрос - ключ для атомарного upsert в ResponseModel.
+    Однократно, пока индекса нет: дубли (id_survey, id_user), которые могла оставить прежняя
+    запись "update, иначе insert" при гонке, переносятся в архив вместе с дополнениями -
+    остается последний ответ. В report_daily_answers дубли не учтены: до появления индекса
+    upsert не выполняется и record_answer не вызывается, поэтому счетчики не меняются
+    """
+    if _index_exists(cursor, 'responses_survey_user_uidx'):
+        return
+
+    cursor.execute('''
+        SELECT older.id_response, older.id_survey, older.id_user
+        FROM responses older
+        WHERE EXISTS (
+            SELECT 1 FROM responses newer
+            WHERE newer.id_survey = older.id_survey
+              AND newer.id_user = older.id_user
+              AND newer.id_response > older.id_response
+        );
+        ''')
+    duplicates = cursor.fetchall()
+    if duplicates:
+        ids = [row[0] for row in duplicates]
+        cursor.execute('''
+            INSERT INTO response_parts_archive (id_part, id_response, id_user, text, created_at)
+            SELECT id_part, id_response, id_user, text, created_at
+            FROM response_parts WHERE id_response = ANY(%s);
+            ''', (ids,))
+        cursor.execute("DELETE FROM response_parts WHERE id_response = ANY(%s);", (ids,))
+        cursor.execute('''
+            INSERT INTO responses_archive (id_response, id_user, id_survey, answer)
+            SELECT id_response, id_user, id_survey, answer
+            FROM responses WHERE id_response = ANY(%s);
+            ''', (ids,))
+        cursor.execute("DELETE FROM responses WHERE id_response = ANY(%s);", (ids,))
+        for id_response, id_survey, id_user in duplicates:
+            logger.warning(f"Дубль ответа #{id_response} (опрос #{id_survey}, пользователь {id_user}) "
+                           f"перенесен в responses_archive")
+
+    cursor.execute('''
+        CREATE UNIQUE INDEX IF NOT EXISTS responses_survey_user_uidx
+        ON responses (id_survey, id_user);
+        ''')
+    logger.info(f"Создан уникальный индекс ответов, дублей перенесено в архив: {len(duplicates)}")
+
+
+# Однократные миграции данных: каждая проверяет, нужна ли она, и выполняется в своей транзакции
+MIGRATIONS = [
+    _create_responses_unique_index,
+]
+
+def ensure_schema() -> bool:
+    """
+    Применение недостающих индексов/таблиц. Каждое выражение - в своей транзакции:
+    ошибка одного (например, индекса) не откатывает остальные таблицы
+    """
+    connection = db_connection.get_connection()
+    if not connection:
+        return False
+
+    cursor = connection.cursor()
+    applied = 0
+    failed = 0
+    statements = list(SCHEMA_STATEMENTS)
+    if db_connection.dialect == 'postgres':
+        statements += POSTGRES_SCHEMA_STATEMENTS
+
+    try:
+        for statement in statements:
+            try:
+                cursor.execute(statement)
+                connection.commit()
+                applied += 1
+            except Exception as e:
+                logger.error(f"Ошибка обновления схемы БД: {e}\n{statement.strip()}")
+                connection.rollback()
+                failed += 1
+        # После таблиц: миграции пишут в архивные таблицы
+        for migration in MIGRATIONS:
+            try:
+                migration(cursor)
+                connection.commit()
+                applied += 1
+            except Exception as e:
+                logger.error(f"Ошибка миграции схемы БД {migration.__name__}: {e}")
+                connection.rollback()
+                failed += 1
+        logger.info(f"Схема БД проверена: применено {applied} выражений, с ошибкой {failed}")
+        return failed == 0
+    finally:
+        cursor.close()
+        connection.close()
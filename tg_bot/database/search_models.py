@@ -0,0 +1,134 @@
+import logging
+from typing import Dict, List, Optional, Tuple
+
+from psycopg2.extras import RealDictCursor
+
+from tg_bot.database.connection import db_connection
+from tg_bot.database.instrumentation import instrumented
+
+logger = logging.getLogger(__name__)
+
+# Выражения tsvector - совпадают с GIN-индексами из schema.POSTGRES_SCHEMA_STATEMENTS
+SURVEY_VECTOR = ("(to_tsvector('russian', COALESCE(s.question, '')) || "
+                 "to_tsvector('english', COALESCE(s.question, '')))")
+RESPONSE_VECTOR = ("(to_tsvector('russian', COALESCE(r.answer, '')) || "
+                   "to_tsvector('english', COALESCE(r.answer, '')))")
+PART_VECTOR = ("(to_tsvector('russian', COALESCE(p.text, '')) || "
+               "to_tsvector('english', COALESCE(p.text, '')))")
+
+# Позиция в выдаче для keyset-пагинации: (rank, kind, id) последней показанной строки
+SearchCursor = Tuple[float, str, int]
+
+
+class SearchModel:
+    """
+    Поиск по вопросам опросов, ответам и дополнениям к ответам (/search).
+    PostgreSQL - полнотекстовый поиск по GIN-индексам с ранжированием ts_rank;
+    SQLite - подстрочный поиск LIKE без ранжирования (rank = 0, новые выше).
+    Выдача упорядочена по (rank, kind, id) по убыванию; следующая страница
+    начинается строго после курсора предыдущей, без OFFSET
+    """
+
+    _POSTGRES_QUERY = f'''
+    WITH q AS (
+        SELECT websearch_to_tsquery('russian', %(text)s) || websearch_to_tsquery('english', %(text)s) AS query
+    )
+    SELECT * FROM (
+        SELECT 'survey' AS kind, s.id_survey AS id, s.id_survey, s.datetime, s.question,
+               NULL AS answer, NULL AS user_name, ts_rank({SURVEY_VECTOR}, q.query) AS rank
+        FROM surveys s, q
+        WHERE {SURVEY_VECTOR} @@ q.query
+        UNION ALL
+        SELECT 'response' AS kind, r.id_response AS id, s.id_survey, s.datetime, s.question,
+               r.answer, u.user_name, ts_rank({RESPONSE_VECTOR}, q.query) AS rank
+        FROM responses r
+        JOIN surveys s ON s.id_survey = r.id_survey
+        LEFT JOIN users u ON u.id_user = r.id_user, q
+        WHERE {RESPONSE_VECTOR} @@ q.query
+        UNION ALL
+        SELECT 'part' AS kind, p.id_part AS id, s.id_survey, s.datetime, s.question,
+               p.text AS answer, u.user_name, ts_rank({PART_VECTOR}, q.query) AS rank
+        FROM response_parts p
+        JOIN responses r ON r.id_response = p.id_response
+        JOIN surveys s ON s.id_survey = r.id_survey
+        LEFT JOIN users u ON u.id_user = r.id_user, q
+        WHERE {PART_VECTOR} @@ q.query
+    ) hits
+    {{after}}
+    ORDER BY rank DESC, kind DESC, id DESC
+    LIMIT %(limit)s;
+    '''
+
+    _SQLITE_QUERY = '''
+    SELECT * FROM (
+        SELECT 'survey' AS kind, s.id_survey AS id, s.id_survey, s.datetime, s.question,
+               NULL AS answer, NULL AS user_name, 0.0 AS rank
+        FROM surveys s
+        WHERE s.question LIKE %(pattern)s ESCAPE '\\'
+        UNION ALL
+        SELECT 'response' AS kind, r.id_response AS id, s.id_survey, s.datetime, s.question,
+               r.answer, u.user_name, 0.0 AS rank
+        FROM responses r
+        JOIN surveys s ON s.id_survey = r.id_survey
+        LEFT JOIN users u ON u.id_user = r.id_user
+        WHERE r.answer LIKE %(pattern)s ESCAPE '\\'
+        UNION ALL
+        SELECT 'part' AS kind, p.id_part AS id, s.id_survey, s.datetime, s.question,
+               p.text AS answer, u.user_name, 0.0 AS rank
+        FROM response_parts p
+        JOIN responses r ON r.id_response = p.id_response
+        JOIN surveys s ON s.id_survey = r.id_survey
+        LEFT JOIN users u ON u.id_user = r.id_user
+        WHERE p.text LIKE %(pattern)s ESCAPE '\\'
+    ) hits
+    {after}
+    ORDER BY rank DESC, kind DESC, id DESC
+    LIMIT %(limit)s;
+    '''
+
+    _AFTER = 'WHERE (rank, kind, id) < (%(rank)s::real, %(kind)s, %(id)s)'
+
+    @staticmethod
+    def _like_pattern(text: str) -> str:
+        escaped = text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        return f'%{escaped}%'
+
+    @staticmethod
+    @instrumented
+    def search(text: str, limit: int, after: Optional[SearchCursor] = None
+               ) -> Tuple[List[Dict], Optional[SearchCursor]]:
+        """
+        Страница результатов поиска и курсор следующей страницы (None - страниц больше нет).
+        after - курсор, возвращенный для предыдущей страницы
+        """
+        params = {'text': text, 'limit': limit + 1}
+        if db_connection.dialect == 'sqlite':
+            template = SearchModel._SQLITE_QUERY
+            params['pattern'] = SearchModel._like_pattern(text)
+        else:
+            template = SearchModel._POSTGRES_QUERY
+        if after is not None:
+            params.update(rank=after[0], kind=after[1], id=after[2])
+        query = template.format(after=SearchModel._AFTER if after is not None else '')
+
+        connection = db_connection.get_connection()
+        if not connection:
+            return [], None
+
+        try:
+            cursor = connection.cursor(cursor_factory=RealDictCursor)
+            cursor.execute(query, params)
+            rows = [dict(row) for row in cursor.fetchall()]
+        except Exception as e:
+            logger.error(f"Ошибка поиска '{text}': {e}")
+            return [], None
+        finally:
+            cursor.close()
+            connection.close()
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            last = rows[-1]
+            next_cursor = (float(last['rank']), last['kind'], last['id'])
+        return rows, next_cursor
@@ -1,21 +1,31 @@
 from . import auth_handlers
+from . import callback_router
 from . import survey_handlers
 from . import addresponse_handlers
 from . import report_handlers
+from . import export_handlers
+from . import search_handlers
 from . import scheduler
 from . import menu_handlers
 from . import pagination_handlers
 from . import role_handlers
+from . import update_processor
+from . import update_tracking
 from . import survey_target_handlers  # 
 
 __all__ = [
     'auth_handlers',
+    'callback_router',
     'survey_handlers',
     'addresponse_handlers',
     'report_handlers',
+    'export_handlers',
+    'search_handlers',
     'scheduler',
     'menu_handlers',
     'pagination_handlers',
     'role_handlers',
-    'survey_target_handlers'
+    'survey_target_handlers',
+    'update_processor',
+    'update_tracking'
 ]
\ No newline at end of file
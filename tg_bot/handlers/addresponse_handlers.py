@@ -9,8 +9,9 @@ from tg_bot.config.constants import (
     AWAITING_ADD_RESPONSE_SELECTION,
     AWAITING_ADD_RESPONSE_PART, ADD_RESPONSE_PAGINATION_PREFIX
 )
+from tg_bot.config.settings import config
 from tg_bot.database.connection import db_connection
-from tg_bot.database.models import ResponseModel
+from tg_bot.database.models import ResponseModel, ResponsePartModel
 from tg_bot.services.pagination_utils import PaginationUtils
 
 logger = logging.getLogger(__name__)
@@ -109,32 +110,33 @@ async def finish_add_response_command(update: Update, context: ContextTypes.DEFA
     # Объединяем все новые части ответа
     new_text = "\n".join(context.user_data['add_response_parts'])
 
-    # Получаем оригинальный ответ
+    # Текущий ответ (исходный + ранее сделанные дополнения)
     original_answer = context.user_data.get('current_add_original_answer', '')
 
-    # Формируем новый полный ответ (оригинал + дополнение)
-    if original_answer and original_answer != "(пустой ответ)":
-        full_response = f"{original_answer}\n\n[Дополнено {datetime.now().strftime('%d.%m.%Y %H:%M')}]:\n{new_text}"
-    else:
-        full_response = new_text
-
     # Получаем информацию об опросе
     survey_id = context.user_data['current_add_survey_id']
     question = context.user_data.get('current_add_survey_question', 'Без вопроса')
     response_id = context.user_data.get('current_add_response_id')
 
-    # Сохраняем обновленный ответ в БД
     if response_id:
-        # Обновляем существующий ответ
-        success = update_existing_response(response_id, full_response)
+        # Дополнение сохраняется отдельной строкой, сам ответ не перезаписывается
+        created_at = datetime.now()
+        part_id = ResponsePartModel.append_part(
+            response_id, context.user_data['user_id'], new_text, created_at
+        )
+        success = part_id is not None
+        full_response = ResponsePartModel.format_answer(
+            original_answer, [{'text': new_text, 'created_at': created_at}]
+        )
     else:
         # Создаем новый ответ (на всякий случай)
         response_data = {
             'id_survey': survey_id,
             'id_user': context.user_data['user_id'],
-            'answer': full_response
+            'answer': new_text
         }
         success = ResponseModel.save_response(response_data) is not None
+        full_response = new_text
 
     if success:
         # Формируем финальное сообщение
@@ -188,39 +190,6 @@ def cleanup_add_response_data(context):
         context.user_data.pop(key, None)
 
 
-def update_existing_response(response_id: int, new_answer: str) -> bool:
-    """Обновление существующего ответа в БД"""
-    query = '''
-    UPDATE responses 
-    SET answer = %s
-    WHERE id_response = %s
-    RETURNING id_response;
-    '''
-
-    try:
-        connection = db_connection.get_connection()
-        if not connection:
-            return False
-
-        cursor = connection.cursor()
-        cursor.execute(query, (new_answer, response_id))
-        result = cursor.fetchone()
-        connection.commit()
-
-        return result is not None
-
-    except Exception as e:
-        logger.error(f"Ошибка обновления ответа: {e}", exc_info=True)
-        if connection:
-            connection.rollback()
-        return False
-    finally:
-        if 'cursor' in locals():
-            cursor.close()
-        if 'connection' in locals():
-            connection.close()
-
-
 async def addresponse_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Команда для добавления/дополнения ответа на опрос с пагинацией"""
     user_id = context.user_data.get('user_id')
@@ -278,6 +247,15 @@ async def addresponse_command(update: Update, context: ContextTypes.DEFAULT_TYPE
             survey_dict = dict(zip(columns, row))
             surveys.append(survey_dict)
 
+        # Собираем полный текст ответов с дополнениями (одним запросом на все ответы)
+        parts_by_response = ResponsePartModel.get_parts_for_responses(
+            [s['id_response'] for s in surveys]
+        )
+        for survey in surveys:
+            parts = parts_by_response.get(survey['id_response'], [])
+            if parts:
+                survey['user_answer'] = ResponsePartModel.format_answer(survey['user_answer'], parts)
+
         # Логируем для отладки
         logger.info(f"Найдено отвеченных активных опросов за 2 недели для user_id={user_id}: {len(surveys)}")
         if surveys:
@@ -402,4 +380,6 @@ addresponse_conversation = ConversationHandler(
         CommandHandler('cancel', cancel_add_response),
         CommandHandler('stop', cancel_add_response),
     ],
+    name='addresponse',
+    persistent=config.PERSISTENCE_ENABLED,
 )
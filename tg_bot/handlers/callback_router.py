@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+import logging
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Union
+
+from telegram import Update
+from telegram.ext import CallbackQueryHandler, ContextTypes
+
+logger = logging.getLogger(__name__)
+
+# Служебные ключи узла дерева (символы callback_data - строки, не совпадают с ними)
+_PREFIX_ROUTE = 0
+_EXACT_ROUTE = 1
+
+PAGE_ACTIONS = ('close', 'info')
+
+
+class CallbackPayload(NamedTuple):
+    """Разобранный callback_data: маршрут (префикс) и типизированное значение хвоста"""
+    prefix: str
+    value: Any
+
+
+class CallbackRoute(NamedTuple):
+    prefix: str
+    handler: Callable
+    # Разбор хвоста callback_data; None - обработчик сам читает query.data
+    parse: Optional[Callable[[str], Any]]
+    exact: bool
+
+
+def parse_page(tail: str) -> Union[int, str]:
+    """Хвост кнопок пагинации: номер страницы или действие (close/info)"""
+    if tail in PAGE_ACTIONS:
+        return tail
+    return int(tail)
+
+
+class CallbackRouter:
+    """
+    Единая маршрутизация нажатий inline-кнопок.
+
+    Маршруты хранятся в префиксном дереве, которое строится при регистрации
+    обработчиков; callback_data проходит по дереву один раз - выбирается самый
+    длинный совпавший префикс (или точный маршрут, если callback_data совпал целиком).
+    Время выбора зависит от длины callback_data, а не от числа маршрутов.
+
+    Обработчик с parse получает третьим аргументом CallbackPayload с разобранным
+    хвостом; без parse вызывается как обычный обработчик PTB (update, context) -
+    так подключаются обработчики, которые используются и в ConversationHandler
+    """
+
+    def __init__(self):
+        self._root: Dict = {}
+        self.routes: List[CallbackRoute] = []
+
+    def route(self, prefix: str, handler: Callable, parse: Callable[[str], Any] = None, exact: bool = False):
+        """Регистрация маршрута; повторная регистрация префикса заменяет обработчик"""
+        node = self._root
+        for char in prefix:
+            node = node.setdefault(char, {})
+
+        key = _EXACT_ROUTE if exact else _PREFIX_ROUTE
+        route = CallbackRoute(prefix, handler, parse, exact)
+        if key in node:
+            self.routes.remove(node[key])
+        node[key] = route
+        self.routes.append(route)
+
+    def resolve(self, data: str) -> Optional[CallbackRoute]:
+        """Маршрут для callback_data: точный или с самым длинным префиксом"""
+        node = self._root
+        best = node.get(_PREFIX_ROUTE)
+        for char in data:
+            node = node.get(char)
+            if node is None:
+                return best
+            best = node.get(_PREFIX_ROUTE, best)
+        return node.get(_EXACT_ROUTE, best)
+
+    def matches(self, data: object) -> bool:
+        """Фильтр для CallbackQueryHandler: есть ли маршрут для callback_data"""
+        return isinstance(data, str) and self.resolve(data) is not None
+
+    async def dispatch(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        query = update.callback_query
+        route = self.resolve(query.data)
+        if route is None:
+            return None
+
+        if route.parse is None:
+            return await route.handler(update, context)
+
+        try:
+            value = route.parse(query.data[len(route.prefix):])
+        except ValueError:
+            logger.warning(f"Некорректный callback_data для маршрута '{route.prefix}': {query.data}")
+            await query.answer()
+            return None
+        return await route.handler(update, context, CallbackPayload(route.prefix, value))
+
+    def handler(self) -> CallbackQueryHandler:
+        """Один CallbackQueryHandler на все маршруты"""
+        return CallbackQueryHandler(self.dispatch, pattern=self.matches)
+
+
+# Глобальный экземпляр: маршруты добавляют setup_* обработчиков
+callback_router = CallbackRouter()
@@ -0,0 +1,97 @@
+# export_handlers.py - выгрузка ответов на опросы (/export)
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta
+
+from telegram import Update
+from telegram.ext import ContextTypes, CommandHandler
+
+from tg_bot.config.roles_config import get_role_category
+from tg_bot.config.settings import config
+from tg_bot.config.texts import EXPORT_TEXTS
+from tg_bot.services.export_service import export_responses, xlsx_available
+
+logger = logging.getLogger(__name__)
+
+# Ограничение одновременных выгрузок - каждая держит соединение с БД и пишет файл
+_export_slots = asyncio.Semaphore(config.EXPORT_MAX_CONCURRENT)
+
+
+def parse_export_args(args):
+    """Аргументы /export -> (формат, фильтры) или None, если разобрать не удалось"""
+    args = list(args or [])
+    fmt = 'csv'
+    if args and args[-1].lower() in ('csv', 'xlsx'):
+        fmt = args.pop().lower()
+
+    if args == ['all']:
+        return fmt, {}
+    if len(args) != 2:
+        return None
+
+    kind, value = args[0].lower(), args[1]
+    try:
+        if kind == 'survey':
+            return fmt, {'survey_id': int(value)}
+        if kind == 'days':
+            return fmt, {'since': datetime.now() - timedelta(days=int(value))}
+    except ValueError:
+        return None
+    if kind == 'role':
+        return fmt, {'role': value}
+    return None
+
+
+async def export_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Обработчик команды /export - файл с ответами для руководителей"""
+    user_role = context.user_data.get('user_role')
+    if not user_role or get_role_category(user_role) != 'CEO':
+        await update.message.reply_text(EXPORT_TEXTS['ceo_only'])
+        return
+
+    if not context.args:
+        await update.message.reply_text(EXPORT_TEXTS['usage'])
+        return
+
+    parsed = parse_export_args(context.args)
+    if not parsed:
+        await update.message.reply_text(f"{EXPORT_TEXTS['invalid_args']}\n\n{EXPORT_TEXTS['usage']}")
+        return
+
+    fmt, filters = parsed
+    if fmt == 'xlsx' and not xlsx_available():
+        await update.message.reply_text(EXPORT_TEXTS['xlsx_unavailable'])
+        return
+
+    await update.message.reply_text(EXPORT_TEXTS['started'])
+
+    path = None
+    try:
+        async with _export_slots:
+            # Чтение курсора и запись файла - вне event loop
+            path, filename, count = await asyncio.to_thread(export_responses, fmt, **filters)
+
+        if not count:
+            await update.message.reply_text(EXPORT_TEXTS['empty'])
+            return
+
+        with open(path, 'rb') as document:
+            await update.message.reply_document(
+                document=document,
+                filename=filename,
+                caption=EXPORT_TEXTS['caption'].format(count=count)
+            )
+        logger.info(f"Выгрузка {filename} ({count} строк) отправлена пользователю {update.effective_user.id}")
+    except Exception as e:
+        logger.error(f"Ошибка выгрузки ответов: {e}")
+        await update.message.reply_text(EXPORT_TEXTS['failed'])
+    finally:
+        if path and os.path.exists(path):
+            os.unlink(path)
+
+
+def setup_export_handlers(application):
+    """Настройка обработчика выгрузки"""
+    application.add_handler(CommandHandler("export", export_command))
+    logger.info("Обработчик выгрузки настроен")
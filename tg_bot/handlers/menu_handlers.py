@@ -1,5 +1,7 @@
 # -*- coding: utf-8 -*-
+import importlib
 import logging
+from functools import lru_cache, partial
 
 import telegram
 from telegram import (
@@ -7,13 +9,75 @@ from telegram import (
     InlineKeyboardMarkup,
     InlineKeyboardButton
 )
-from telegram.ext import ContextTypes, CommandHandler, CallbackQueryHandler
+from telegram.ext import ContextTypes, CommandHandler
 
 from tg_bot.config.roles_config import get_role_category
 from tg_bot.config.texts import AUTH_TEXTS
+from tg_bot.handlers.callback_router import callback_router
 
 logger = logging.getLogger(__name__)
 
+# Таблицы меню собираются один раз при импорте, а не на каждое нажатие кнопки
+
+# callback_data -> (подсказка, команда)
+MENU_SIMPLE_COMMANDS = {
+    'menu_response': ('Чтобы ответить на опрос, введите команду:', '/response'),
+    'menu_addresponse': ('Чтобы дополнить старый ответ, введите команду:', '/addresponse'),
+    'survey_create': ('Чтобы создать опрос, введите команду:', '/sendsurvey')
+}
+
+# Маппинг callback_data на команды
+MENU_COMMAND_MAP = {
+    'menu_profile': ('profile', []),
+    'menu_help': ('help', []),
+    'menu_sync': ('syncjira', []),
+    'menu_reports': ('report', []),
+    'survey_list': ('allsurveys', []),
+}
+
+MENU_CEO_ONLY_COMMANDS = frozenset({'syncjira', 'sendsurvey', 'allsurveys', 'report'})
+
+# Команды меню, которые выполняются сразу, а не показывают подсказку
+MENU_RUN_COMMANDS = frozenset({'allsurveys', 'syncjira'})
+
+MENU_COMMAND_DESCRIPTIONS = {
+    'profile': 'Чтобы посмотреть профиль, введите команду:',
+    'help': 'Чтобы получить справку, введите команду:',
+    'syncjira': 'Чтобы синхронизировать с Jira, введите команду:',
+    'report': 'Чтобы получить отчеты, введите команду:',
+}
+
+# Команды handle_menu_command, которые ДОЛЖНЫ ВЫПОЛНЯТЬСЯ, а не показывать подсказку
+EXECUTE_COMMANDS = frozenset({'allsurveys', 'syncjira', 'profile', 'help'})
+
+EXECUTE_COMMAND_DESCRIPTIONS = {
+    'sendsurvey': 'Чтобы создать опрос, введите команду:',
+    'response': 'Чтобы ответить на опрос, введите команду:',
+    'addresponse': 'Чтобы дополнить ответ, введите команду:',
+    'report': 'Чтобы получить отчеты, введите команду:',
+}
+
+# Маппинг команд на функции (для выполнения); импорт отложенный - модули импортируют меню
+COMMAND_HANDLERS = {
+    'profile': 'tg_bot.bot.profile_command',
+    'help': 'tg_bot.bot.help_command',
+    'allsurveys': 'tg_bot.bot.allsurveys_command',
+    'syncjira': 'tg_bot.bot.syncjira_command',
+    'response': 'tg_bot.handlers.survey_handlers.response_command',
+    'addresponse': 'tg_bot.handlers.addresponse_handlers.addresponse_command',
+    'dailydigest': 'tg_bot.handlers.report_handlers.dailydigest_command',
+    'weeklydigest': 'tg_bot.handlers.report_handlers.weeklydigest_command',
+    'blockers': 'tg_bot.handlers.report_handlers.blockers_command',
+    'sendsurvey': 'tg_bot.handlers.survey_handlers.sendsurvey_command',
+}
+
+
+@lru_cache(maxsize=None)
+def _load_command_handler(command_name: str):
+    """Функция-обработчик команды меню (импортируется при первом вызове)"""
+    module_name, func_name = COMMAND_HANDLERS[command_name].rsplit('.', 1)
+    return getattr(importlib.import_module(module_name), func_name)
+
 
 async def menu_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Обработчик команды /menu - показывает интерактивное меню"""
@@ -71,95 +135,79 @@ async def menu_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     )
 
 
-async def menu_callback_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Обработчик нажатий кнопок меню"""
-    query = update.callback_query
-    await query.answer()
+async def _menu_close(update: Update, context: ContextTypes.DEFAULT_TYPE, role_category):
+    await update.callback_query.edit_message_text("Меню закрыто. Используйте /menu для повторного открытия.")
 
-    callback_data = query.data
-    user_role = context.user_data.get('user_role')
-    role_category = get_role_category(user_role) if user_role else None
 
-    if not user_role:
-        await query.edit_message_text("Сначала авторизуйтесь с помощью /start")
-        return
+async def _menu_reports(update: Update, context: ContextTypes.DEFAULT_TYPE, role_category):
+    # Обработка кнопки отчетов - вызываем report_command
+    from tg_bot.handlers.report_handlers import report_command
+    return await report_command(update, context)
+
+
+async def _menu_surveys(update: Update, context: ContextTypes.DEFAULT_TYPE, role_category):
+    # Управление опросами доступно только руководителям
+    if role_category == 'CEO':
+        await show_surveys_menu(update.callback_query)
+    else:
+        await update.callback_query.edit_message_text("У вас нет доступа к управлению опросами.")
+
+
+async def _menu_back(update: Update, context: ContextTypes.DEFAULT_TYPE, role_category):
+    await show_main_menu(update.callback_query, role_category)
+
+
+async def _menu_hint(update: Update, context: ContextTypes.DEFAULT_TYPE, role_category, title: str, command: str):
+    await update.callback_query.edit_message_text(f"{title}\n\n`{command}`", parse_mode='Markdown')
 
-    simple_commands = {
-        'menu_response': ('Чтобы ответить на опрос, введите команду:', '/response'),
-        'menu_addresponse': ('Чтобы дополнить старый ответ, введите команду:', '/addresponse'),
-        'survey_create': ('Чтобы создать опрос, введите команду:', '/sendsurvey')
-    }
 
-    if callback_data in simple_commands:
-        title, command = simple_commands[callback_data]
-        await query.edit_message_text(f"{title}\n\n`{command}`", parse_mode='Markdown')
+async def _menu_mapped_command(update: Update, context: ContextTypes.DEFAULT_TYPE, role_category,
+                               command_name: str, args: list):
+    query = update.callback_query
+
+    # Проверка доступа для CEO-only команд
+    if command_name in MENU_CEO_ONLY_COMMANDS and role_category != 'CEO':
+        await query.edit_message_text(f"У вас нет доступа к команде {command_name}")
         return
 
-    # Маппинг callback_data на команды
-    command_map = {
-        'menu_profile': ('profile', []),
-        'menu_help': ('help', []),
-        'menu_sync': ('syncjira', []),
-        'menu_reports': ('report', []),
-        'survey_list': ('allsurveys', []),
-    }
-
-    if callback_data == "menu_close":
-        await query.edit_message_text("Меню закрыто. Используйте /menu для повторного открытия.")
+    # ДЛЯ КОМАНД, КОТОРЫЕ ДОЛЖНЫ ВЫПОЛНЯТЬСЯ (не показывать подсказку)
+    if command_name in MENU_RUN_COMMANDS:
+        await handle_menu_command(update, context, command_name, args)
         return
 
-    elif callback_data == "menu_reports":
-        # Обработка кнопки отчетов - вызываем report_command
-        from tg_bot.handlers.report_handlers import report_command
-        return await report_command(update, context)
+    # Для остальных команд показываем подсказку
+    description = MENU_COMMAND_DESCRIPTIONS.get(command_name, "Чтобы выполнить это действие, введите команду:")
+    await query.edit_message_text(f"{description}\n\n`/{command_name}`", parse_mode='Markdown')
 
-    elif callback_data == "menu_surveys":
-        # Управление опросами доступно только руководителям
-        if role_category == 'CEO':
-            await show_surveys_menu(query)
-        else:
-            await query.edit_message_text("У вас нет доступа к управлению опросами.")
-        return
 
-    elif callback_data == "menu_back":
-        await show_main_menu(query, role_category)
+# callback_data -> действие кнопки меню (update, context, role_category).
+# Более поздние записи перекрывают ранние: подсказки важнее отдельных действий, те - команд
+MENU_ACTIONS = {
+    **{data: partial(_menu_mapped_command, command_name=command_name, args=args)
+       for data, (command_name, args) in MENU_COMMAND_MAP.items()},
+    'menu_close': _menu_close,
+    'menu_reports': _menu_reports,
+    'menu_surveys': _menu_surveys,
+    'menu_back': _menu_back,
+    **{data: partial(_menu_hint, title=title, command=command)
+       for data, (title, command) in MENU_SIMPLE_COMMANDS.items()},
+}
+
+
+async def menu_callback_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Обработчик нажатий кнопок меню: ответ на нажатие, проверка авторизации и действие из MENU_ACTIONS"""
+    query = update.callback_query
+    await query.answer()
+
+    user_role = context.user_data.get('user_role')
+    if not user_role:
+        await query.edit_message_text("Сначала авторизуйтесь с помощью /start")
         return
 
-    ceo_only_commands = ['syncjira', 'sendsurvey', 'allsurveys', 'report']
-
-    if callback_data in command_map:
-        command_name, args = command_map[callback_data]
-
-        # Проверка доступа для CEO-only команд
-        if command_name in ceo_only_commands and role_category != 'CEO':
-            await query.edit_message_text(f"У вас нет доступа к команде {command_name}")
-            return
-
-        # ДЛЯ КОМАНД, КОТОРЫЕ ДОЛЖНЫ ВЫПОЛНЯТЬСЯ (не показывать подсказку)
-        if command_name in ['allsurveys', 'syncjira']:
-            # Эти команды должны выполняться, а не показывать подсказку
-            await handle_menu_command(update, context, command_name, args)
-        else:
-            # Для остальных команд показываем подсказку
-            command_descriptions = {
-                'profile': 'Чтобы посмотреть профиль, введите команду:',
-                'help': 'Чтобы получить справку, введите команду:',
-                'syncjira': 'Чтобы синхронизировать с Jira, введите команду:',
-                'report': 'Чтобы получить отчеты, введите команду:',
-            }
-
-            if command_name in command_descriptions:
-                await query.edit_message_text(
-                    f"{command_descriptions[command_name]}\n\n`/{command_name}`",
-                    parse_mode='Markdown'
-                )
-            else:
-                await query.edit_message_text(
-                    f"Чтобы выполнить это действие, введите команду:\n\n`/{command_name}`",
-                    parse_mode='Markdown'
-                )
-    else:
+    action = MENU_ACTIONS.get(query.data)
+    if action is None:
         return
+    return await action(update, context, get_role_category(user_role))
 
 
 async def handle_menu_command(update: Update, context: ContextTypes.DEFAULT_TYPE,
@@ -167,20 +215,10 @@ async def handle_menu_command(update: Update, context: ContextTypes.DEFAULT_TYPE
     """Универсальный обработчик команд из меню"""
     query = update.callback_query
 
-    # Команды, которые ДОЛЖНЫ ВЫПОЛНЯТЬСЯ, а не показывать подсказку
-    execute_commands = ['allsurveys', 'syncjira', 'profile', 'help']
-
-    if command_name not in execute_commands:
+    if command_name not in EXECUTE_COMMANDS:
         # Для остальных команд показываем подсказку
-        command_descriptions = {
-            'sendsurvey': 'Чтобы создать опрос, введите команду:',
-            'response': 'Чтобы ответить на опрос, введите команду:',
-            'addresponse': 'Чтобы дополнить ответ, введите команду:',
-            'report': 'Чтобы получить отчеты, введите команду:',
-        }
-
-        description = command_descriptions.get(command_name,
-                                               f"Чтобы выполнить это действие, введите команду:")
+        description = EXECUTE_COMMAND_DESCRIPTIONS.get(command_name,
+                                                       f"Чтобы выполнить это действие, введите команду:")
 
         await query.edit_message_text(
             f"{description}\n\n`/{command_name}`",
@@ -188,28 +226,11 @@ async def handle_menu_command(update: Update, context: ContextTypes.DEFAULT_TYPE
         )
         return
 
-    # Маппинг команд на функции (для выполнения)
-    command_handlers = {
-        'profile': 'tg_bot.bot.profile_command',
-        'help': 'tg_bot.bot.help_command',
-        'allsurveys': 'tg_bot.bot.allsurveys_command',
-        'syncjira': 'tg_bot.bot.syncjira_command',
-        'response': 'tg_bot.handlers.survey_handlers.response_command',
-        'addresponse': 'tg_bot.handlers.addresponse_handlers.addresponse_command',
-        'dailydigest': 'tg_bot.handlers.report_handlers.dailydigest_command',
-        'weeklydigest': 'tg_bot.handlers.report_handlers.weeklydigest_command',
-        'blockers': 'tg_bot.handlers.report_handlers.blockers_command',
-        'sendsurvey': 'tg_bot.handlers.survey_handlers.sendsurvey_command',
-    }
-
-    if command_name not in command_handlers:
+    if command_name not in COMMAND_HANDLERS:
         await query.edit_message_text(f"Команда {command_name} не поддерживается в меню")
         return
 
-    # Импортируем обработчик
-    module_name, func_name = command_handlers[command_name].rsplit('.', 1)
-    module = __import__(module_name, fromlist=[func_name])
-    handler_func = getattr(module, func_name)
+    handler_func = _load_command_handler(command_name)
 
     # Устанавливаем аргументы
     if args is not None:
@@ -358,7 +379,9 @@ async def update_user_commands(update: Update, context: ContextTypes.DEFAULT_TYP
                 ("sendsurvey", "Создать и отправить опрос"),
                 ("allsurveys", "Просмотреть созданные опросы"),
                 ("syncjira", "Синхронизировать данные с Jira"),
-                ("report", "Информация об отчетах"),
+                ("report", "Сводный отчет"),
+                ("export", "Выгрузка ответов"),
+                ("search", "Поиск по опросам и ответам"),
             ]
             commands.extend(ceo_commands)
 
@@ -375,7 +398,10 @@ async def update_user_commands(update: Update, context: ContextTypes.DEFAULT_TYP
 def setup_menu_handlers(application):
     """Настроить обработчики меню"""
     application.add_handler(CommandHandler("menu", menu_command))
-    application.add_handler(CallbackQueryHandler(menu_callback_handler, pattern="^menu_"))
-    application.add_handler(CallbackQueryHandler(menu_callback_handler, pattern="^report_"))
-    application.add_handler(CallbackQueryHandler(survey_create_handler, pattern="^survey_create$"))  # Новый обработчик
-    application.add_handler(CallbackQueryHandler(menu_callback_handler, pattern="^survey_"))
+    # Точный маршрут на каждую кнопку меню; префиксы - для устаревших и неизвестных кнопок
+    for data in MENU_ACTIONS:
+        callback_router.route(data, menu_callback_handler, exact=True)
+    callback_router.route("menu_", menu_callback_handler)
+    callback_router.route("report_", menu_callback_handler)
+    callback_router.route("survey_create", survey_create_handler, exact=True)
+    callback_router.route("survey_", menu_callback_handler)
@@ -1,9 +1,11 @@
 # -*- coding: utf-8 -*-
 import logging
 from telegram import Update
-from telegram.ext import ContextTypes, CallbackQueryHandler
+from telegram.ext import ContextTypes
 
+from tg_bot.handlers.callback_router import CallbackPayload, callback_router, parse_page
 from tg_bot.services.pagination_utils import PaginationUtils
+from tg_bot.services.page_cache import allsurveys_page_cache
 from tg_bot.config.constants import (
     SURVEY_PAGINATION_PREFIX,
     ADD_RESPONSE_PAGINATION_PREFIX,
@@ -13,38 +15,25 @@ from tg_bot.config.constants import (
 logger = logging.getLogger(__name__)
 
 
-async def handle_pagination_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Единый обработчик пагинации для всех типов"""
+# Префикс callback_data -> (ключ данных в user_data, заголовок страницы)
+PAGINATION_VIEWS = {
+    SURVEY_PAGINATION_PREFIX: ('pagination_surveys', "ДОСТУПНЫЕ ОПРОСЫ"),
+    ADD_RESPONSE_PAGINATION_PREFIX: ('pagination_addresponse', "ОТВЕЧЕННЫЕ ОПРОСЫ"),
+    ALLSURVEYS_PAGINATION_PREFIX: ('pagination_allsurveys', "ВСЕ АКТИВНЫЕ ОПРОСЫ"),
+}
+
+
+async def handle_pagination_callback(update: Update, context: ContextTypes.DEFAULT_TYPE, payload: CallbackPayload):
+    """Единый обработчик пагинации для всех типов (тип определяет маршрут роутера)"""
     query = update.callback_query
     await query.answer()
 
-    callback_data = query.data
-
-    # Определяем тип пагинации по префиксу
-    if callback_data.startswith(SURVEY_PAGINATION_PREFIX):
-        await _handle_pagination_navigation(
-            query, context, callback_data, SURVEY_PAGINATION_PREFIX,
-            'pagination_surveys', "ДОСТУПНЫЕ ОПРОСЫ"
-        )
-    elif callback_data.startswith(ADD_RESPONSE_PAGINATION_PREFIX):
-        await _handle_pagination_navigation(
-            query, context, callback_data, ADD_RESPONSE_PAGINATION_PREFIX,
-            'pagination_addresponse', "ОТВЕЧЕННЫЕ ОПРОСЫ"
-        )
-    elif callback_data.startswith(ALLSURVEYS_PAGINATION_PREFIX):
-        await _handle_pagination_navigation(
-            query, context, callback_data, ALLSURVEYS_PAGINATION_PREFIX,
-            'pagination_allsurveys', "ВСЕ АКТИВНЫЕ ОПРОСЫ"
-        )
-    else:
-        logger.warning(f"Неизвестный callback_data пагинации: {callback_data}")
+    data_key, title = PAGINATION_VIEWS[payload.prefix]
+    await _handle_pagination_navigation(query, context, payload.value, payload.prefix, data_key, title)
 
 
-async def _handle_pagination_navigation(query, context, callback_data, prefix, data_key, title):
+async def _handle_pagination_navigation(query, context, action, prefix, data_key, title):
     """Обработка навигации по страницам для всех типов пагинации"""
-    # Убираем префикс
-    action = callback_data[len(prefix):]
-
     if action == "close":
         await query.edit_message_text("Просмотр закрыт.")
         # Очищаем данные пагинации для этого типа
@@ -55,17 +44,26 @@ async def _handle_pagination_navigation(query, context, callback_data, prefix, d
         await query.answer("Используйте кнопки для навигации между страницами")
         return
 
-    # Обработка номера страницы (например: "0", "1", "2")
-    if action.isdigit() or (action[0] == '-' and action[1:].isdigit()):
-        page = int(action)
-        await _show_pagination_page(query, context, page, data_key, title, prefix)
-        return
-
-    logger.warning(f"Неизвестный action в callback_data: {action}")
+    # Номер страницы (например: 0, 1, 2)
+    await _show_pagination_page(query, context, action, data_key, title, prefix)
 
 
 async def _show_pagination_page(query, context, page, data_key, title, prefix):
     """Показать страницу пагинации"""
+    if prefix == ALLSURVEYS_PAGINATION_PREFIX:
+        # Страницы /allsurveys общие для всех руководителей - берем готовые из кэша
+        rendered = allsurveys_page_cache.get_page(page)
+        if not rendered:
+            await query.edit_message_text("Нет элементов для отображения.")
+            return
+
+        message, keyboard = rendered
+        await query.edit_message_text(
+            message,
+            reply_markup=keyboard
+        )
+        return
+
     user_data = context.user_data
     items_data = user_data.get(data_key, {})
     items = items_data.get('items', [])
@@ -94,11 +92,7 @@ async def _show_pagination_page(query, context, page, data_key, title, prefix):
 
 def setup_pagination_handlers(application):
     """Настроить обработчики пагинации"""
-    # Обработчик для всех типов пагинации
-    pattern = f"^({SURVEY_PAGINATION_PREFIX}|{ADD_RESPONSE_PAGINATION_PREFIX}|{ALLSURVEYS_PAGINATION_PREFIX})"
-
-    application.add_handler(CallbackQueryHandler(
-        handle_pagination_callback,
-        pattern=pattern
-    ))
+    # Один маршрут на каждый тип пагинации, хвост - номер страницы или действие
+    for prefix in PAGINATION_VIEWS:
+        callback_router.route(prefix, handle_pagination_callback, parse=parse_page)
     logger.info("Обработчики пагинации настроены")
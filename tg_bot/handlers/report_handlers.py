@@ -1,30 +1,63 @@
-# report_handlers.py - НОВЫЙ ФАЙЛ
+# report_handlers.py - отчеты по предрасчитанным агрегатам (services/report_engine.py)
 import logging
 from telegram import Update
 from telegram.ext import ContextTypes, CommandHandler
 
+from tg_bot.config.roles_config import get_role_category
 from tg_bot.config.texts import REPORT_TEXTS
+from tg_bot.services.report_engine import report_engine
 
 logger = logging.getLogger(__name__)
 
 
+async def _reply(update: Update, text: str):
+    """Ответ на команду или на кнопку меню"""
+    if hasattr(update, 'callback_query') and update.callback_query:
+        await update.callback_query.edit_message_text(text)
+    else:
+        await update.message.reply_text(text)
+
+
+async def _send_report(update: Update, context: ContextTypes.DEFAULT_TYPE, render):
+    """Проверка доступа (только руководители) и отправка отчета"""
+    user_role = context.user_data.get('user_role')
+    if not user_role or get_role_category(user_role) != 'CEO':
+        await _reply(update, REPORT_TEXTS['ceo_only'])
+        return
+
+    try:
+        text = render()
+    except Exception as e:
+        logger.error(f"Ошибка формирования отчета: {e}")
+        text = REPORT_TEXTS['report_not_available']
+
+    await _reply(update, text)
+
+
 async def report_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Обработчик команды /report - показывает сообщение о перенаправлении"""
+    """Обработчик команды /report - сводный отчет"""
+    await _send_report(update, context, report_engine.render_report)
 
-    # Формируем сообщение
-    response_text = REPORT_TEXTS['report_message']
 
-    # Проверяем, вызвана ли команда из меню
-    if hasattr(update, 'callback_query') and update.callback_query:
-        await update.callback_query.edit_message_text(response_text, parse_mode='Markdown')
-    else:
-        await update.message.reply_text(response_text, parse_mode='Markdown')
+async def dailydigest_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Обработчик команды /dailydigest"""
+    await _send_report(update, context, report_engine.render_daily_digest)
+
+
+async def weeklydigest_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Обработчик команды /weeklydigest"""
+    await _send_report(update, context, report_engine.render_weekly_digest)
+
+
+async def blockers_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Обработчик команды /blockers"""
+    await _send_report(update, context, report_engine.render_blockers)
 
 
 def setup_report_handlers(application):
     """Настройка обработчиков отчетов"""
     application.add_handler(CommandHandler("report", report_command))
-    application.add_handler(CommandHandler("dailydigest", report_command))  # Перенаправляем старые команды
-    application.add_handler(CommandHandler("weeklydigest", report_command))
-    application.add_handler(CommandHandler("blockers", report_command))
+    application.add_handler(CommandHandler("dailydigest", dailydigest_command))
+    application.add_handler(CommandHandler("weeklydigest", weeklydigest_command))
+    application.add_handler(CommandHandler("blockers", blockers_command))
     logger.info("Обработчики отчетов настроены")
@@ -1,7 +1,7 @@
 # -*- coding: utf-8 -*-
 import logging
 from telegram import Update, InlineKeyboardMarkup, InlineKeyboardButton
-from telegram.ext import ContextTypes, CallbackQueryHandler
+from telegram.ext import ContextTypes
 
 from tg_bot.config.constants import (
     AWAITING_ROLE, AWAITING_SUBROLE,
@@ -9,6 +9,7 @@ from tg_bot.config.constants import (
 )
 from tg_bot.config.texts import ROLE_SELECTION_TEXTS, get_category_display, get_role_display_with_icon
 from tg_bot.config.roles_config import get_worker_subtypes, get_ceo_subtypes, ALL_ROLES
+from tg_bot.handlers.callback_router import callback_router
 
 logger = logging.getLogger(__name__)
 
@@ -124,12 +125,8 @@ async def handle_subtype_selection(update: Update, context: ContextTypes.DEFAULT
 
 def setup_role_handlers(application):
     """Настройка обработчиков выбора ролей"""
-    application.add_handler(CallbackQueryHandler(
-        handle_category_selection,
-        pattern=f"^{CATEGORY_SELECTION_PREFIX}"
-    ))
-    application.add_handler(CallbackQueryHandler(
-        handle_subtype_selection,
-        pattern=f"^{SUBTYPE_SELECTION_PREFIX}"
-    ))
+    callback_router.route(CATEGORY_SELECTION_PREFIX, handle_category_selection)
+    callback_router.route(SUBTYPE_SELECTION_PREFIX, handle_subtype_selection)
+    # Кнопка "Назад" на шаге выбора роли начинается с префикса категорий
+    callback_router.route(f"{CATEGORY_SELECTION_PREFIX}back", handle_subtype_selection, exact=True)
     logger.info("Обработчики выбора ролей настроены")
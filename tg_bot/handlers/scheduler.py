@@ -1,16 +1,28 @@
 import asyncio
 import logging
 import traceback
+from collections import Counter
+from contextlib import contextmanager
 from datetime import datetime, timedelta
-from typing import Dict, List, Set
+from typing import Dict, List, Optional, Set
 from telegram import Bot
 
-from tg_bot.config.constants import REMINDER_INTERVALS, SCHEDULER_CHECK_INTERVAL
+from tg_bot.config.constants import (
+    DIGEST_QUESTION_LENGTH, LOG_LEVEL_HOTPATH, REMINDER_INTERVALS, SCHEDULER_CHECK_INTERVAL, SURVEY_STATUS,
+    TELEGRAM_MESSAGE_LIMIT
+)
 from tg_bot.config.roles_config import get_role_category
+from tg_bot.config.settings import config
+from tg_bot.database.answered_index import answered_index
 from tg_bot.database.connection import db_connection
+from tg_bot.database.delivery_models import DeliveryModel
 from tg_bot.database.models import SurveyModel, UserModel
 from tg_bot.config.texts import get_role_display_name
 from tg_bot.database.reminder_models import ReminderModel
+from tg_bot.services.clock import SystemClock
+from tg_bot.services.leader_election import scheduler_lease
+from tg_bot.services.metrics import metrics
+from tg_bot.services.survey_cache import survey_repository
 
 logger = logging.getLogger(__name__)
 
@@ -18,20 +30,83 @@ logger = logging.getLogger(__name__)
 class SurveyScheduler:
     """Планировщик для отправки опросов и напоминаний"""
 
-    def __init__(self, bot: Bot):
+    def __init__(self, bot: Bot, clock=None, lease=None):
         self.bot = bot
+        # Источник времени и sleep(); в симуляциях подменяется на VirtualClock
+        self.clock = clock or SystemClock()
+        # Лидерство между репликами: опросы рассылает только лидер, напоминания - владелец шарда
+        self.lease = lease or scheduler_lease
+        self.leading = False
         self.scheduled_tasks: Dict[int, asyncio.Task] = {}
         self.sent_surveys_cache: Set[int] = set()
+        # Опросы, которые лидер уже видел (запланировал, отправил или оставил напоминаниям)
+        self.known_surveys: Set[int] = set()
+
+        # Остановка: новые рассылки не начинаются, текущие (задача -> вложенность) ждет shutdown()
+        self.accepting = True
+        self.inflight: Counter = Counter()
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._periodic_task: Optional[asyncio.Task] = None
+        self._watch_task: Optional[asyncio.Task] = None
+
+        metrics.register_collector(self._collect_metrics)
+
+    def _collect_metrics(self):
+        """Глубина очереди планировщика для /metrics"""
+        metrics.set('scheduler_scheduled_surveys', len(self.scheduled_tasks))
 
     async def start(self):
         """Запуск планировщика"""
         logger.info("Запуск планировщика опросов и напоминаний...")
 
-        # Загружаем активные опросы из БД и планируем их отправку
-        await self.schedule_existing_surveys()
+        # Загружаем активные опросы из БД и планируем их отправку (если реплика - лидер)
+        await self.sync_leadership()
+        if self.lease.enabled:
+            # Смена лидера подхватывается за такт heartbeat, а не за цикл проверки
+            self._watch_task = asyncio.create_task(self._watch_leadership())
 
         # Запускаем периодическую проверку новых опросов и напоминаний
-        await asyncio.create_task(self.periodic_check())
+        self._periodic_task = asyncio.create_task(self.periodic_check())
+        await asyncio.gather(self._periodic_task, return_exceptions=True)
+
+    @contextmanager
+    def _in_flight(self):
+        """Рассылка, которую shutdown() дает закончить до срока остановки"""
+        task = asyncio.current_task()
+        self.inflight[task] += 1
+        self._idle.clear()
+        try:
+            yield
+        finally:
+            self.inflight[task] -= 1
+            if self.inflight[task] <= 0:
+                del self.inflight[task]
+            if not self.inflight:
+                self._idle.set()
+
+    async def sync_leadership(self):
+        """Реакция на смену лидерства: новый лидер подхватывает опросы, бывший - отменяет задачи"""
+        if self.lease.is_leader and not self.leading:
+            self.leading = True
+            logger.info("Планировщик: реплика - лидер, загружаю активные опросы")
+            await self.schedule_existing_surveys()
+        elif not self.lease.is_leader and self.leading:
+            self.leading = False
+            logger.warning("Планировщик: лидерство потеряно, запланированные отправки отменены")
+            for task in self.scheduled_tasks.values():
+                task.cancel()
+            self.scheduled_tasks.clear()
+            self.sent_surveys_cache.clear()
+            self.known_surveys.clear()
+
+    async def _watch_leadership(self):
+        while True:
+            await self.clock.sleep(self.lease.heartbeat_interval)
+            try:
+                await self.sync_leadership()
+            except Exception as e:
+                logger.error(f"Ошибка смены лидерства планировщика: {e}")
 
     async def schedule_existing_surveys(self):
         """Планирование существующих опросов из БД - ПРИОРИТЕТ ПО СТАТУСУ"""
@@ -42,6 +117,7 @@ class SurveyScheduler:
         for survey in surveys:
             survey_id = survey['id_survey']
             survey_time = survey['datetime']
+            self.known_surveys.add(survey_id)
 
             # 1. Проверяем, есть ли отправленные напоминания
             has_sent_reminders = await self._check_if_survey_was_sent(survey_id)
@@ -58,7 +134,7 @@ class SurveyScheduler:
 
             if has_pending_reminders:
                 # Есть pending напоминания - НУЖНО ОТПРАВИТЬ!
-                if survey_time > datetime.now():
+                if survey_time > self.clock.now():
                     logger.info(f"ОПРОС #{survey_id}: ЕСТЬ PENDING НАПОМИНАНИЯ, время еще не наступило")
                     # Планируем проверку времени (напоминания сами отправятся когда время придет)
                 else:
@@ -67,7 +143,7 @@ class SurveyScheduler:
                 continue
 
             # 3. Нет никаких напоминаний - опрос НЕ отправлялся
-            if survey_time > datetime.now():
+            if survey_time > self.clock.now():
                 # Время еще не наступило - планируем
                 await self.schedule_survey(survey_id, survey_time)
                 logger.info(f"Опрос #{survey_id} запланирован на {survey_time}")
@@ -120,14 +196,21 @@ class SurveyScheduler:
             logger.error(f"Ошибка проверки pending напоминаний для опроса #{survey_id}: {e}")
             return False
 
+    @staticmethod
+    def _get_active_survey(survey_id: int):
+        """Активный опрос по id (запрос по ключу с кэшем) или None"""
+        survey = survey_repository.get_survey(survey_id)
+        if survey and survey['state'] == SURVEY_STATUS['ACTIVE']:
+            return survey
+        return None
+
     async def create_reminders_for_survey(self, survey_id: int, survey_time: datetime):
         """Создание напоминаний для всех пользователей опроса"""
         try:
             from datetime import timezone
 
             # Получаем опрос
-            surveys = SurveyModel.get_active_surveys()
-            survey = next((s for s in surveys if s['id_survey'] == survey_id), None)
+            survey = self._get_active_survey(survey_id)
 
             if not survey:
                 logger.error(f"Опрос #{survey_id} не найден")
@@ -145,25 +228,21 @@ class SurveyScheduler:
             else:
                 survey_time_utc = survey_time.astimezone(timezone.utc)
 
-            logger.info(f" Создаем напоминания для опроса #{survey_id}")
-            logger.info(f"   Время опроса (local): {survey_time}")
-            logger.info(f"   Время опроса (UTC): {survey_time_utc}")
+            logger.info(f"Создаем напоминания для опроса #{survey_id}: время опроса {survey_time} (UTC {survey_time_utc})")
 
             reminders_created = 0
-            users_without_tg = 0
-
-            for user in users:
-                user_id = user['id_user']
-                tg_id = user.get('tg_id')
-
-                if not tg_id:
-                    users_without_tg += 1
-                    continue
+            user_ids = [user['id_user'] for user in users if user.get('tg_id')]
+            users_without_tg = len(users) - len(user_ids)
 
-                # Проверяем, не ответил ли уже пользователь
-                has_response = ReminderModel.check_user_response(survey_id, user_id)
+            # Кто еще не ответил на опрос - по индексу ответов, без запроса на каждого пользователя
+            if answered_index.warmed:
+                unanswered = set(answered_index.unanswered_users(survey_id, user_ids))
+            else:
+                unanswered = {user_id for user_id in user_ids
+                              if not ReminderModel.check_user_response(survey_id, user_id)}
 
-                if not has_response:
+            for user_id in user_ids:
+                if user_id in unanswered:
                     # Создаем напоминания для каждого этапа из констант
                     for stage in sorted(REMINDER_INTERVALS.keys()):
                         interval_seconds = REMINDER_INTERVALS[stage]
@@ -179,7 +258,7 @@ class SurveyScheduler:
 
                         if success:
                             reminders_created += 1
-                            logger.debug(f"   Создано напоминание этап {stage} на {reminder_time}")
+                            logger.debug("   Создано напоминание этап %s на %s", stage, reminder_time)
 
             logger.info(f"Создано {reminders_created} напоминаний для опроса #{survey_id}")
             if users_without_tg > 0:
@@ -191,54 +270,74 @@ class SurveyScheduler:
             logger.error(traceback.format_exc())
 
     async def check_and_send_reminders(self):
-        """Проверка и отправка напоминаний"""
+        """Проверка и отправка напоминаний: по одному сообщению на пользователя"""
         try:
             logger.info("🔍 ПРОВЕРКА НАПОМИНАНИЙ...")
 
-            # Получаем все готовые к отправке напоминания
-            pending_reminders = ReminderModel.get_pending_reminders()
-            logger.info(f"Найдено {len(pending_reminders)} напоминаний для отправки")
-
-            sent_count = 0
+            # Ответы, записанные мимо этого процесса, - до проверки "ответил ли пользователь"
+            answered_index.refresh()
+
+            # Наступившие напоминания и напоминания ближайшего окна; из них - пользователи шардов этой реплики
+            pending_reminders = [reminder for reminder in ReminderModel.get_pending_reminders(
+                                     now=self.clock.db_now(), lookahead=config.REMINDER_COALESCE_WINDOW)
+                                 if self.lease.owns_user(reminder['user_id'])]
+            fetched_at = self.clock.monotonic()
+            due_count = sum(1 for reminder in pending_reminders if self._is_due(reminder))
+            metrics.set('scheduler_pending_reminders', due_count)
+            logger.info(f"Найдено {due_count} напоминаний для отправки, "
+                        f"в окне упреждения {len(pending_reminders) - due_count}")
+
+            # Пользователь -> его напоминания (в порядке срока)
+            by_user: Dict[int, List[Dict]] = {}
             skipped_count = 0
-
             for reminder in pending_reminders:
-                reminder_id = reminder['id']
                 survey_id = reminder['survey_id']
                 user_id = reminder['user_id']
-                tg_id = reminder['tg_id']
-                stage = reminder['reminder_stage']
-
-                logger.info(
-                    f"Обрабатываю напоминание #{reminder_id} для пользователя {tg_id} (опрос #{survey_id}, этап {stage})")
 
                 # Двойная проверка: отвечал ли пользователь
-                has_response = ReminderModel.check_user_response(survey_id, user_id)
-
-                if has_response:
-                    logger.info(f"Пользователь {tg_id} уже ответил на опрос #{survey_id}, отменяю напоминания")
+                if ReminderModel.check_user_response(survey_id, user_id):
+                    logger.log(LOG_LEVEL_HOTPATH, "Пользователь %s уже ответил на опрос #%s, отменяю напоминания",
+                               reminder['tg_id'], survey_id)
                     ReminderModel.cancel_user_reminders(survey_id, user_id)
                     skipped_count += 1
                     continue
+                by_user.setdefault(reminder['tg_id'], []).append(reminder)
 
-                # Отправляем напоминание
-                try:
-                    await self.send_reminder_to_user(reminder)
-
-                    # Помечаем как отправленное
-                    ReminderModel.mark_reminder_sent(reminder_id)
+            sent_count = 0
+            sent_ids: List[int] = []
+            try:
+                for tg_id, reminders in by_user.items():
+                    entries = self._coalesce_reminders(reminders)
+                    if not entries:
+                        continue
+
+                    try:
+                        if len(entries) == 1:
+                            await self.send_reminder_to_user(entries[0][0])
+                        else:
+                            await self.send_reminder_digest(tg_id, [covered[0] for covered in entries])
+                    except Exception as e:
+                        logger.error(f"Ошибка отправки напоминаний пользователю {tg_id}: {e}")
+                        continue
+
+                    metrics.observe('scheduler_reminder_digest_size', len(entries))
+                    for covered in entries:
+                        for reminder in covered:
+                            sent_ids.append(reminder['id'])
+                            # Задержка = просрочка на момент выборки + время до фактической отправки
+                            lag_seconds = float(reminder.get('seconds_late') or 0) + (self.clock.monotonic() - fetched_at)
+                            metrics.observe('scheduler_reminder_lag_ms', max(lag_seconds, 0) * 1000)
                     sent_count += 1
-
-                    logger.info(f"Напоминание отправлено: опрос #{survey_id}, пользователь #{user_id}, этап {stage}")
-
-                except Exception as e:
-                    logger.error(f"Ошибка отправки напоминания #{reminder_id}: {e}")
+            finally:
+                # Все строки отправленных сообщений - одним UPDATE, в т.ч. при прерывании цикла
+                ReminderModel.mark_reminders_sent(sent_ids)
 
             if sent_count > 0:
-                logger.info(f"Отправлено {sent_count} напоминаний, пропущено {skipped_count}")
-            elif pending_reminders:
+                logger.info(f"Отправлено {sent_count} сообщений ({len(sent_ids)} напоминаний), "
+                            f"пропущено {skipped_count}")
+            elif due_count:
                 logger.warning(
-                    f"НАПОМИНАНИИ ЕСТЬ, НО НЕ ОТПРАВЛЕНЫ: найдено {len(pending_reminders)}, отправлено 0")
+                    f"НАПОМИНАНИИ ЕСТЬ, НО НЕ ОТПРАВЛЕНЫ: найдено {due_count}, отправлено 0")
             else:
                 logger.info(f"ℹНет напоминаний для отправки")
 
@@ -246,6 +345,36 @@ class SurveyScheduler:
             logger.error(f"Ошибка отправки напоминаний: {e}")
             logger.error(traceback.format_exc())
 
+    @staticmethod
+    def _is_due(reminder: Dict) -> bool:
+        return float(reminder.get('seconds_late') or 0) >= 0
+
+    @staticmethod
+    def _coalesce_reminders(reminders: List[Dict]) -> List[List[Dict]]:
+        """
+        Напоминания одного пользователя -> пункты сводного сообщения, по одному на опрос.
+        Пункт - список строк reminders, которые он закрывает; первая - показываемый этап.
+        Без наступившего напоминания пользователю ничего не отправляется; наступившие
+        этапы одного опроса сливаются в последний, из окна упреждения берется только
+        ближайший этап опроса, у которого нет наступивших
+        """
+        if not any(SurveyScheduler._is_due(reminder) for reminder in reminders):
+            return []
+
+        by_survey: Dict[int, List[Dict]] = {}
+        for reminder in reminders:
+            by_survey.setdefault(reminder['survey_id'], []).append(reminder)
+
+        entries = []
+        for survey_reminders in by_survey.values():
+            due = [reminder for reminder in survey_reminders if SurveyScheduler._is_due(reminder)]
+            if due:
+                due.sort(key=lambda reminder: reminder['reminder_stage'], reverse=True)
+                entries.append(due)
+            else:
+                entries.append([min(survey_reminders, key=lambda reminder: reminder['reminder_stage'])])
+        return entries
+
     async def _run_extra_diagnostics(self):
         """Дополнительная диагностика"""
         try:
@@ -294,13 +423,70 @@ class SurveyScheduler:
                 chat_id=tg_id,
                 text=message
             )
+            metrics.inc('broadcast_messages_total', kind='reminder', result='sent')
 
-            logger.info(f"Напоминание отправлено пользователю {tg_id} (опрос #{survey_id}, этап {stage})")
+            logger.log(LOG_LEVEL_HOTPATH, "Напоминание отправлено пользователю %s (опрос #%s, этап %s)",
+                       tg_id, survey_id, stage)
 
         except Exception as e:
+            metrics.inc('broadcast_messages_total', kind='reminder', result='failed')
             logger.error(f"Ошибка отправки напоминания пользователю {tg_id}: {e}")
             raise
 
+    @staticmethod
+    def _digest_messages(reminders: List[Dict]) -> List[str]:
+        """
+        Текст сводного напоминания: вопросы укорачиваются до DIGEST_QUESTION_LENGTH,
+        пункты раскладываются по сообщениям не длиннее TELEGRAM_MESSAGE_LIMIT
+        """
+        header = f"Напоминание: у вас {len(reminders)} неотвеченных опросов\n"
+        footer = "Пожалуйста, ответьте на опросы:\n/response\n\nПосле выберите опрос из списка."
+
+        messages = []
+        lines = [header]
+        length = len(header)
+        for number, reminder in enumerate(reminders, 1):
+            question = reminder['question'] or ''
+            if len(question) > DIGEST_QUESTION_LENGTH:
+                question = question[:DIGEST_QUESTION_LENGTH - 3] + '...'
+            entry = (
+                f"{number}. {question}\n"
+                f"Время опроса: {reminder['survey_time'].strftime('%d.%m.%Y %H:%M')}\n"
+                f"ID опроса: {reminder['survey_id']}, этап {reminder['reminder_stage']}\n"
+            )
+            # +1 - перевод строки, которым соединяются пункты
+            if lines and length + len(entry) + 1 > TELEGRAM_MESSAGE_LIMIT:
+                messages.append("\n".join(lines))
+                lines, length = [], 0
+            lines.append(entry)
+            length += len(entry) + 1
+
+        if lines and length + len(footer) + 1 > TELEGRAM_MESSAGE_LIMIT:
+            messages.append("\n".join(lines))
+            lines = []
+        lines.append(footer)
+        messages.append("\n".join(lines))
+        return messages
+
+    async def send_reminder_digest(self, tg_id: int, reminders: List[Dict]):
+        """Сводное напоминание со всеми неотвеченными опросами пользователя (при необходимости - частями)"""
+        try:
+            messages = self._digest_messages(reminders)
+            for text in messages:
+                await self.bot.send_message(
+                    chat_id=tg_id,
+                    text=text
+                )
+            metrics.inc('broadcast_messages_total', kind='reminder', result='sent')
+
+            logger.log(LOG_LEVEL_HOTPATH, "Сводное напоминание отправлено пользователю %s: %s опросов, %s сообщений",
+                       tg_id, len(reminders), len(messages))
+
+        except Exception as e:
+            metrics.inc('broadcast_messages_total', kind='reminder', result='failed')
+            logger.error(f"Ошибка отправки сводного напоминания пользователю {tg_id}: {e}")
+            raise
+
     async def schedule_survey(self, survey_id: int, send_time: datetime):
         """Планирование отправки опроса"""
         # Отменяем существующую задачу, если есть
@@ -309,7 +495,7 @@ class SurveyScheduler:
             logger.info(f"Отменена предыдущая задача для опроса #{survey_id}")
 
         # Вычисляем задержку в секундах
-        now = datetime.now()
+        now = self.clock.now()
         delay = (send_time - now).total_seconds()
 
         if delay > 0:
@@ -331,7 +517,9 @@ class SurveyScheduler:
         try:
             # Ждем указанное время
             logger.info(f"Ожидание {delay:.0f} секунд для опроса #{survey_id}")
-            await asyncio.sleep(delay)
+            await self.clock.sleep(delay)
+            if not self.accepting:
+                return
 
             # Отправляем опрос
             await self.send_survey_now(survey_id, send_time)
@@ -346,51 +534,83 @@ class SurveyScheduler:
             logger.error(f"Ошибка отправки опроса #{survey_id}: {e}")
 
     async def send_survey_now(self, survey_id: int, send_time: datetime = None):
-        """Немедленная отправка опроса пользователям"""
-        try:
-            # Получаем данные опроса
-            surveys = SurveyModel.get_active_surveys()
-            survey = next((s for s in surveys if s['id_survey'] == survey_id), None)
-
-            if not survey:
-                logger.error(f"Опрос #{survey_id} не найден")
-                return
-
-            # Если время не передано, используем время из БД
-            if send_time is None:
-                send_time = survey['datetime']
-
-            # Получаем пользователей для этого опроса
-            users = await self.get_target_users(survey)
-
-            if not users:
-                logger.warning(f"Нет пользователей для опроса #{survey_id}")
-                return
+        """
+        Немедленная отправка опроса пользователям.
+        Доставки записываются в survey_deliveries пачками: рассылка, прерванная
+        остановкой, на следующем запуске продолжается с того же места
+        """
+        if not self.accepting:
+            logger.info(f"Опрос #{survey_id} не отправлен: планировщик останавливается, отправит следующий запуск")
+            return
 
-            # Отправляем опрос каждому пользователю
-            sent_count = 0
-            failed_count = 0
+        with self._in_flight():
+            try:
+                # Получаем данные опроса
+                survey = self._get_active_survey(survey_id)
+
+                if not survey:
+                    logger.error(f"Опрос #{survey_id} не найден")
+                    return
+
+                # Если время не передано, используем время из БД
+                if send_time is None:
+                    send_time = survey['datetime']
+
+                # Получаем пользователей для этого опроса
+                users = await self.get_target_users(survey)
+
+                if not users:
+                    logger.warning(f"Нет пользователей для опроса #{survey_id}")
+                    return
+
+                delivered = DeliveryModel.get_delivered_users(survey_id)
+                if delivered is None:
+                    # Без контрольной точки неизвестно, кому опрос уже доставлен - рассылка всем
+                    # повторила бы сообщения. Опрос снова отправится при следующей проверке
+                    self.known_surveys.discard(survey_id)
+                    logger.error(f"Опрос #{survey_id} не отправлен: не прочитаны доставки, повтор при следующей проверке")
+                    return
+                if delivered:
+                    logger.info(f"Опрос #{survey_id}: продолжение рассылки, уже доставлено {len(delivered)}")
+
+                # Отправляем опрос каждому пользователю
+                sent_count = 0
+                failed_count = 0
+                checkpoint: List[int] = []
 
-            for user in users:
                 try:
-                    await self.send_survey_to_user(user, survey)
-                    sent_count += 1
-                except Exception as e:
-                    failed_count += 1
-                    logger.error(
-                        f"Ошибка отправки опроса #{survey_id} пользователю {user.get('user_name', 'Unknown')}: {e}")
-
-            # Помечаем опрос как отправленный в кэше
-            self.sent_surveys_cache.add(survey_id)
-
-            # СОЗДАЕМ НАПОМИНАНИЯ
-            await self.create_reminders_for_survey(survey_id, send_time)
-
-            logger.info(f"ОПРОС ОТПРАВЛЕН: #{survey_id} - отправлено {sent_count}, ошибок {failed_count}")
-
-        except Exception as e:
-            logger.error(f"Ошибка при отправке опроса #{survey_id}: {e}")
-            logger.error(f"Трассировка ошибки: {traceback.format_exc()}")
+                    for user in users:
+                        if user['id_user'] in delivered:
+                            continue
+                        try:
+                            await self.send_survey_to_user(user, survey)
+                            sent_count += 1
+                            checkpoint.append(user['id_user'])
+                            if len(checkpoint) >= config.DELIVERY_CHECKPOINT_BATCH:
+                                DeliveryModel.record_deliveries(survey_id, checkpoint)
+                                checkpoint = []
+                        except Exception as e:
+                            failed_count += 1
+                            logger.error(
+                                f"Ошибка отправки опроса #{survey_id} пользователю {user.get('user_name', 'Unknown')}: {e}")
+                finally:
+                    # В т.ч. при прерывании по сроку остановки
+                    DeliveryModel.record_deliveries(survey_id, checkpoint)
+
+                # Помечаем опрос как отправленный в кэше
+                self.sent_surveys_cache.add(survey_id)
+
+                # СОЗДАЕМ НАПОМИНАНИЯ
+                await self.create_reminders_for_survey(survey_id, send_time)
+
+                logger.info(f"ОПРОС ОТПРАВЛЕН: #{survey_id} - отправлено {sent_count}, ошибок {failed_count}")
+
+            except asyncio.CancelledError:
+                logger.warning(f"Рассылка опроса #{survey_id} прервана, прогресс сохранен")
+                raise
+            except Exception as e:
+                logger.error(f"Ошибка при отправке опроса #{survey_id}: {e}")
+                logger.error(f"Трассировка ошибки: {traceback.format_exc()}")
 
     async def get_target_users(self, survey) -> List[Dict]:
         """Получение целевых пользователей для опроса"""
@@ -448,8 +668,10 @@ class SurveyScheduler:
                 chat_id=tg_id,
                 text=message
             )
-            logger.debug(f"Survey #{survey['id_survey']} sent to user {user_name} (tg_id: {tg_id})")
+            metrics.inc('broadcast_messages_total', kind='survey', result='sent')
+            logger.log(LOG_LEVEL_HOTPATH, "Survey #%s sent to user %s (tg_id: %s)", survey['id_survey'], user_name, tg_id)
         except Exception as e:
+            metrics.inc('broadcast_messages_total', kind='survey', result='failed')
             logger.error(f"Error sending to user {user_name} (tg_id: {tg_id}): {e}")
             raise
 
@@ -457,38 +679,24 @@ class SurveyScheduler:
         """Периодическая проверка новых опросов и напоминаний"""
         check_count = 0
 
-        while True:
+        while self.accepting:
             try:
                 check_count += 1
                 logger.info(f"ЦИКЛ ПРОВЕРКИ #{check_count}")
 
                 # Проверяем каждые 30 секунд
-                await asyncio.sleep(SCHEDULER_CHECK_INTERVAL)
-
-                # 1. Проверяем новые опросы
-                surveys = SurveyModel.get_active_surveys()
-                current_survey_ids = {s['id_survey'] for s in surveys}
-
-                # Удаляем задачи для завершенных опросов
-                for survey_id in list(self.scheduled_tasks.keys()):
-                    if survey_id not in current_survey_ids:
-                        if survey_id in self.scheduled_tasks:
-                            self.scheduled_tasks[survey_id].cancel()
-                            del self.scheduled_tasks[survey_id]
-                            logger.info(f"Задача для опроса #{survey_id} удалена (опрос не активен)")
+                await self.clock.sleep(SCHEDULER_CHECK_INTERVAL)
+                if not self.accepting:
+                    break
 
-                # Добавляем новые опросы (те, которые были созданы через sendsurvey)
-                for survey in surveys:
-                    survey_id = survey['id_survey']
-                    survey_time = survey['datetime']
+                with self._in_flight():
+                    await self.sync_leadership()
+                    if self.leading:
+                        await self._check_new_surveys()
 
-                    # Если опрос еще не в планировщике и время в будущем
-                    if survey_id not in self.scheduled_tasks and survey_id not in self.sent_surveys_cache and survey_time > datetime.now():
-                        logger.info(f"Обнаружен новый опрос #{survey_id}, планирую отправку на {survey_time}")
-                        await self.schedule_survey(survey_id, survey_time)
-
-                # 2. Проверяем и отправляем напоминания
-                await self.check_and_send_reminders()
+                    # 2. Проверяем и отправляем напоминания (шарды этой реплики)
+                    async with self.lease.guard:
+                        await self.check_and_send_reminders()
 
                 logger.info(f"ЦИКЛ ПРОВЕРКИ #{check_count} завершен")
 
@@ -496,12 +704,57 @@ class SurveyScheduler:
                 logger.error(f"Ошибка в periodic_check (цикл #{check_count}): {e}")
                 logger.error(traceback.format_exc())
 
+    async def _check_new_surveys(self):
+        """Новые и завершенные опросы (только лидер)"""
+        # 1. Проверяем новые опросы
+        surveys = SurveyModel.get_active_surveys()
+        current_survey_ids = {s['id_survey'] for s in surveys}
+
+        # Удаляем задачи для завершенных опросов
+        for survey_id in list(self.scheduled_tasks.keys()):
+            if survey_id not in current_survey_ids:
+                if survey_id in self.scheduled_tasks:
+                    self.scheduled_tasks[survey_id].cancel()
+                    del self.scheduled_tasks[survey_id]
+                    logger.info(f"Задача для опроса #{survey_id} удалена (опрос не активен)")
+        # Закрытые опросы больше не нужно помнить как отправленные
+        self.sent_surveys_cache &= current_survey_ids
+        self.known_surveys &= current_survey_ids
+
+        # Добавляем новые опросы (те, которые были созданы через sendsurvey)
+        for survey in surveys:
+            survey_id = survey['id_survey']
+            survey_time = survey['datetime']
+
+            # Отмечаем до отправки: неудавшаяся отправка снимает отметку, и опрос повторяется
+            is_new = survey_id not in self.known_surveys
+            self.known_surveys.add(survey_id)
+
+            # Если опрос еще не в планировщике и время в будущем
+            if survey_id not in self.scheduled_tasks and survey_id not in self.sent_surveys_cache and survey_time > self.clock.now():
+                logger.info(f"Обнаружен новый опрос #{survey_id}, планирую отправку на {survey_time}")
+                await self.schedule_survey(survey_id, survey_time)
+            elif is_new and survey_time <= self.clock.now():
+                # Опрос "на сейчас", созданный на другой реплике (или не отправленный из-за ошибки БД)
+                logger.info(f"Обнаружен новый опрос #{survey_id} с наступившим временем, отправляю")
+                await self.send_survey_now(survey_id, survey_time)
+
     async def add_new_survey(self, survey_id: int, send_time: datetime):
         """Добавление нового опроса в планировщик"""
-        now = datetime.now()
+        now = self.clock.now()
 
         logger.info(f"ДОБАВЛЕН НОВЫЙ ОПРОС: #{survey_id} на {send_time}")
 
+        if not self.accepting:
+            # Опрос уже в БД - его подхватит следующий запуск
+            logger.info(f"Опрос #{survey_id} будет запланирован после перезапуска (планировщик останавливается)")
+            return
+        if not self.leading:
+            # Опрос уже в БД - лидер подхватит его на ближайшей проверке
+            logger.info(f"Опрос #{survey_id} передан лидеру планировщика (эта реплика не лидер)")
+            return
+        self.known_surveys.add(survey_id)
+
         # Если время уже прошло, отправляем немедленно
         if send_time <= now:
             logger.info(f"Время опроса #{survey_id} уже наступило, отправляю немедленно")
@@ -523,3 +776,39 @@ class SurveyScheduler:
 
         self.scheduled_tasks.clear()
         logger.info("Планировщик опросов остановлен")
+
+    async def shutdown(self, deadline: float = None):
+        """
+        Согласованная остановка (при остановке бота): новые рассылки не начинаются,
+        ожидающие задачи отменяются (следующий запуск восстановит их из БД),
+        текущие рассылки опросов и напоминаний дорабатывают до deadline секунд,
+        после чего прерываются с сохранением прогресса. Затем освобождается
+        лидерство планировщика, чтобы другая реплика подхватила его сразу
+        """
+        deadline = config.SHUTDOWN_DEADLINE if deadline is None else deadline
+        logger.info("ОСТАНОВКА ПЛАНИРОВЩИКА...")
+        self.accepting = False
+
+        current = asyncio.current_task()
+        waiting = [task for task in [*self.scheduled_tasks.values(), self._periodic_task, self._watch_task]
+                   if task is not None and task is not current and not task.done() and task not in self.inflight]
+        for task in waiting:
+            task.cancel()
+
+        interrupted = []
+        if self.inflight:
+            logger.info(f"Ожидание текущих рассылок: {len(self.inflight)}, не дольше {deadline:.0f} с")
+            try:
+                await asyncio.wait_for(self._idle.wait(), timeout=deadline)
+            except asyncio.TimeoutError:
+                interrupted = [task for task in self.inflight if task is not current]
+                logger.warning(f"Срок остановки истек, прерываю рассылок: {len(interrupted)}")
+                for task in interrupted:
+                    task.cancel()
+        await asyncio.gather(*waiting, *interrupted, return_exceptions=True)
+        self.scheduled_tasks.clear()
+
+        async with self.lease.guard:
+            self.lease.release()
+        logger.info(f"Планировщик опросов остановлен (отменено ожидающих задач: {len(waiting)}, "
+                    f"прервано рассылок: {len(interrupted)})")
@@ -0,0 +1,128 @@
+# search_handlers.py - поиск по вопросам опросов и ответам (/search)
+import asyncio
+import logging
+
+from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.ext import ContextTypes, CommandHandler
+
+from tg_bot.config.constants import SEARCH_PAGINATION_PREFIX
+from tg_bot.config.roles_config import get_role_category
+from tg_bot.config.settings import config
+from tg_bot.config.texts import SEARCH_TEXTS
+from tg_bot.database.search_models import SearchModel
+from tg_bot.handlers.callback_router import CallbackPayload, callback_router, parse_page
+
+logger = logging.getLogger(__name__)
+
+SNIPPET_LENGTH = 150
+
+
+def _preview(text: str, length: int = SNIPPET_LENGTH) -> str:
+    text = ' '.join((text or '').split())
+    return text[:length - 3] + '...' if len(text) > length else text
+
+
+def _format_results(text: str, rows, page: int) -> str:
+    message = SEARCH_TEXTS['title'].format(query=text, page=page + 1) + "\n\n"
+    start_num = page * config.SEARCH_PAGE_SIZE + 1
+
+    for i, row in enumerate(rows):
+        date_str = row['datetime'].strftime('%d.%m.%Y') if row['datetime'] else '?'
+        if row['kind'] == 'survey':
+            message += f"{start_num + i}. Опрос #{row['id_survey']} ({date_str})\n"
+            message += f"   {_preview(row['question'])}\n\n"
+        else:
+            label = "Дополнение к ответу на опрос" if row['kind'] == 'part' else "Ответ на опрос"
+            message += f"{start_num + i}. {label} #{row['id_survey']} ({date_str})\n"
+            message += f"   Вопрос: {_preview(row['question'], 60)}\n"
+            message += f"   {row['user_name'] or 'Без имени'}: {_preview(row['answer'])}\n\n"
+
+    return message
+
+
+def _navigation(page: int, has_next: bool) -> InlineKeyboardMarkup:
+    nav_buttons = []
+    if page > 0:
+        nav_buttons.append(InlineKeyboardButton("⬅️ Назад", callback_data=f"{SEARCH_PAGINATION_PREFIX}{page - 1}"))
+    if has_next:
+        nav_buttons.append(InlineKeyboardButton("➡️ Вперед", callback_data=f"{SEARCH_PAGINATION_PREFIX}{page + 1}"))
+
+    keyboard = [nav_buttons] if nav_buttons else []
+    keyboard.append([InlineKeyboardButton("✖️ Закрыть", callback_data=f"{SEARCH_PAGINATION_PREFIX}close")])
+    return InlineKeyboardMarkup(keyboard)
+
+
+async def _render_page(context: ContextTypes.DEFAULT_TYPE, page: int):
+    """
+    Страница поиска по сохраненному запросу. В user_data хранятся курсоры начала
+    уже открытых страниц: следующая страница читается после курсора, без OFFSET
+    """
+    search = context.user_data.get('search')
+    if not search or page < 0 or page >= len(search['cursors']):
+        return None
+
+    rows, next_cursor = await asyncio.to_thread(
+        SearchModel.search, search['text'], config.SEARCH_PAGE_SIZE, search['cursors'][page]
+    )
+    if not rows:
+        return None
+
+    if next_cursor is not None:
+        del search['cursors'][page + 1:]
+        search['cursors'].append(next_cursor)
+
+    return _format_results(search['text'], rows, page), _navigation(page, next_cursor is not None)
+
+
+async def search_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Обработчик команды /search <запрос> - для руководителей"""
+    user_role = context.user_data.get('user_role')
+    if not user_role or get_role_category(user_role) != 'CEO':
+        await update.message.reply_text(SEARCH_TEXTS['ceo_only'])
+        return
+
+    text = ' '.join(context.args or []).strip()
+    if not text:
+        await update.message.reply_text(SEARCH_TEXTS['usage'])
+        return
+
+    context.user_data['search'] = {'text': text, 'cursors': [None]}
+    rendered = await _render_page(context, 0)
+    if not rendered:
+        context.user_data.pop('search', None)
+        await update.message.reply_text(SEARCH_TEXTS['not_found'].format(query=text))
+        return
+
+    message, keyboard = rendered
+    await update.message.reply_text(message, reply_markup=keyboard)
+
+
+async def handle_search_page(update: Update, context: ContextTypes.DEFAULT_TYPE, payload: CallbackPayload):
+    """Навигация по страницам результатов поиска"""
+    query = update.callback_query
+    await query.answer()
+
+    action = payload.value
+    if action == "close":
+        context.user_data.pop('search', None)
+        await query.edit_message_text("Просмотр закрыт.")
+        return
+
+    if not isinstance(action, int) or action < 0:
+        logger.warning(f"Неизвестный action в callback_data поиска: {action}")
+        return
+
+    rendered = await _render_page(context, action)
+    if not rendered:
+        await query.edit_message_text(SEARCH_TEXTS['expired'])
+        return
+
+    message, keyboard = rendered
+    await query.edit_message_text(message, reply_markup=keyboard)
+
+
+def setup_search_handlers(application):
+    """Настройка обработчиков поиска"""
+    application.add_handler(CommandHandler("search", search_command))
+    callback_router.route(SEARCH_PAGINATION_PREFIX, handle_search_page, parse=parse_page)
+    logger.info("Обработчики поиска настроены")
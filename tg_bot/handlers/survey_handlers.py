@@ -6,8 +6,9 @@ from telegram.ext import ContextTypes, ConversationHandler, CommandHandler, Mess
     CallbackQueryHandler
 
 from tg_bot.config.roles_config import get_role_category
+from tg_bot.config.settings import config
 from tg_bot.database.models import SurveyModel, ResponseModel, UserModel
-from datetime import datetime, timedelta
+from datetime import datetime
 import re
 from tg_bot.config.constants import (
     AWAITING_SURVEY_QUESTION,
@@ -17,13 +18,13 @@ from tg_bot.config.constants import (
     SURVEY_PAGINATION_PREFIX,
     AWAITING_SURVEY_TARGET,
     AWAITING_SURVEY_SUBTARGET,
-    AWAITING_SURVEY_ROLE,
-    RESPONSE_PERIOD_DAYS
+    AWAITING_SURVEY_ROLE
 )
 from tg_bot.config.texts import SURVEY_TEXTS, GENERAL_TEXTS
 from tg_bot.handlers.survey_target_handlers import show_survey_target_selection, handle_survey_target_selection, \
     handle_survey_subtarget_selection
 from tg_bot.services.pagination_utils import PaginationUtils
+from tg_bot.services.survey_cache import role_survey_snapshot
 from tg_bot.services.validators import Validator
 
 logger = logging.getLogger(__name__)
@@ -194,22 +195,8 @@ async def handle_survey_selection(update: Update, context: ContextTypes.DEFAULT_
         user_id = context.user_data.get('user_id')
         user_role = context.user_data.get('user_role')
 
-        # Используем функцию с ограничением по периоду
-        period_days = RESPONSE_PERIOD_DAYS
-        date_from = datetime.now() - timedelta(days=period_days)
-
-        active_surveys_for_role = SurveyModel.get_surveys_for_role_since(user_role, date_from)
-        active_surveys_for_all = SurveyModel.get_surveys_for_role_since(None, date_from)
-        all_surveys = active_surveys_for_role + active_surveys_for_all
-
-        # Фильтруем
-        filtered_surveys = []
-        for survey in all_surveys:
-            existing_response = ResponseModel.get_user_response(survey['id_survey'], user_id)
-            if not existing_response:
-                filtered_surveys.append(survey)
-
-        all_surveys = filtered_surveys
+        # Опросы за период RESPONSE_PERIOD_DAYS из общего снимка, без отвеченных
+        all_surveys = role_survey_snapshot.filter_unanswered(role_survey_snapshot.get_surveys(user_role), user_id)
 
     if not 1 <= selection_num <= len(all_surveys):
         await update.message.reply_text(
@@ -273,12 +260,10 @@ async def finish_response_command(update: Update, context: ContextTypes.DEFAULT_
         'answer': full_response
     }
 
-    response_id = ResponseModel.save_response(response_data)
-
-    if response_id:
-        from tg_bot.database.reminder_models import ReminderModel
-        ReminderModel.cancel_user_reminders(survey_id, context.user_data['user_id'])
+    # Ответ сохраняется и напоминания отменяются одной транзакцией
+    result = ResponseModel.upsert_response(response_data)
 
+    if result:
         # Форматируем дату для сообщения
         date_str = ""
         if survey_date:
@@ -386,13 +371,8 @@ async def response_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
             await update.message.reply_text(response_text)
         return ConversationHandler.END
 
-    # Получаем активные опросы с ограничением по дате
-    period_days = RESPONSE_PERIOD_DAYS
-    date_from = datetime.now() - timedelta(days=period_days)
-
-    active_surveys_for_role = SurveyModel.get_surveys_for_role_since(user_role, date_from)
-    active_surveys_for_all = SurveyModel.get_surveys_for_role_since(None, date_from)
-    all_active_surveys = active_surveys_for_role + active_surveys_for_all
+    # Активные опросы за период RESPONSE_PERIOD_DAYS - из общего снимка по ролям
+    all_active_surveys = role_survey_snapshot.get_surveys(user_role)
 
     if not all_active_surveys:
         response_text = SURVEY_TEXTS['no_active_surveys']
@@ -403,11 +383,7 @@ async def response_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
 
     # Фильтруем опросы, на которые пользователь еще не отвечал
-    unanswered_surveys = []
-    for survey in all_active_surveys:
-        existing_response = ResponseModel.get_user_response(survey['id_survey'], user_id)
-        if not existing_response:
-            unanswered_surveys.append(survey)
+    unanswered_surveys = role_survey_snapshot.filter_unanswered(all_active_surveys, user_id)
 
     if not unanswered_surveys:
         response_text = SURVEY_TEXTS['all_surveys_answered']
@@ -651,6 +627,8 @@ survey_response_conversation = ConversationHandler(
         CommandHandler('cancel', cancel_survey_response),
         CommandHandler('stop', cancel_survey_response),
     ],
+    name='survey_response',
+    persistent=config.PERSISTENCE_ENABLED,
 )
 
 survey_creation_conversation = ConversationHandler(
@@ -671,5 +649,7 @@ survey_creation_conversation = ConversationHandler(
     },
     fallbacks=[CommandHandler('cancel', cancel_survey)],
     per_user=True,
-    per_chat=True
+    per_chat=True,
+    name='survey_creation',
+    persistent=config.PERSISTENCE_ENABLED
 )
\ No newline at end of file
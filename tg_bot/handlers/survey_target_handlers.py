@@ -1,7 +1,7 @@
 # -*- coding: utf-8 -*-
 import logging
 from telegram import Update, InlineKeyboardMarkup, InlineKeyboardButton
-from telegram.ext import ContextTypes, CallbackQueryHandler
+from telegram.ext import ContextTypes
 
 from tg_bot.config.constants import (
     AWAITING_SURVEY_TARGET, AWAITING_SURVEY_SUBTARGET,
@@ -10,6 +10,7 @@ from tg_bot.config.constants import (
 from tg_bot.config.texts import get_role_display_with_icon, get_category_display
 from tg_bot.config.roles_config import get_worker_subtypes, get_ceo_subtypes
 from tg_bot.database.models import UserModel
+from tg_bot.handlers.callback_router import callback_router
 
 logger = logging.getLogger(__name__)
 
@@ -215,17 +216,8 @@ async def handle_survey_subtarget_selection(update: Update, context: ContextType
 
 def setup_survey_target_handlers(application):
     """Настройка обработчиков выбора получателей опроса"""
-    application.add_handler(CallbackQueryHandler(
-        handle_survey_target_selection,
-        pattern=f"^{SURVEY_TARGET_PREFIX}(?!back_to_category)"  # Исключаем кнопку "Назад"
-    ))
-    application.add_handler(CallbackQueryHandler(
-        handle_survey_subtarget_selection,
-        pattern=f"^{SURVEY_SUBTARGET_PREFIX}"
-    ))
-    # Отдельный обработчик для кнопки "Назад"
-    application.add_handler(CallbackQueryHandler(
-        handle_survey_subtarget_selection,
-        pattern=f"^{SURVEY_TARGET_PREFIX}back_to_category$"
-    ))
+    callback_router.route(SURVEY_TARGET_PREFIX, handle_survey_target_selection)
+    callback_router.route(SURVEY_SUBTARGET_PREFIX, handle_survey_subtarget_selection)
+    # Отдельный маршрут для кнопки "Назад" (точное совпадение важнее префикса)
+    callback_router.route(f"{SURVEY_TARGET_PREFIX}back_to_category", handle_survey_subtarget_selection, exact=True)
     logger.info("Обработчики выбора получателей опроса настроены")
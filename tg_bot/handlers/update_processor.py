@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import logging
+from typing import Awaitable, Dict, Optional
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+from tg_bot.config.constants import UPDATE_PENDING_LIMIT
+
+logger = logging.getLogger(__name__)
+
+
+class PerChatUpdateProcessor(BaseUpdateProcessor):
+    """
+    Параллельная обработка update с сохранением порядка внутри одного чата.
+
+    Update разных чатов обрабатываются одновременно (не более workers),
+    update одного чата - строго по очереди, поэтому состояния ConversationHandler
+    (создание опроса, /response, /addresponse) не перемешиваются.
+
+    Семафор BaseUpdateProcessor ограничивает принятые update (max_pending_updates),
+    рабочий слот берется в do_process_update уже после очереди чата: update, ждущий
+    своей очереди, слот не занимает, и частые update одного чата не задерживают остальные.
+    Запросы к БД в обработчиках синхронные и блокируют цикл событий - медленный запрос
+    (например, /allsurveys) по-прежнему задерживает все чаты; параллельно идут только
+    ожидания Bot API
+    """
+
+    def __init__(self, workers: int, max_pending_updates: int = UPDATE_PENDING_LIMIT):
+        super().__init__(max(workers, max_pending_updates))
+        self.workers = workers
+        self._worker_slots = asyncio.BoundedSemaphore(workers)
+        self._chat_locks: Dict[int, asyncio.Lock] = {}
+        self._chat_waiters: Dict[int, int] = {}
+
+    @staticmethod
+    def _ordering_key(update: object) -> Optional[int]:
+        """Ключ очереди: id чата, иначе id пользователя; None - порядок не важен"""
+        if not isinstance(update, Update):
+            return None
+        if update.effective_chat:
+            return update.effective_chat.id
+        if update.effective_user:
+            return update.effective_user.id
+        return None
+
+    async def do_process_update(self, update: object, coroutine: Awaitable) -> None:
+        key = self._ordering_key(update)
+        if key is None:
+            async with self._worker_slots:
+                await coroutine
+            return
+
+        lock = self._chat_locks.get(key)
+        if lock is None:
+            lock = self._chat_locks[key] = asyncio.Lock()
+        self._chat_waiters[key] = self._chat_waiters.get(key, 0) + 1
+
+        try:
+            async with lock:
+                async with self._worker_slots:
+                    await coroutine
+        finally:
+            # Блокировка больше никому не нужна - удаляем, чтобы словарь не рос
+            self._chat_waiters[key] -= 1
+            if not self._chat_waiters[key]:
+                del self._chat_waiters[key]
+                del self._chat_locks[key]
+
+    async def initialize(self) -> None:
+        logger.info(f"Параллельная обработка update: до {self.workers} одновременно "
+                    f"(принято до {self.max_concurrent_updates}), порядок внутри чата сохраняется")
+
+    async def shutdown(self) -> None:
+        if self._chat_locks:
+            logger.info(f"Остановка обработчика update, чатов в обработке: {len(self._chat_locks)}")
@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+import logging
+import re
+import time
+
+from telegram import Update
+from telegram.ext import CommandHandler, ContextTypes, ConversationHandler, TypeHandler
+
+from tg_bot.config.constants import LOG_LEVEL_HOTPATH
+from tg_bot.config.settings import config
+from tg_bot.database.instrumentation import start_update_tracking, finish_update_tracking
+from tg_bot.services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Группы обработчиков: до и после всех остальных
+TRACKING_START_GROUP = -100
+TRACKING_FINISH_GROUP = 100
+
+# Метка для команд, не зарегистрированных в приложении: текст команды задает пользователь,
+# и каждая новая команда иначе создавала бы свои серии метрик
+OTHER_COMMAND_LABEL = "command:other"
+
+# Имена зарегистрированных команд; собираются при первом update, когда все обработчики добавлены
+_command_names = None
+
+
+def _collect_command_names(handlers) -> set:
+    """Команды CommandHandler, в т.ч. внутри ConversationHandler"""
+    names = set()
+    for handler in handlers:
+        if isinstance(handler, CommandHandler):
+            names |= handler.commands
+        elif isinstance(handler, ConversationHandler):
+            names |= _collect_command_names(handler.entry_points)
+            names |= _collect_command_names(handler.fallbacks)
+            for state_handlers in handler.states.values():
+                names |= _collect_command_names(state_handlers)
+    return names
+
+
+def registered_command_names(application) -> frozenset:
+    global _command_names
+    if _command_names is None:
+        _command_names = frozenset(_collect_command_names(
+            handler for group in application.handlers.values() for handler in group))
+    return _command_names
+
+
+def describe_update(update: Update, command_names: frozenset = frozenset()) -> str:
+    """
+    Короткое описание update для логов и метрик: команда, callback или тип сообщения.
+    Числа в callback_data заменяются на N, а незарегистрированные команды - на command:other,
+    чтобы число меток метрик было ограничено
+    """
+    if update.callback_query and update.callback_query.data:
+        return "callback:" + re.sub(r'\d+', 'N', update.callback_query.data)
+
+    message = update.effective_message
+    if message and message.text:
+        if message.text.startswith('/'):
+            command = message.text.split()[0].split('@')[0][1:].lower()
+            return f"/{command}" if command in command_names else OTHER_COMMAND_LABEL
+        return "text"
+
+    return "other"
+
+
+async def begin_update_tracking(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Начало подсчета запросов к БД для update"""
+    start_update_tracking()
+
+
+async def end_update_tracking(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Запись количества запросов к БД, выполненных при обработке update"""
+    counters = finish_update_tracking()
+    if not counters:
+        return
+
+    handler_name = describe_update(update, registered_command_names(context.application))
+    duration_ms = (time.perf_counter() - counters['started']) * 1000
+    metrics.inc('bot_updates_total', type='callback_query' if update.callback_query else 'message')
+    metrics.observe('bot_handler_latency_ms', duration_ms, handler=handler_name)
+    metrics.observe('bot_handler_db_queries', counters['queries'], handler=handler_name)
+
+    if counters['queries'] >= config.UPDATE_QUERY_WARN_THRESHOLD:
+        level, prefix = logging.WARNING, "Много запросов на один update - "
+    else:
+        level, prefix = LOG_LEVEL_HOTPATH, ""
+    logger.log(level, "%sUpdate %s (%s): запросов к БД %s, соединений %s, время БД %.1f мс, всего %.1f мс",
+               prefix, update.update_id, handler_name, counters['queries'], counters['connections'],
+               counters['db_ms'], duration_ms)
+
+
+def setup_update_tracking(application):
+    """Настроить подсчет запросов к БД на каждый update"""
+    application.add_handler(TypeHandler(Update, begin_update_tracking), group=TRACKING_START_GROUP)
+    application.add_handler(TypeHandler(Update, end_update_tracking), group=TRACKING_FINISH_GROUP)
+    logger.info("Учет запросов к БД по update настроен")
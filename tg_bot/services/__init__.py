@@ -4,6 +4,15 @@ from . import user_service
 from . import jira_handler
 from . import jira_integration
 from . import jira_loader
+from . import page_cache
+from . import metrics
+from . import clock
+from . import survey_cache
+from . import report_engine
+from . import export_service
+from . import survey_lifecycle
+from . import leader_election
+from . import logging_setup
 
 __all__ = [
     'pagination_utils',
@@ -11,5 +20,14 @@ __all__ = [
     'jira_handler',
     'jira_integration',
     'jira_loader',
-    'validators'
+    'validators',
+    'page_cache',
+    'metrics',
+    'clock',
+    'survey_cache',
+    'report_engine',
+    'export_service',
+    'survey_lifecycle',
+    'leader_election',
+    'logging_setup'
 ]
@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import heapq
+import time
+from datetime import datetime, timedelta
+from itertools import count
+from typing import List, Optional, Tuple
+
+
+class SystemClock:
+    """Реальное время - используется планировщиком по умолчанию"""
+
+    def now(self) -> datetime:
+        return datetime.now()
+
+    def db_now(self) -> Optional[datetime]:
+        """Время для сравнения в SQL; None - запросы берут время самой БД"""
+        return None
+
+    def monotonic(self) -> float:
+        return time.monotonic()
+
+    async def sleep(self, seconds: float):
+        await asyncio.sleep(seconds)
+
+
+class VirtualClock:
+    """
+    Виртуальное время для симуляций: sleep() не ждет реально, а ставит задачу
+    в очередь до момента, когда время будет продвинуто через advance()/advance_to()
+    """
+
+    # Сколько раз отдать управление event loop после пробуждения задач,
+    # чтобы они дошли до следующего sleep()
+    SETTLE_ITERATIONS = 20
+
+    def __init__(self, start: datetime = None):
+        self._start = start or datetime.now()
+        self._now = self._start
+        self._sleepers: List[Tuple[datetime, int, asyncio.Future]] = []
+        self._sequence = count()
+
+    def now(self) -> datetime:
+        return self._now
+
+    def db_now(self) -> Optional[datetime]:
+        return self._now
+
+    def monotonic(self) -> float:
+        return (self._now - self._start).total_seconds()
+
+    @property
+    def pending_sleepers(self) -> int:
+        return sum(1 for _, _, future in self._sleepers if not future.done())
+
+    async def sleep(self, seconds: float):
+        if seconds <= 0:
+            await asyncio.sleep(0)
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._sleepers, (self._now + timedelta(seconds=seconds), next(self._sequence), future))
+        await future
+
+    async def _settle(self):
+        for _ in range(self.SETTLE_ITERATIONS):
+            await asyncio.sleep(0)
+
+    async def advance_to(self, target: datetime):
+        """Продвинуть время до target, по очереди будя все задачи, чей sleep() истек"""
+        # Задачи, созданные перед вызовом, должны успеть встать в sleep() на текущем времени
+        await self._settle()
+        while self._sleepers and self._sleepers[0][0] <= target:
+            wake_time, _, future = heapq.heappop(self._sleepers)
+            if future.done():
+                continue
+            self._now = max(self._now, wake_time)
+            future.set_result(None)
+            await self._settle()
+
+        self._now = max(self._now, target)
+        await self._settle()
+
+    async def advance(self, seconds: float):
+        await self.advance_to(self._now + timedelta(seconds=seconds))
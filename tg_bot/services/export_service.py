@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+import csv
+import gzip
+import logging
+import os
+import tempfile
+import time
+from datetime import datetime
+from typing import Optional, Tuple
+
+from tg_bot.config.settings import config
+from tg_bot.database.models import ResponseModel
+
+try:
+    from openpyxl import Workbook
+except ImportError:  # XLSX - необязательная возможность
+    Workbook = None
+
+logger = logging.getLogger(__name__)
+
+# Колонки выгрузки: (ключ строки, заголовок)
+EXPORT_COLUMNS = [
+    ('id_response', 'ID ответа'),
+    ('id_survey', 'ID опроса'),
+    ('survey_datetime', 'Дата опроса'),
+    ('question', 'Вопрос'),
+    ('survey_role', 'Аудитория опроса'),
+    ('id_user', 'ID пользователя'),
+    ('user_name', 'Имя'),
+    ('tg_username', 'Telegram'),
+    ('user_role', 'Роль'),
+    ('answer', 'Ответ'),
+]
+
+EXPORT_FORMATS = ('csv', 'xlsx')
+
+
+def xlsx_available() -> bool:
+    return Workbook is not None
+
+
+def _cell(value):
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m-%d %H:%M')
+    return value
+
+
+def _write_csv(rows, path: str) -> int:
+    count = 0
+    with gzip.open(path, 'wt', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow([title for _, title in EXPORT_COLUMNS])
+        for row in rows:
+            writer.writerow([_cell(row.get(key)) for key, _ in EXPORT_COLUMNS])
+            count += 1
+    return count
+
+
+def _write_xlsx(rows, path: str) -> int:
+    # write_only - строки сбрасываются во временные файлы, а не держатся в памяти
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('Ответы')
+    sheet.append([title for _, title in EXPORT_COLUMNS])
+    count = 0
+    for row in rows:
+        sheet.append([_cell(row.get(key)) for key, _ in EXPORT_COLUMNS])
+        count += 1
+    workbook.save(path)
+    return count
+
+
+def export_responses(fmt: str = 'csv', survey_id: Optional[int] = None, since: Optional[datetime] = None,
+                     role: Optional[str] = None) -> Tuple[str, str, int]:
+    """
+    Выгрузка ответов во временный файл (блокирующая - вызывать через asyncio.to_thread).
+    Возвращает (путь к файлу, имя файла для отправки, число строк); файл удаляет вызывающий
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Неизвестный формат выгрузки: {fmt}")
+    if fmt == 'xlsx' and not xlsx_available():
+        raise RuntimeError("Для выгрузки в XLSX нужен пакет openpyxl")
+
+    suffix = '.csv.gz' if fmt == 'csv' else '.xlsx'
+    filename = f"responses_{datetime.now().strftime('%Y%m%d_%H%M')}{suffix}"
+    handle, path = tempfile.mkstemp(prefix='export_', suffix=suffix)
+    os.close(handle)
+
+    started = time.perf_counter()
+    rows = ResponseModel.iter_export_rows(survey_id=survey_id, since=since, role=role,
+                                          batch_size=config.EXPORT_FETCH_SIZE)
+    try:
+        count = _write_csv(rows, path) if fmt == 'csv' else _write_xlsx(rows, path)
+    except Exception:
+        os.unlink(path)
+        raise
+
+    logger.info(f"Выгрузка ответов ({fmt}): {count} строк, {os.path.getsize(path)} байт "
+                f"за {time.perf_counter() - started:.1f} с")
+    return path, filename, count
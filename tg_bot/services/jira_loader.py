@@ -1,10 +1,14 @@
 # -*- coding: utf-8 -*-
 import logging
+import time
+
 import requests
 
 from tg_bot.database.connection import db_connection
 from tg_bot.database.models import UserModel
+from tg_bot.database.report_models import ReportModel
 from tg_bot.config.settings import config
+from tg_bot.services.metrics import metrics
 
 logger = logging.getLogger(__name__)
 
@@ -17,6 +21,10 @@ class JiraLoader:
             'Accept': 'application/json',
             'Content-Type': 'application/json'
         }
+        # Счетчики HTTP-запросов к Jira (для логов и бенчмарков)
+        self.request_count = 0
+        self.throttled_count = 0
+        self.session = requests.Session()
 
         self.test_connection()
 
@@ -46,45 +54,69 @@ class JiraLoader:
         except Exception as e:
             logger.error(f"Ошибка при тесте подключения к Jira: {e}")
 
-    def load_all_data(self) -> bool:
-        try:
-            logger.info("Начало загрузки данных из Jira...")
+    def _get(self, url: str, params: dict = None, timeout: int = 30):
+        """
+        GET к Jira с повтором при 429/503: ждем Retry-After (или экспоненциально),
+        не более JIRA_MAX_RETRIES раз. Возвращает последний ответ
+        """
+        for attempt in range(config.JIRA_MAX_RETRIES + 1):
+            self.request_count += 1
+            response = self.session.get(url, headers=self.headers, auth=self.auth, params=params, timeout=timeout)
 
-            # 1. Загружаем пользователей (без промежуточных сообщений)
-            logger.info("Загрузка пользователей...")
-            if not self.load_users():
-                logger.error("Ошибка загрузки пользователей")
-                return False
+            if response.status_code not in (429, 503) or attempt == config.JIRA_MAX_RETRIES:
+                return response
 
-            # 2. Загружаем проекты
-            logger.info("Загрузка проектов...")
-            if not self.load_projects():
-                logger.error("Ошибка загрузки проектов")
-                return False
-
-            # 3. Загружаем доски
-            logger.info("Загрузка досок...")
-            if not self.load_boards():
-                logger.error("Ошибка загрузки досок")
-                return False
+            self.throttled_count += 1
+            retry_after = response.headers.get('Retry-After')
+            try:
+                delay = float(retry_after) if retry_after else 2 ** attempt
+            except ValueError:
+                delay = 2 ** attempt
+            delay = min(delay, config.JIRA_RETRY_MAX_DELAY)
+            logger.warning(f"Jira ответила {response.status_code}, повтор через {delay:.1f} сек ({url})")
+            time.sleep(delay)
+
+        return response
+
+    def _run_stage(self, stage: str, loader) -> bool:
+        """Выполнение этапа синхронизации с записью длительности в метрики"""
+        started = time.perf_counter()
+        try:
+            return loader()
+        finally:
+            duration_ms = (time.perf_counter() - started) * 1000
+            metrics.set('jira_sync_stage_duration_ms', round(duration_ms, 1), stage=stage)
+            logger.info(f"Этап Jira '{stage}' занял {duration_ms / 1000:.1f} сек")
 
-            # 4. Загружаем спринты
-            logger.info("Загрузка спринтов...")
-            if not self.load_sprints():
-                logger.error("Ошибка загрузки спринтов")
-                return False
+    def load_all_data(self) -> bool:
+        try:
+            logger.info("Начало загрузки данных из Jira...")
 
-            # 5. Загружаем задачи
-            logger.info("Загрузка задач...")
-            if not self.load_tasks():
-                logger.error("Ошибка загрузки задач")
-                return False
+            stages = [
+                ('users', "Загрузка пользователей...", "Ошибка загрузки пользователей", self.load_users),
+                ('projects', "Загрузка проектов...", "Ошибка загрузки проектов", self.load_projects),
+                ('boards', "Загрузка досок...", "Ошибка загрузки досок", self.load_boards),
+                ('sprints', "Загрузка спринтов...", "Ошибка загрузки спринтов", self.load_sprints),
+                ('tasks', "Загрузка задач...", "Ошибка загрузки задач", self.load_tasks),
+            ]
+
+            for stage, start_message, error_message, loader in stages:
+                logger.info(start_message)
+                if not self._run_stage(stage, loader):
+                    logger.error(error_message)
+                    metrics.inc('jira_sync_runs_total', result='failed')
+                    return False
 
             logger.info("Все данные Jira успешно загружены в БД")
+            metrics.inc('jira_sync_runs_total', result='success')
+
+            # Агрегаты задач для отчетов (/report, /weeklydigest, /blockers)
+            ReportModel.rebuild_task_counts()
             return True
 
         except Exception as e:
             logger.error(f"Ошибка при загрузке данных Jira: {e}")
+            metrics.inc('jira_sync_runs_total', result='failed')
             return False
 
     def load_users(self) -> bool:
@@ -103,13 +135,7 @@ class JiraLoader:
                     'maxResults': max_results
                 }
 
-                response = requests.get(
-                    url,
-                    headers=self.headers,
-                    auth=self.auth,
-                    params=params,
-                    timeout=30
-                )
+                response = self._get(url, params=params)
 
                 if response.status_code == 200:
                     users_batch = response.json()
@@ -153,6 +179,7 @@ class JiraLoader:
                     logger.debug(f"Пропущен неактивный пользователь: {user.get('displayName')}")
 
             logger.info(f"Пользователей сохранено в БД: {saved_count}/{len(all_users)} (пропущено: {skipped_count})")
+            metrics.set('jira_sync_stage_rows', saved_count, stage='users')
             return True
 
         except Exception as e:
@@ -165,12 +192,7 @@ class JiraLoader:
             logger.info("Загрузка проектов из Jira...")
             url = f"{self.base_url}/rest/api/3/project/search"
 
-            response = requests.get(
-                url,
-                headers=self.headers,
-                auth=self.auth,
-                timeout=30
-            )
+            response = self._get(url)
 
             if response.status_code == 200:
                 data = response.json()
@@ -213,6 +235,7 @@ class JiraLoader:
                                 connection.close()
 
                 logger.info(f"Проектов сохранено в БД: {saved_count}/{len(projects)}")
+                metrics.set('jira_sync_stage_rows', saved_count, stage='projects')
                 return True
             else:
                 logger.error(f"Ошибка получения проектов: {response.status_code}")
@@ -238,13 +261,7 @@ class JiraLoader:
                     'maxResults': max_results
                 }
 
-                response = requests.get(
-                    url,
-                    headers=self.headers,
-                    auth=self.auth,
-                    params=params,
-                    timeout=30
-                )
+                response = self._get(url, params=params)
 
                 if response.status_code == 200:
                     data = response.json()
@@ -296,6 +313,7 @@ class JiraLoader:
                             connection.close()
 
             logger.info(f"Досок сохранено в БД: {saved_count}/{len(all_boards)}")
+            metrics.set('jira_sync_stage_rows', saved_count, stage='boards')
             return True
 
         except Exception as e:
@@ -334,12 +352,7 @@ class JiraLoader:
                 try:
                     url = f"{self.base_url}/rest/agile/1.0/board/{board_id}/sprint"
 
-                    response = requests.get(
-                        url,
-                        headers=self.headers,
-                        auth=self.auth,
-                        timeout=30
-                    )
+                    response = self._get(url)
 
                     if response.status_code == 200:
                         data = response.json()
@@ -395,6 +408,7 @@ class JiraLoader:
                     continue
 
             logger.info(f"Спринтов сохранено в БД: {total_saved}")
+            metrics.set('jira_sync_stage_rows', total_saved, stage='sprints')
             return True
 
         except Exception as e:
@@ -418,7 +432,7 @@ class JiraLoader:
             all_tasks = []
             start_at = 0
             max_results = 100
-            max_total = 1000
+            max_total = config.JIRA_MAX_TASKS
 
             while len(all_tasks) < max_total:
                 # Поля как в tasks_all.py
@@ -430,13 +444,7 @@ class JiraLoader:
                               "issuetype,project,labels,description,customfield_10020,key"
                 }
 
-                response = requests.get(
-                    url,
-                    headers=self.headers,
-                    auth=self.auth,
-                    params=params,
-                    timeout=30
-                )
+                response = self._get(url, params=params)
 
                 if response.status_code == 200:
                     data = response.json()
@@ -561,6 +569,7 @@ class JiraLoader:
                     continue
 
             logger.info(f"Задач сохранено в БД: {saved_count}/{len(all_tasks)}")
+            metrics.set('jira_sync_stage_rows', saved_count, stage='tasks')
             return True
 
         except Exception as e:
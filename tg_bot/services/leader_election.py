@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import logging
+import math
+import threading
+from typing import Set
+
+from tg_bot.config.settings import config
+from tg_bot.database.connection import db_connection
+from tg_bot.services.clock import SystemClock
+from tg_bot.services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Серверные keepalive сессии лидера: если реплика пропала без закрытия соединения,
+# PostgreSQL закроет сессию (и снимет advisory-блокировки) примерно через
+# idle + interval * count секунд
+SESSION_KEEPALIVE = {
+    'tcp_keepalives_idle': 5,
+    'tcp_keepalives_interval': 2,
+    'tcp_keepalives_count': 3,
+}
+
+
+class SchedulerLease:
+    """
+    Лидерство планировщика между репликами бота через advisory-блокировки PostgreSQL.
+
+    Блокировки держит отдельное соединение реплики (на уровне сессии):
+    - (lock_id, 0) - лидер: планирует и рассылает опросы, выполняет фоновые задачи;
+    - (lock_id + 1, pid) - участник: по числу участников считается доля шардов;
+    - (lock_id + 2, shard) - шард рассылки напоминаний (user_id % shards).
+    Раз в heartbeat_interval секунд соединение проверяется, свободное лидерство
+    и шарды захватываются, лишние шарды отпускаются. Если реплика умирает, сессия
+    закрывается и блокировки переходят к другим репликам на следующем такте.
+
+    Без LEADER_ELECTION (и на SQLite) реплика одна: она всегда лидер и владеет всеми шардами.
+    """
+
+    def __init__(self, enabled: bool = None, lock_id: int = None, shards: int = None,
+                 heartbeat_interval: float = None, clock=None):
+        if enabled is None:
+            enabled = config.LEADER_ELECTION and db_connection.dialect == 'postgres'
+        self.enabled = enabled
+        self.lock_id = lock_id if lock_id is not None else config.LEADER_LOCK_ID
+        self.shards = max(shards if shards is not None else config.REMINDER_SHARDS, 1)
+        self.heartbeat_interval = (heartbeat_interval if heartbeat_interval is not None
+                                   else config.LEADER_HEARTBEAT_INTERVAL)
+        self.clock = clock or SystemClock()
+
+        self._connection = None
+        self._released = False
+        # Поколение сессии: _reset увеличивает его, и результат такта, начатого
+        # до сброса (поток мог пережить таймаут), не применяется
+        self._generation = 0
+        self._state_lock = threading.Lock()
+        self.is_leader = not enabled
+        self.owned_shards: Set[int] = set() if enabled else set(range(self.shards))
+        # Перераспределение шардов ждет окончания текущей рассылки
+        self.guard = asyncio.Lock()
+
+        metrics.register_collector(self._collect_metrics)
+
+    def _collect_metrics(self):
+        metrics.set('scheduler_is_leader', int(self.is_leader))
+        metrics.set('scheduler_owned_shards', len(self.owned_shards))
+
+    def owns_user(self, user_id: int) -> bool:
+        """Отправляет ли эта реплика напоминания пользователю"""
+        if self.shards == 1:
+            return self.is_leader
+        return user_id % self.shards in self.owned_shards
+
+    def _connect(self):
+        connection = db_connection.get_connection()
+        if not connection:
+            raise RuntimeError("Нет подключения к БД")
+        connection.autocommit = True
+        cursor = connection.cursor()
+        try:
+            for name, value in SESSION_KEEPALIVE.items():
+                cursor.execute(f"SET {name} = {int(value)};")
+            cursor.execute("SELECT pg_advisory_lock(%s, pg_backend_pid());", (self.lock_id + 1,))
+        finally:
+            cursor.close()
+        return connection
+
+    @staticmethod
+    def _close(connection):
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    def _try_lock(self, cursor, key: int, value: int) -> bool:
+        cursor.execute("SELECT pg_try_advisory_lock(%s, %s);", (key, value))
+        return bool(cursor.fetchone()[0])
+
+    def _members(self, cursor) -> int:
+        cursor.execute('''
+            SELECT COUNT(*) FROM pg_locks
+            WHERE locktype = 'advisory' AND granted AND objsubid = 2 AND classid = %s::oid
+              AND database = (SELECT oid FROM pg_database WHERE datname = current_database());
+            ''', (self.lock_id + 1,))
+        return max(cursor.fetchone()[0], 1)
+
+    def _tick(self, generation: int):
+        """
+        Heartbeat, захват лидерства и перераспределение шардов (блокирующий вызов).
+        Состояние меняется только если с начала такта не было _reset
+        """
+        connection = self._connection
+        if connection is None or connection.closed:
+            connection = self._connect()
+            with self._state_lock:
+                if generation != self._generation:
+                    # Сессия устарела - ее блокировки снимутся вместе с соединением
+                    self._close(connection)
+                    return
+                self._connection = connection
+
+        is_leader = self.is_leader
+        owned_shards = set(self.owned_shards)
+        cursor = connection.cursor()
+        try:
+            cursor.execute("SELECT 1;")
+            cursor.fetchone()
+
+            if not is_leader and self._try_lock(cursor, self.lock_id, 0):
+                is_leader = True
+
+            if self.shards > 1:
+                target = math.ceil(self.shards / self._members(cursor))
+                for shard in sorted(owned_shards, reverse=True)[:max(len(owned_shards) - target, 0)]:
+                    cursor.execute("SELECT pg_advisory_unlock(%s, %s);", (self.lock_id + 2, shard))
+                    owned_shards.discard(shard)
+                for shard in range(self.shards):
+                    if len(owned_shards) >= target:
+                        break
+                    if shard not in owned_shards and self._try_lock(cursor, self.lock_id + 2, shard):
+                        owned_shards.add(shard)
+        finally:
+            cursor.close()
+
+        with self._state_lock:
+            if generation != self._generation:
+                return
+            if is_leader and not self.is_leader:
+                logger.info("Реплика стала лидером планировщика")
+            self.is_leader = is_leader
+            self.owned_shards = owned_shards
+
+    def _reset(self):
+        """Потеря соединения: все блокировки сессии уже сняты сервером"""
+        with self._state_lock:
+            self._generation += 1
+            if self.is_leader:
+                logger.warning("Лидерство планировщика потеряно")
+            self.is_leader = False
+            self.owned_shards = set()
+            connection, self._connection = self._connection, None
+        if connection is not None:
+            self._close(connection)
+
+    async def run(self):
+        """Фоновый цикл heartbeat"""
+        if not self.enabled:
+            return
+
+        logger.info(f"Выборы лидера планировщика: блокировка {self.lock_id}, шардов напоминаний {self.shards}")
+        while not self._released:
+            try:
+                async with self.guard:
+                    if self._released:
+                        break
+                    await asyncio.wait_for(asyncio.to_thread(self._tick, self._generation),
+                                           timeout=self.heartbeat_interval * 2)
+            except Exception as e:
+                # В т.ч. таймаут: зависшее соединение считаем потерянным, чтобы не было двух лидеров
+                logger.error(f"Heartbeat планировщика не прошел: {e!r}")
+                self._reset()
+            await self.clock.sleep(self.heartbeat_interval)
+
+    def release(self):
+        """Освобождение лидерства и шардов (при остановке бота); heartbeat больше не захватывает их"""
+        self._released = True
+        if self.enabled:
+            had_session = self._connection is not None
+            self.is_leader = False
+            # Сброс поколения и в том случае, если такт еще подключается в потоке
+            self._reset()
+            if had_session:
+                logger.info("Лидерство планировщика освобождено")
+
+
+# Глобальный экземпляр
+scheduler_lease = SchedulerLease()
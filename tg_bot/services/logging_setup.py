@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+import atexit
+import copy
+import json
+import logging
+import queue
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional, Tuple
+
+from tg_bot.config.constants import LOG_LEVEL_HOTPATH
+from tg_bot.config.settings import config
+from tg_bot.services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+# Атрибуты LogRecord, которые не переносятся в JSON как дополнительные поля (extra=...)
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+logging.addLevelName(LOG_LEVEL_HOTPATH, 'HOTPATH')
+
+_TRACEBACK_FORMATTER = logging.Formatter()
+
+
+class JsonFormatter(logging.Formatter):
+    """Одна строка JSON на запись: время, уровень, логгер, место в коде, сообщение и поля extra"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'site': f"{record.module}:{record.lineno}",
+            'message': record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES and not key.startswith('_'):
+                entry[key] = value
+        # exc_info - запись напрямую (после stop_logging), exc_text - из очереди (NonBlockingQueueHandler.prepare)
+        if record.exc_info:
+            entry['exc_info'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry['exc_info'] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Ограничение частоты записей ниже WARNING по месту в коде (файл и строка):
+    token bucket на rate записей в секунду с запасом burst, записи уровня HOTPATH
+    дополнительно прореживаются - проходит каждая sample-я. Число пропущенных
+    дописывается к следующей прошедшей записи с того же места.
+    WARNING и выше проходят всегда
+    """
+
+    def __init__(self, rate: float, burst: int, sample: int = 1):
+        super().__init__()
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self.sample = max(sample, 1)
+        self._lock = threading.Lock()
+        # Место в коде -> (токены, момент последнего пополнения)
+        self._buckets: Dict[Tuple[str, int], Tuple[float, float]] = {}
+        self._seen: Counter = Counter()
+        self._suppressed: Counter = Counter()
+        self.dropped = 0
+
+    def _allow(self, site: Tuple[str, int], levelno: int) -> bool:
+        if levelno <= LOG_LEVEL_HOTPATH and self.sample > 1:
+            self._seen[site] += 1
+            if self._seen[site] % self.sample != 1:
+                return False
+        if self.rate <= 0:
+            return True
+
+        now = time.monotonic()
+        tokens, updated = self._buckets.get(site, (float(self.burst), now))
+        tokens = min(float(self.burst), tokens + (now - updated) * self.rate)
+        if tokens < 1:
+            self._buckets[site] = (tokens, now)
+            return False
+        self._buckets[site] = (tokens - 1, now)
+        return True
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+
+        site = (record.pathname, record.lineno)
+        with self._lock:
+            if not self._allow(site, record.levelno):
+                self._suppressed[site] += 1
+                self.dropped += 1
+                return False
+            suppressed = self._suppressed.pop(site, 0)
+
+        if suppressed:
+            record.msg = f"{record.getMessage()} [пропущено похожих записей: {suppressed}]"
+            record.args = None
+        return True
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """QueueHandler, который при переполненной очереди отбрасывает запись, а не ждет"""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """
+        В отличие от QueueHandler.prepare, traceback не вклеивается в текст сообщения,
+        а остается в exc_text: JsonFormatter пишет его отдельным полем, текстовый формат -
+        с новой строки, как и без очереди
+        """
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            record.exc_text = record.exc_text or _TRACEBACK_FORMATTER.formatException(record.exc_info)
+        record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+_listener: Optional[QueueListener] = None
+_output: Optional[logging.Handler] = None
+
+
+def setup_logging() -> QueueListener:
+    """
+    Логирование через очередь: обработчики корневого логгера только кладут запись
+    в очередь (после фильтра частоты), запись в stderr делает поток QueueListener.
+    Повторный вызов возвращает уже запущенный listener
+    """
+    global _listener, _output
+    if _listener is not None:
+        return _listener
+
+    _output = logging.StreamHandler()
+    _output.setFormatter(JsonFormatter() if config.LOG_FORMAT == 'json' else logging.Formatter(TEXT_FORMAT))
+
+    queue_handler = NonBlockingQueueHandler(queue.Queue(maxsize=config.LOG_QUEUE_SIZE))
+    rate_filter = RateLimitFilter(config.LOG_RATE_LIMIT, config.LOG_RATE_BURST, config.LOG_HOTPATH_SAMPLE)
+    queue_handler.addFilter(rate_filter)
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(config.LOG_LEVEL)
+
+    _listener = QueueListener(queue_handler.queue, _output, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+
+    def collect_log_metrics():
+        metrics.set('log_records_dropped_total', rate_filter.dropped, reason='rate_limit')
+        metrics.set('log_records_dropped_total', queue_handler.dropped, reason='queue_full')
+
+    metrics.register_collector(collect_log_metrics)
+    logger.info(f"Логирование: уровень {config.LOG_LEVEL}, формат {config.LOG_FORMAT}, "
+                f"очередь {config.LOG_QUEUE_SIZE} записей")
+    return _listener
+
+
+def stop_logging():
+    """
+    Дописывает очередь логов и останавливает поток записи (идемпотентно).
+    Дальнейшие записи идут в вывод напрямую, чтобы не терялись логи завершения
+    """
+    global _listener
+    if _listener is None:
+        return
+    listener, _listener = _listener, None
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    listener.stop()
+    root.addHandler(_output)
@@ -0,0 +1,223 @@
+# -*- coding: utf-8 -*-
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Tuple
+
+from tg_bot.config.settings import config
+from tg_bot.database.instrumentation import LatencyHistogram, query_stats
+
+logger = logging.getLogger(__name__)
+
+# Описание метрик: имя -> (тип Prometheus, описание)
+METRICS = {
+    'bot_updates_total': ('counter', 'Обработанные Telegram update по типу'),
+    'bot_handler_latency_ms': ('histogram', 'Время обработки update по команде/callback, мс'),
+    'bot_handler_db_queries': ('histogram', 'Запросов к БД на один update'),
+    'db_query_latency_ms': ('histogram', 'Время выполнения методов моделей, мс'),
+    'db_query_rows_total': ('counter', 'Строк возвращено методами моделей'),
+    'db_query_errors_total': ('counter', 'Ошибки методов моделей'),
+    'db_connection_acquire_ms': ('histogram', 'Время получения соединения с БД, мс'),
+    'db_connection_failures_total': ('counter', 'Неудачные подключения к БД'),
+    'db_connections_open': ('gauge', 'Открытые соединения с БД'),
+    'scheduler_scheduled_surveys': ('gauge', 'Опросы, ожидающие отправки в планировщике'),
+    'scheduler_pending_reminders': ('gauge', 'Напоминания к отправке на последней проверке'),
+    'scheduler_is_leader': ('gauge', 'Реплика - лидер планировщика (1/0)'),
+    'scheduler_owned_shards': ('gauge', 'Шарды рассылки напоминаний, которыми владеет реплика'),
+    'scheduler_reminder_lag_ms': ('histogram', 'Задержка отправки напоминания относительно срока, мс'),
+    'scheduler_reminder_digest_size': ('histogram', 'Опросов в одном сообщении-напоминании'),
+    'broadcast_messages_total': ('counter', 'Сообщения рассылки по виду и результату'),
+    'jira_sync_stage_duration_ms': ('gauge', 'Длительность этапа последней синхронизации Jira, мс'),
+    'jira_sync_stage_rows': ('gauge', 'Строк сохранено этапом последней синхронизации Jira'),
+    'jira_sync_runs_total': ('counter', 'Запуски синхронизации Jira по результату'),
+    'report_rollup_duration_ms': ('histogram', 'Длительность пересчета агрегатов отчетов, мс'),
+    'lifecycle_surveys_total': ('counter', 'Опросы, закрытые по сроку и перенесенные в архив'),
+    'log_records_dropped_total': ('counter', 'Записи логов, отброшенные ограничением частоты или переполнением очереди'),
+}
+
+# Корзины задержки напоминаний (мс): от секунд до суток
+REMINDER_LAG_BUCKETS_MS = (1000, 5000, 30000, 60000, 300000, 900000, 3600000, 21600000, 86400000)
+# Корзины числа запросов к БД на update
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+# Корзины числа опросов в сводном напоминании
+DIGEST_SIZE_BUCKETS = (1, 2, 3, 5, 10, 20)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Dict) -> LabelKey:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _format_labels(label_key: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(label_key) + ([extra] if extra else [])
+    if not pairs:
+        return ''
+    escaped = [
+        f'{key}="' + value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') + '"'
+        for key, value in pairs
+    ]
+    return '{' + ','.join(escaped) + '}'
+
+
+def _format_value(value: float) -> str:
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+class MetricsRegistry:
+    """
+    Реестр метрик бота в текстовом формате Prometheus.
+    Значения пишутся из event loop и потоков (Jira), читаются HTTP-потоком - под общей блокировкой.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._values: Dict[str, Dict[LabelKey, float]] = {}
+        self._histograms: Dict[str, Dict[LabelKey, LatencyHistogram]] = {}
+        self._buckets: Dict[str, Tuple] = {
+            'scheduler_reminder_lag_ms': REMINDER_LAG_BUCKETS_MS,
+            'scheduler_reminder_digest_size': DIGEST_SIZE_BUCKETS,
+            'bot_handler_db_queries': QUERY_COUNT_BUCKETS,
+        }
+        self._collectors: List[Callable[[], None]] = []
+
+    @staticmethod
+    def _check(name: str, expected: str):
+        if METRICS.get(name, (None,))[0] != expected:
+            raise ValueError(f"Неизвестная метрика {name} ({expected})")
+
+    def inc(self, name: str, value: float = 1, **labels):
+        """Увеличение счетчика"""
+        self._check(name, 'counter')
+        key = _label_key(labels)
+        with self._lock:
+            series = self._values.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def set(self, name: str, value: float, **labels):
+        """Установка значения (gauge или счетчик, ведущийся снаружи реестра)"""
+        if METRICS.get(name, (None,))[0] not in ('gauge', 'counter'):
+            raise ValueError(f"Неизвестная метрика {name}")
+        with self._lock:
+            self._values.setdefault(name, {})[_label_key(labels)] = value
+
+    def observe(self, name: str, value: float, **labels):
+        """Наблюдение в гистограмму"""
+        self._check(name, 'histogram')
+        key = _label_key(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            if key not in series:
+                series[key] = LatencyHistogram(self._buckets[name]) if name in self._buckets else LatencyHistogram()
+            series[key].observe(value)
+
+    def set_histogram(self, name: str, histogram: LatencyHistogram, **labels):
+        """Публикация гистограммы, которая ведется вне реестра (копия из QueryStats.copy - не меняется при отрисовке)"""
+        self._check(name, 'histogram')
+        with self._lock:
+            self._histograms.setdefault(name, {})[_label_key(labels)] = histogram
+
+    def get_values(self, name: str) -> Dict[LabelKey, float]:
+        """Значения счетчика/gauge по наборам меток (копия словаря)"""
+        with self._lock:
+            return dict(self._values.get(name, {}))
+
+    def get_histograms(self, name: str) -> Dict[LabelKey, LatencyHistogram]:
+        """Гистограммы метрики по наборам меток (копия словаря)"""
+        with self._lock:
+            return dict(self._histograms.get(name, {}))
+
+    def register_collector(self, collector: Callable[[], None]):
+        """Функция, обновляющая значения перед каждым снятием метрик"""
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        """Все метрики в текстовом формате Prometheus"""
+        for collector in self._collectors:
+            try:
+                collector()
+            except Exception as e:
+                logger.error(f"Ошибка сборщика метрик {getattr(collector, '__name__', collector)}: {e}")
+
+        lines = []
+        with self._lock:
+            for name, (metric_type, help_text) in METRICS.items():
+                values = self._values.get(name)
+                histograms = self._histograms.get(name)
+                if not values and not histograms:
+                    continue
+
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {metric_type}")
+
+                if metric_type != 'histogram':
+                    for key, value in values.items():
+                        lines.append(f"{name}{_format_labels(key)} {_format_value(value)}")
+                    continue
+
+                for key, histogram in histograms.items():
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets, histogram.counts):
+                        cumulative += count
+                        lines.append(f"{name}_bucket{_format_labels(key, ('le', str(bound)))} {cumulative}")
+                    lines.append(f"{name}_bucket{_format_labels(key, ('le', '+Inf'))} {histogram.count}")
+                    lines.append(f"{name}_sum{_format_labels(key)} {_format_value(round(histogram.total_ms, 3))}")
+                    lines.append(f"{name}_count{_format_labels(key)} {histogram.count}")
+
+        return '\n'.join(lines) + '\n'
+
+
+metrics = MetricsRegistry()
+
+
+def collect_db_metrics():
+    """Перенос статистики модельного слоя (QueryStats) в реестр - копии, снятые под блокировкой QueryStats"""
+    stats = query_stats.copy()
+    for name, histogram in stats.latency.items():
+        metrics.set_histogram('db_query_latency_ms', histogram, query=name)
+        metrics.set('db_query_rows_total', stats.rows.get(name, 0), query=name)
+        metrics.set('db_query_errors_total', stats.errors.get(name, 0), query=name)
+
+    metrics.set_histogram('db_connection_acquire_ms', stats.connection_acquire)
+    metrics.set('db_connection_failures_total', stats.connection_failures)
+    metrics.set('db_connections_open', stats.connections_open)
+
+
+metrics.register_collector(collect_db_metrics)
+
+
+class _MetricsRequestHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+
+        body = metrics.render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug(f"metrics: {format % args}")
+
+
+def start_metrics_server(host: str = None, port: int = None) -> Optional[ThreadingHTTPServer]:
+    """Запуск HTTP-эндпоинта /metrics в фоновом потоке"""
+    host = host or config.METRICS_HOST
+    port = port if port is not None else config.METRICS_PORT
+
+    try:
+        server = ThreadingHTTPServer((host, port), _MetricsRequestHandler)
+    except OSError as e:
+        logger.error(f"Не удалось запустить сервер метрик на {host}:{port}: {e}")
+        return None
+
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, name='metrics-server', daemon=True)
+    thread.start()
+    logger.info(f"Метрики доступны на http://{host}:{port}/metrics")
+    return server
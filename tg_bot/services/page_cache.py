@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from telegram import InlineKeyboardMarkup
+
+from tg_bot.config.constants import (
+    ALLSURVEYS_PERIOD_DAYS,
+    ALLSURVEYS_PAGINATION_PREFIX,
+    ALLSURVEYS_CACHE_TTL
+)
+from tg_bot.database.models import SurveyModel
+from tg_bot.services.pagination_utils import PaginationUtils
+
+logger = logging.getLogger(__name__)
+
+
+class AllSurveysPageCache:
+    """
+    Общий (для всех руководителей) кэш отрендеренных страниц /allsurveys.
+    Ключ - (период в днях, номер страницы), значение - (текст, клавиатура).
+    Кэш привязан к версии опросов SurveyModel и сбрасывается при создании/закрытии
+    опроса, а также по TTL (окно "последние N дней" сдвигается со временем).
+    """
+
+    def __init__(self, ttl_seconds: int = ALLSURVEYS_CACHE_TTL):
+        self.ttl_seconds = ttl_seconds
+        self._version = None
+        self._built_at = 0.0
+        self._items: Dict[int, List[Dict]] = {}
+        self._pages: Dict[Tuple[int, int], Tuple[str, Optional[InlineKeyboardMarkup]]] = {}
+
+    def _ensure_fresh(self):
+        """Сброс кэша, если изменилась версия опросов или истек TTL"""
+        current_version = SurveyModel.get_cache_version()
+        expired = time.monotonic() - self._built_at > self.ttl_seconds
+
+        if self._version != current_version or expired:
+            self._items.clear()
+            self._pages.clear()
+            self._version = current_version
+            self._built_at = time.monotonic()
+
+    def invalidate(self):
+        """Принудительный сброс кэша"""
+        self._version = None
+
+    def get_surveys(self, period_days: int = ALLSURVEYS_PERIOD_DAYS) -> List[Dict]:
+        """Активные опросы за период (из кэша или из БД)"""
+        self._ensure_fresh()
+
+        if period_days not in self._items:
+            date_from = datetime.now() - timedelta(days=period_days)
+            self._items[period_days] = SurveyModel.get_active_surveys_since(date_from)
+            logger.debug(f"Кэш /allsurveys: загружено {len(self._items[period_days])} опросов за {period_days} дней")
+
+        return self._items[period_days]
+
+    def get_page(self, page: int = 0,
+                 period_days: int = ALLSURVEYS_PERIOD_DAYS) -> Optional[Tuple[str, Optional[InlineKeyboardMarkup]]]:
+        """Получить (текст, клавиатура) страницы; None - если опросов нет"""
+        items = self.get_surveys(period_days)
+        if not items:
+            return None
+
+        page_items, current_page, total_pages = PaginationUtils.get_page_items(items, page)
+
+        key = (period_days, current_page)
+        cached = self._pages.get(key)
+        if cached:
+            return cached
+
+        title = f"ВСЕ АКТИВНЫЕ ОПРОСЫ ({period_days} дней)"
+        message = PaginationUtils.format_page_with_numbers(
+            page_items, current_page, total_pages, title
+        )
+        keyboard = PaginationUtils.create_pagination_navigation(
+            page=current_page,
+            total_pages=total_pages,
+            callback_prefix=ALLSURVEYS_PAGINATION_PREFIX
+        )
+
+        self._pages[key] = (message, keyboard)
+        return self._pages[key]
+
+
+# Глобальный экземпляр кэша
+allsurveys_page_cache = AllSurveysPageCache()
@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import logging
+import time
+from collections import defaultdict
+from datetime import timedelta
+from typing import Dict, List
+
+from tg_bot.config.settings import config
+from tg_bot.config.texts import REPORT_TEXTS, get_role_display_name
+from tg_bot.database.report_models import ReportModel
+from tg_bot.services.clock import SystemClock
+from tg_bot.services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+def _rate(answered: int, target: int) -> str:
+    if not target:
+        return f"{answered}/0"
+    return f"{answered}/{target} ({answered * 100 // target}%)"
+
+
+def _role_name(role) -> str:
+    return get_role_display_name(role) if role else "все"
+
+
+class ReportEngine:
+    """
+    Отчеты по предрасчитанным агрегатам (ReportModel).
+    Периодический rollup пересчитывает охват опросов в фоне, задачи Jira -
+    после синхронизации; ответы учитываются в агрегатах сразу при сохранении. Команды отчетов
+    только читают небольшие таблицы агрегатов и форматируют текст.
+    """
+
+    def __init__(self, clock=None, interval: float = None, window_days: int = None):
+        self.clock = clock or SystemClock()
+        self.interval = interval if interval is not None else config.REPORT_ROLLUP_INTERVAL
+        self.window_days = window_days if window_days is not None else config.REPORT_WINDOW_DAYS
+        self.last_rollup_at = None
+
+    def rollup(self) -> bool:
+        """
+        Пересчет охвата опросов окна window_days. Агрегаты задач Jira пересчитываются
+        после каждой синхронизации (JiraLoader), здесь - только при первом запуске
+        """
+        started = time.perf_counter()
+        since = self.clock.now() - timedelta(days=self.window_days)
+
+        survey_rows = ReportModel.rebuild_survey_stats(since)
+        task_rows = ReportModel.rebuild_task_counts() if self.last_rollup_at is None else 0
+        success = survey_rows is not None and task_rows is not None
+
+        metrics.observe('report_rollup_duration_ms', (time.perf_counter() - started) * 1000)
+        if success:
+            self.last_rollup_at = self.clock.now()
+            logger.info(f"Агрегаты отчетов пересчитаны: опросов {survey_rows}, строк по задачам {task_rows}")
+        else:
+            logger.warning("Пересчет агрегатов отчетов завершился с ошибками")
+        return success
+
+    async def run_periodic(self):
+        """Фоновый пересчет агрегатов раз в interval секунд"""
+        while True:
+            try:
+                work = asyncio.ensure_future(asyncio.to_thread(self.rollup))
+                try:
+                    await asyncio.shield(work)
+                except asyncio.CancelledError:
+                    # Остановка бота: поток не прервать - дожидаемся окончания пересчета
+                    await asyncio.gather(work, return_exceptions=True)
+                    raise
+            except Exception as e:
+                logger.error(f"Ошибка пересчета агрегатов отчетов: {e}")
+            await self.clock.sleep(self.interval)
+
+    def _footer(self) -> str:
+        if not self.last_rollup_at:
+            return REPORT_TEXTS['not_ready']
+        return REPORT_TEXTS['data_as_of'].format(time=self.last_rollup_at.strftime('%d.%m.%Y %H:%M'))
+
+    @staticmethod
+    def _survey_lines(stats: List[Dict], limit: int = 10) -> List[str]:
+        lines = []
+        for row in stats[:limit]:
+            question = row['question'] or ''
+            if len(question) > 40:
+                question = question[:37] + '...'
+            lines.append(
+                f"#{row['id_survey']} {row['survey_datetime'].strftime('%d.%m')} [{_role_name(row['role'])}] "
+                f"{_rate(row['answered_count'], row['target_count'])} - {question}"
+            )
+        return lines
+
+    @staticmethod
+    def _role_lines(stats: List[Dict]) -> List[str]:
+        by_role = defaultdict(lambda: [0, 0])
+        for row in stats:
+            by_role[row['role']][0] += row['answered_count']
+            by_role[row['role']][1] += row['target_count']
+        return [f"{_role_name(role)}: {_rate(answered, target)}"
+                for role, (answered, target) in sorted(by_role.items(), key=lambda item: item[0] or '')]
+
+    @staticmethod
+    def _task_lines(dimension: str, limit: int = 10) -> List[str]:
+        return [f"{value}: {count}" for value, count in ReportModel.get_task_counts(dimension, limit)]
+
+    def render_report(self) -> str:
+        """Сводка: охват опросов за окно, ответы по дням, задачи по статусам"""
+        now = self.clock.now()
+        stats = ReportModel.get_survey_stats(now - timedelta(days=self.window_days))
+        daily = ReportModel.get_daily_answers((now - timedelta(days=6)).date())
+
+        answers_by_day = defaultdict(int)
+        for row in daily:
+            answers_by_day[row['day']] += row['answers']
+        unanswered = sum(max(row['target_count'] - row['answered_count'], 0)
+                         for row in stats if row['state'] == 'active')
+
+        sections = [REPORT_TEXTS['report_title'].format(days=self.window_days)]
+        sections.append("Опросы:\n" + ("\n".join(self._survey_lines(stats)) or REPORT_TEXTS['no_data']))
+        sections.append("Охват по ролям:\n" + ("\n".join(self._role_lines(stats)) or REPORT_TEXTS['no_data']))
+        sections.append(f"Ожидают ответа (активные опросы): {unanswered}")
+        sections.append("Ответы за 7 дней:\n" + ("\n".join(
+            f"{day.strftime('%d.%m')}: {count}" for day, count in sorted(answers_by_day.items())
+        ) or REPORT_TEXTS['no_data']))
+        sections.append("Задачи по статусам:\n" + ("\n".join(self._task_lines('status')) or REPORT_TEXTS['no_data']))
+        sections.append(self._footer())
+        return "\n\n".join(sections)
+
+    def render_daily_digest(self) -> str:
+        """Дайджест за сутки: новые опросы и ответы по ролям"""
+        now = self.clock.now()
+        stats = ReportModel.get_survey_stats(now - timedelta(days=1))
+        daily = ReportModel.get_daily_answers(now.date())
+
+        sections = [REPORT_TEXTS['daily_title'].format(date=now.strftime('%d.%m.%Y'))]
+        sections.append("Опросы за сутки:\n" + ("\n".join(self._survey_lines(stats)) or REPORT_TEXTS['no_data']))
+        sections.append("\n".join(
+            [f"Ответов сегодня: {sum(row['answers'] for row in daily)}"] +
+            [f"{_role_name(row['role'])}: {row['answers']}" for row in daily]
+        ))
+        sections.append(self._footer())
+        return "\n\n".join(sections)
+
+    def render_weekly_digest(self) -> str:
+        """Дайджест за неделю: ответы по дням, охват по ролям, задачи по спринтам и исполнителям"""
+        now = self.clock.now()
+        week_ago = now - timedelta(days=7)
+        stats = ReportModel.get_survey_stats(week_ago)
+        daily = ReportModel.get_daily_answers(week_ago.date())
+
+        answers_by_day = defaultdict(int)
+        for row in daily:
+            answers_by_day[row['day']] += row['answers']
+
+        sections = [REPORT_TEXTS['weekly_title'].format(
+            date_from=week_ago.strftime('%d.%m.%Y'), date_to=now.strftime('%d.%m.%Y'))]
+        sections.append(f"Опросов: {len(stats)}, ответов: {sum(answers_by_day.values())}")
+        sections.append("Ответы по дням:\n" + ("\n".join(
+            f"{day.strftime('%d.%m')}: {count}" for day, count in sorted(answers_by_day.items())
+        ) or REPORT_TEXTS['no_data']))
+        sections.append("Охват по ролям:\n" + ("\n".join(self._role_lines(stats)) or REPORT_TEXTS['no_data']))
+        sections.append("Задачи по спринтам:\n" + ("\n".join(self._task_lines('sprint')) or REPORT_TEXTS['no_data']))
+        sections.append("Задачи по исполнителям:\n" + (
+            "\n".join(self._task_lines('assignee')) or REPORT_TEXTS['no_data']))
+        sections.append(self._footer())
+        return "\n\n".join(sections)
+
+    def render_blockers(self) -> str:
+        """Блокеры: задачи-блокеры по исполнителям и опросы с наименьшим охватом"""
+        now = self.clock.now()
+        stats = [row for row in ReportModel.get_survey_stats(now - timedelta(days=self.window_days))
+                 if row['state'] == 'active' and row['target_count']]
+        stats.sort(key=lambda row: row['answered_count'] / row['target_count'])
+
+        sections = [REPORT_TEXTS['blockers_title']]
+        sections.append("Задачи-блокеры по исполнителям:\n" + (
+            "\n".join(self._task_lines('blocked_assignee')) or REPORT_TEXTS['no_blockers']))
+        sections.append("Опросы с наименьшим охватом:\n" + (
+            "\n".join(self._survey_lines(stats, limit=5)) or REPORT_TEXTS['no_data']))
+        sections.append(self._footer())
+        return "\n\n".join(sections)
+
+
+# Глобальный экземпляр
+report_engine = ReportEngine()
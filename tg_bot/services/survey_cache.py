@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+import logging
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from tg_bot.config.constants import RESPONSE_PERIOD_DAYS, SURVEY_SNAPSHOT_CACHE_TTL
+from tg_bot.database.models import ResponseModel, SurveyModel
+
+logger = logging.getLogger(__name__)
+
+
+class RoleSurveySnapshot:
+    """
+    Общий для всех пользователей снимок активных опросов для /response.
+    Загружается одним запросом (все активные опросы за период) и раскладывается
+    по ролям: опросы роли + опросы "для всех". Снимок привязан к версии опросов
+    SurveyModel (создание/закрытие опроса) и к TTL; выход опроса за окно
+    "последние N дней" проверяется при чтении, без перезагрузки.
+    Словари опросов общие - изменять их нельзя.
+    """
+
+    def __init__(self, ttl_seconds: int = SURVEY_SNAPSHOT_CACHE_TTL, period_days: int = RESPONSE_PERIOD_DAYS):
+        self.ttl_seconds = ttl_seconds
+        self.period_days = period_days
+        self._version = None
+        self._built_at = 0.0
+        self._surveys: List[Dict] = []
+        self._by_role: Dict[Optional[str], List[Dict]] = {}
+
+    def _ensure_fresh(self):
+        """Перезагрузка снимка, если изменилась версия опросов или истек TTL"""
+        current_version = SurveyModel.get_cache_version()
+        expired = time.monotonic() - self._built_at > self.ttl_seconds
+
+        if self._version != current_version or expired:
+            date_from = datetime.now() - timedelta(days=self.period_days)
+            self._surveys = SurveyModel.get_active_surveys_since(date_from)
+            self._by_role.clear()
+            self._version = current_version
+            self._built_at = time.monotonic()
+            logger.debug(f"Снимок опросов для /response: загружено {len(self._surveys)} опросов")
+
+    def invalidate(self):
+        """Принудительный сброс снимка"""
+        self._version = None
+
+    def _for_role(self, role: Optional[str]) -> List[Dict]:
+        surveys = self._by_role.get(role)
+        if surveys is None:
+            # Порядок как раньше: сначала опросы роли, затем опросы для всех (каждые - от новых к старым)
+            surveys = [s for s in self._surveys if role is not None and s['role'] == role]
+            surveys += [s for s in self._surveys if s['role'] is None]
+            self._by_role[role] = surveys
+        return surveys
+
+    def get_surveys(self, role: Optional[str]) -> List[Dict]:
+        """Активные опросы за период для роли (включая опросы для всех)"""
+        self._ensure_fresh()
+        date_from = datetime.now() - timedelta(days=self.period_days)
+        return [s for s in self._for_role(role) if s['datetime'] >= date_from]
+
+    @staticmethod
+    def filter_unanswered(surveys: List[Dict], user_id: int) -> List[Dict]:
+        """Опросы, на которые пользователь еще не ответил (один запрос к БД на весь список)"""
+        if not surveys:
+            return []
+
+        answered = ResponseModel.get_answered_survey_ids(user_id, [s['id_survey'] for s in surveys])
+        return [s for s in surveys if s['id_survey'] not in answered]
+
+
+class SurveyRepository:
+    """
+    Доступ к опросу по id: запрос по первичному ключу + небольшой LRU-кэш.
+    Кэш сбрасывается целиком при смене версии опросов SurveyModel
+    (создание/закрытие опроса) - такие изменения редки.
+    """
+
+    def __init__(self, max_size: int = 256):
+        self.max_size = max_size
+        self._version = None
+        self._items: OrderedDict = OrderedDict()
+
+    def get_survey(self, survey_id: int) -> Optional[Dict]:
+        current_version = SurveyModel.get_cache_version()
+        if self._version != current_version:
+            self._items.clear()
+            self._version = current_version
+
+        survey = self._items.get(survey_id)
+        if survey is not None:
+            self._items.move_to_end(survey_id)
+            return survey
+
+        survey = SurveyModel.get_survey_by_id(survey_id)
+        if survey is not None:
+            self._items[survey_id] = survey
+            if len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+        return survey
+
+    def invalidate(self):
+        """Принудительный сброс кэша"""
+        self._version = None
+
+# Глобальные экземпляры
+role_survey_snapshot = RoleSurveySnapshot()
+survey_repository = SurveyRepository()
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import logging
+from datetime import timedelta
+
+from tg_bot.config.settings import config
+from tg_bot.database.answered_index import answered_index
+from tg_bot.database.lifecycle_models import LifecycleModel
+from tg_bot.database.models import SurveyModel
+from tg_bot.database.partitioning import PartitionManager
+from tg_bot.services.clock import SystemClock
+from tg_bot.services.leader_election import scheduler_lease
+from tg_bot.services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class SurveyLifecycle:
+    """
+    Фоновая задача жизненного цикла опросов: раз в interval секунд закрывает
+    опросы старше expiry_days (с отменой напоминаний) и переносит закрытые
+    опросы старше archive_days в архивные таблицы. 0 - шаг отключен.
+    При DB_PARTITIONING здесь же обслуживаются секции reminders/responses
+    """
+
+    def __init__(self, clock=None, interval: float = None, expiry_days: int = None,
+                 archive_days: int = None, batch_size: int = None):
+        self.clock = clock or SystemClock()
+        self.interval = interval if interval is not None else config.LIFECYCLE_INTERVAL
+        self.expiry_days = expiry_days if expiry_days is not None else config.SURVEY_EXPIRY_DAYS
+        self.archive_days = archive_days if archive_days is not None else config.SURVEY_ARCHIVE_DAYS
+        self.batch_size = batch_size if batch_size is not None else config.ARCHIVE_BATCH_SIZE
+
+    def run_once(self):
+        """Один проход: закрытие просроченных опросов и перенос старых в архив"""
+        now = self.clock.now()
+        expired = []
+        archived = []
+
+        if self.expiry_days > 0:
+            expired = LifecycleModel.expire_surveys(now - timedelta(days=self.expiry_days))
+        if self.archive_days > 0:
+            archived = LifecycleModel.archive_surveys(now - timedelta(days=self.archive_days), self.batch_size)
+            answered_index.forget_surveys(archived)
+
+        if config.DB_PARTITIONING:
+            # Открытая секция текущего месяца и срок хранения старых секций
+            PartitionManager.maintain(now, config.PARTITION_RETENTION_MONTHS, config.PARTITION_RETENTION_MODE)
+
+        if expired or archived:
+            SurveyModel.bump_cache_version()
+            metrics.inc('lifecycle_surveys_total', len(expired), action='expired')
+            metrics.inc('lifecycle_surveys_total', len(archived), action='archived')
+            logger.info(f"Жизненный цикл опросов: закрыто {len(expired)}, перенесено в архив {len(archived)}")
+        return expired, archived
+
+    async def run_periodic(self):
+        """Фоновый запуск раз в interval секунд"""
+        while True:
+            try:
+                # С несколькими репликами - только на лидере планировщика
+                if scheduler_lease.is_leader:
+                    work = asyncio.ensure_future(asyncio.to_thread(self.run_once))
+                    try:
+                        await asyncio.shield(work)
+                    except asyncio.CancelledError:
+                        # Остановка бота: поток не прервать - дожидаемся окончания текущего прохода
+                        await asyncio.gather(work, return_exceptions=True)
+                        raise
+            except Exception as e:
+                logger.error(f"Ошибка обработки жизненного цикла опросов: {e}")
+            await self.clock.sleep(self.interval)
+
+
+# Глобальный экземпляр
+survey_lifecycle = SurveyLifecycle()